@@ -5,7 +5,6 @@ Initialisation de l'application
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_login import LoginManager
 from dotenv import load_dotenv
@@ -15,12 +14,19 @@ load_dotenv()
 
 # Initialise les extensions
 db = SQLAlchemy()
-migrate = Migrate()
 login_manager = LoginManager()
 
 
-def create_app():
-    """Factory pour créer l'application Flask"""
+def create_app(start_background: bool = True):
+    """
+    Factory pour créer l'application Flask
+    
+    Args:
+        start_background: Démarre les threads de fond (worker de tâches embarqué).
+            False avec `gunicorn --preload` : l'app est créée une fois dans le
+            master puis forkée, les threads sont lancés par worker (post_fork,
+            voir gunicorn.conf.py) via start_background_services
+    """
     app = Flask(__name__)
     
     # Charge la configuration depuis app/config.py
@@ -34,9 +40,13 @@ def create_app():
     
     # Initialise les extensions avec l'app
     db.init_app(app)
-    migrate.init_app(app, db)
     CORS(app)
     
+    # Flask-Migrate (alembic, long à importer) ne sert qu'aux commandes `flask db`
+    if os.getenv('FLASK_RUN_FROM_CLI') == 'true':
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    
     # Configure Flask-Login
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
@@ -50,9 +60,15 @@ def create_app():
         firebase = FirebaseService(app.config.get('APP_ID', 'default-app-id'))
         return firebase.get_user(user_id)
     
-    # Initialise Firebase (sera fait dans config.py)
+    # Initialise Firebase (sera fait dans config.py) ; avec FIRESTORE_BACKEND=memory,
+    # les fichiers du backend en mémoire sont servis localement
     from app.config import init_firebase
-    init_firebase()
+    from app.services.firebase_service import FIRESTORE_BACKEND
+    if FIRESTORE_BACKEND == 'memory':
+        from app.services.memory_backend import register_memory_storage_route
+        register_memory_storage_route(app)
+    else:
+        init_firebase()
     
     # Enregistre les blueprints
     from app.routes import admin, client, api, hotels, auth, trips, bookings, webhooks, partners, pois, public
@@ -69,6 +85,13 @@ def create_app():
     app.register_blueprint(partners.bp)
     app.register_blueprint(pois.bp)
     
+    # Instrumentation : Server-Timing, /metrics et journal des requêtes lentes
+    from app.services.instrumentation import init_instrumentation
+    init_instrumentation(app)
+    
+    if start_background:
+        start_background_services(app)
+    
     # Route racine
     @app.route('/')
     def index():
@@ -108,3 +131,24 @@ def create_app():
         return render_template('errors/500.html'), 500
     
     return app
+
+
+def start_background_services(app):
+    """
+    Démarre les threads de fond du process web (une fois par process) :
+    à appeler dans chaque worker, jamais dans un master gunicorn avant le fork
+    """
+    # File de tâches : worker embarqué sauf si un process `worker` dédié est déployé
+    if os.getenv('JOBS_EMBEDDED_WORKER', 'true').lower() != 'false':
+        from app.services.job_queue import start_embedded_worker
+        start_embedded_worker(app)
+    else:
+        from app.services.job_queue import require_shared_queue_path
+        try:
+            require_shared_queue_path()
+        except RuntimeError as e:
+            app.logger.error(f"❌ File de tâches non partagée, les tâches ne seront pas traitées: {e}")
+    
+    # Écoutes Firestore (on_snapshot) qui invalident les caches en mémoire du process
+    from app.services.change_feed import start_change_feed
+    start_change_feed(app)
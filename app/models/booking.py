@@ -14,12 +14,14 @@ class TripBooking:
                  payment_status='pending', stripe_session_id='', stripe_payment_intent_id='',
                  access_token='', status='pending', current_participants=1,
                  join_code='', leader_details=None,
-                 force_reveal=False, trip_snapshot=None,
+                 pilot_count=None, passenger_count=None,
+                 force_reveal=False, trip_snapshot=None, map_render_attempt_at=None,
                  created_at=None, updated_at=None):
         self.booking_id = booking_id
         self.trip_template_id = trip_template_id
         self.organizer_user_id = organizer_user_id
         self.trip_snapshot = trip_snapshot
+        self.map_render_attempt_at = map_render_attempt_at  # Dernier rendu de carte planifié (epoch)
         
         # Dates
         self.start_date = start_date
@@ -28,6 +30,10 @@ class TripBooking:
         # Participants
         self.total_participants = total_participants
         self.current_participants = current_participants
+        # Maintenus par FirebaseService (transaction participant) ; None tant
+        # qu'aucun participant n'a été ajouté par create_participant
+        self.pilot_count = pilot_count
+        self.passenger_count = passenger_count
         self.join_code = join_code
         self.leader_details = leader_details or {}
         
@@ -66,7 +72,7 @@ class TripBooking:
     
     def to_dict(self):
         """Convertit en dictionnaire pour Firebase"""
-        return {
+        data = {
             'tripTemplateId': self.trip_template_id,
             'organizerUserId': self.organizer_user_id,
             'startDate': self.start_date,
@@ -88,6 +94,10 @@ class TripBooking:
             'createdAt': self.created_at,
             'updatedAt': self.updated_at
         }
+        if self.pilot_count is not None and self.passenger_count is not None:
+            data['pilotCount'] = self.pilot_count
+            data['passengerCount'] = self.passenger_count
+        return data
     
     @staticmethod
     def from_dict(booking_id, data):
@@ -100,6 +110,8 @@ class TripBooking:
             end_date=data.get('endDate', ''),
             total_participants=data.get('totalParticipants', 1),
             current_participants=data.get('currentParticipants', 1),
+            pilot_count=data.get('pilotCount'),
+            passenger_count=data.get('passengerCount'),
             join_code=data.get('joinCode', ''),
             leader_details=data.get('leaderDetails', {}),
             total_amount=data.get('totalAmount', 0),
@@ -114,6 +126,7 @@ class TripBooking:
             status=data.get('status', 'pending'),
             force_reveal=data.get('forceReveal', False),
             trip_snapshot=data.get('tripSnapshot', None),
+            map_render_attempt_at=data.get('mapRenderAttemptAt'),
             created_at=data.get('createdAt'),
             updated_at=data.get('updatedAt')
         )
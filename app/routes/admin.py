@@ -10,6 +10,10 @@ import time
 import uuid
 from datetime import datetime, timedelta
 from app.models.booking import TripBooking
+from app.services.page_cache import get_page_cache
+from app.services.published_trip_service import materialize_public_view
+from app.services.trip_counters import get_trip_stats
+from app.services.trip_snapshot import build_trip_snapshot
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -508,20 +512,13 @@ def upload_day_gpx(trip_id, day_id):
 
 @bp.route('/api/proxy-gpx', methods=['GET'])
 def proxy_gpx():
-    """Proxy pour télécharger le contenu GPX (contourne CORS)"""
+    """Proxy pour télécharger le contenu GPX (contourne CORS, servi depuis le cache disque)"""
     url = request.args.get('url')
     if not url:
         return jsonify({'error': 'URL manquante'}), 400
         
-    try:
-        import requests
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        return response.content, 200, {'Content-Type': 'application/xml'}
-    except Exception as e:
-        print(f"Erreur proxy GPX: {e}")
-        return jsonify({'error': str(e)}), 500
+    from app.services.asset_proxy import get_asset_proxy
+    return get_asset_proxy().fetch(url, default_content_type='application/xml')
 
 
 @bp.route('/login', methods=['GET', 'POST'])
@@ -616,11 +613,23 @@ def customer_details(customer_id):
     user_id = get_current_user_id()
     available_trips = firebase.get_user_trips(user_id)
     
-    # Calcule la durée de chaque voyage (en jours)
+    # Durée de chaque voyage : agrégats stockés sur le voyage (totalNights / dayCount),
+    # calculés une fois pour les voyages créés avant leur introduction
+    trips_by_id = {}
     for trip in available_trips:
-        days = firebase.get_trip_days(user_id, trip['id'])
-        total_nights = sum(day.get('nights', 1) for day in days)
-        trip['duration'] = total_nights if total_nights > 0 else len(days)
+        if 'dayCount' not in trip:
+            trip.update(firebase.refresh_trip_aggregates(user_id, trip['id']) or {})
+        total_nights = trip.get('totalNights', 0)
+        trip['duration'] = total_nights if total_nights > 0 else trip.get('dayCount', 0)
+        trips_by_id[trip['id']] = trip
+    
+    # Chargement groupé des réservations et des templates publiés manquants
+    bookings = firebase.get_bookings_by_ids([a['bookingId'] for a in assigned_trips if a.get('bookingId')])
+    missing_template_ids = [a['tripId'] for a in assigned_trips
+                            if a.get('tripId') and a['tripId'] not in trips_by_id]
+    published_templates = firebase.get_documents_by_ids(
+        f'artifacts/{firebase.app_id}/publishedTrips', missing_template_ids
+    )
     
     # Enrichissement avec les données Booking réelles et GPX hérités
     enriched_trips = []
@@ -629,14 +638,7 @@ def customer_details(customer_id):
         enriched = dict(trip_assign)
         
         # 1. Récupérer le Booking associé (s'il existe)
-        booking = None
-        if trip_assign.get('bookingId'):
-            booking = firebase.get_booking(trip_assign['bookingId'])
-        
-        # Si pas de bookingId dans l'assignation, chercher par dates/template (fallback legacy)
-        if not booking and trip_assign.get('tripId'):
-             # TODO: Logique de recherche fallback si nécessaire
-             pass
+        booking = bookings.get(trip_assign.get('bookingId'))
              
         if booking:
             # Injecter les infos financières du booking (Objet TripBooking)
@@ -651,40 +653,24 @@ def customer_details(customer_id):
             except Exception as e:
                 print(f"Erreur conversion legacy booking: {e}")
         
-        # 2. Récupérer les GPX du Template (Héritage)
         # 2. Récupérer les GPX du Template (Héritage)
         standard_gpx = []
         if trip_assign.get('tripId'):
             # tripId ici est l'ID du Template (trip_template_id)
             tid = trip_assign['tripId']
+            trip_template = trips_by_id.get(tid)
             
-            # CHECK EXISTENCE EXPLICITE (pour Admin)
-            trip_template = firebase.get_trip(user_id, tid)
-            if not trip_template:
-                 # Check Published
-                 trip_template = firebase.get_published_trip(tid)
-                 
-            if not trip_template:
+            if trip_template:
+                # Index GPX stocké sur le voyage
+                standard_gpx = [{'name': g['name'], 'url': g['url'], 'day': g['day']}
+                                for g in trip_template.get('gpxIndex', [])]
+            elif tid in published_templates:
+                # Voyage publié : les étapes sont copiées dans le document
+                standard_gpx = [{'name': g['name'], 'url': g['url'], 'day': g['day']}
+                                for g in firebase.compute_trip_aggregates(published_templates[tid].get('days', []))['gpxIndex']]
+            else:
                 enriched['is_broken'] = True
                 enriched['error_msg'] = "TEMPLATE SUPPRIMÉ"
-            else:
-                template_days = trip_template.get('days', [])
-                for i, day in enumerate(template_days, 1):
-                    if day.get('gpxUrl'):
-                        # Le client veut le nom du fichier GPX (ex: "J1_Trip.gpx")
-                        # (stocké par le dashboard JS ou propriété du day)
-                        file_name = day.get('gpxFile')
-                        
-                        # Fallback si pas de nom de fichier stocké
-                        if not file_name:
-                             # On essaie de faire joli, sinon "GPX Jour X"
-                             file_name = f"Jour {i}"
-                             
-                        standard_gpx.append({
-                            'name': file_name,
-                            'url': day['gpxUrl'],
-                            'day': f"Jour {i}"
-                        })
         enriched['standard_gpx'] = standard_gpx
         
         enriched_trips.append(enriched)
@@ -721,6 +707,33 @@ def api_toggle_booking_reveal(booking_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/api/bookings/<booking_id>/snapshot', methods=['POST'])
+@login_required
+def api_rebuild_booking_snapshot(booking_id):
+    """API: Reconstruit le snapshot du voyage d'une réservation (anciennes réservations ou voyage modifié)"""
+    firebase = get_firebase_service()
+    try:
+        booking = firebase.get_booking(booking_id)
+        if not booking:
+            return jsonify({'error': 'Réservation introuvable'}), 404
+
+        previous = booking.trip_snapshot or {}
+        trip_id = previous.get('originalTemplateId') or booking.trip_template_id
+        snapshot = build_trip_snapshot(
+            firebase, get_current_user_id(), trip_id,
+            api_key=current_app.config.get('GOOGLE_MAPS_API_KEY', '')
+        )
+        if not snapshot:
+            return jsonify({'error': 'Voyage introuvable'}), 404
+
+        changed = snapshot['contentHash'] != previous.get('contentHash')
+        if changed and not firebase.update_booking(booking_id, {'tripSnapshot': snapshot}):
+            return jsonify({'error': 'Erreur update'}), 500
+
+        return jsonify({'success': True, 'changed': changed, 'contentHash': snapshot['contentHash']})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/api/bookings/<booking_id>/financials', methods=['POST'])
 @login_required
 def api_update_booking_financials(booking_id):
@@ -1042,14 +1055,14 @@ def api_assign_trip_to_customer(customer_id):
             'accessToken': str(uuid.uuid4()), # Token d'accès public (mais secret) pour l'organisateur
             
             # --- SNAPSHOT POUR PERSONNALISATION ---
-            'tripSnapshot': {
-                'name': trip_details.get('name', ''),
-                'days': trip_details.get('days', []),
-                'pois': trip_details.get('pois', []), # Si les POIs sont globaux au voyage
-                'description': trip_details.get('description', ''),
-                'difficulty': trip_details.get('difficulty', ''),
-                'duration': trip_details.get('duration', ''),
-                # On conserve une référence au template pour info
+            # Autonome (jours, hôtels, restaurants, POIs, GPX) : le roadbook ne relit rien
+            'tripSnapshot': (trip_details and build_trip_snapshot(
+                firebase, organizer_id, data['tripId'],
+                api_key=current_app.config.get('GOOGLE_MAPS_API_KEY', ''),
+                trip=trip_details
+            )) or {
+                'name': data['tripName'],
+                'days': [],
                 'originalTemplateId': data['tripId'],
                 'snapshottedAt': datetime.now().isoformat()
             }
@@ -1352,11 +1365,14 @@ def publish_trip(trip_id):
             'checkouts': 0
         }
     }
+    published_data['partnerIds'] = trip.get('partnerIds', [])
+    published_data.update(materialize_public_view(firebase, days, published_data['partnerIds']))
     
     # Publie le voyage
     try:
         success = firebase.create_published_trip(slug, published_data)
         if success:
+            get_page_cache().purge(slug)
             # Met à jour le voyage original avec le slug
             firebase.update_trip(user_id, trip_id, {'publishedSlug': slug})
             return jsonify({
@@ -1393,6 +1409,7 @@ def unpublish_trip(trip_id):
         # Supprime le voyage publié
         success = firebase.delete_published_trip(slug)
         if success:
+            get_page_cache().purge(slug)
             # Retire le slug du voyage original ET met isPublished à False
             firebase.update_trip(user_id, trip_id, {
                 'publishedSlug': None,
@@ -1430,6 +1447,22 @@ def get_published_trips():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/api/published-trips/<slug>/stats', methods=['GET'])
+def get_published_trip_stats(slug):
+    """API: Compteurs agrégés (vues, checkouts) d'un voyage publié"""
+    error = require_user()
+    if error:
+        return error
+    
+    firebase = get_firebase_service()
+    
+    return jsonify({
+        'success': True,
+        'slug': slug,
+        'stats': get_trip_stats(firebase, slug)
+    })
+
+
 # ============================================
 # TÉLÉCHARGEMENT PHOTOS GOOGLE PLACES
 # ============================================
@@ -2789,7 +2822,6 @@ def api_delete_hotel_review(hotel_id, review_id):
 def api_import_hotels_from_excel():
     """API: Importe des hôtels depuis un fichier Excel avec parsing Gemini AI (Streaming)"""
     user_id = get_current_user_id()
-    firebase = get_firebase_service()
     
     # Vérification du fichier Excel
     if 'file' not in request.files:
@@ -2811,6 +2843,7 @@ def api_import_hotels_from_excel():
     
     download_photos = request.form.get('downloadPhotos', 'false').lower() == 'true'
     skip_duplicates = request.form.get('skipDuplicates', 'true').lower() == 'true'
+    force_refresh = request.form.get('forceRefresh', 'false').lower() == 'true'
     
     # Lecture du fichier en mémoire
     try:
@@ -2818,242 +2851,116 @@ def api_import_hotels_from_excel():
     except Exception as e:
         return jsonify({'success': False, 'error': f'Erreur lecture fichier: {str(e)}'}), 400
 
-    from app.services.gemini_service import parse_excel_file_with_gemini
-    from flask import Response, stream_with_context
-    import json
-    import queue
-    import threading
-    import requests
-    from datetime import datetime
+    # L'import (Gemini + sauvegarde + photos) tourne dans la file de tâches :
+    # la requête rend la main immédiatement, le client suit /api/jobs/<job_id>
+    from app.services.job_queue import get_job_store
+    
+    job_id = get_job_store().enqueue('hotel_import', {
+        'userId': user_id,
+        'filename': file.filename,
+        'options': {
+            'partnerId': partner_id,
+            'downloadPhotos': download_photos,
+            'skipDuplicates': skip_duplicates,
+            'forceRefresh': force_refresh
+        }
+    }, data=file_bytes)
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('admin.api_get_job', job_id=job_id),
+        'events_url': url_for('admin.api_job_events', job_id=job_id)
+    }), 202
 
+
+@bp.route('/api/gps-guides/pregenerate', methods=['POST'])
+@login_required
+def api_pregenerate_gps_guides():
+    """API: Lance le préchauffage des guides GPS (appareils populaires) en tâche de fond"""
+    from app.services.gps_guide_service import enqueue_gps_guide_pregeneration
     
-    def generate():
-        try:
-            # 1. Parsing avec Gemini (Streaming de la progression)
-            yield json.dumps({'progress': 5, 'message': 'Lecture du fichier...'}) + '\n'
-            
-            q = queue.Queue()
-            
-            def worker():
-                try:
-                    def cb(msg, pct):
-                        q.put({'type': 'progress', 'message': msg, 'percent': pct})
-                        
-                    data = parse_excel_file_with_gemini(file_bytes, file.filename, progress_callback=cb)
-                    q.put({'type': 'result', 'data': data})
-                except Exception as e:
-                    q.put({'type': 'error', 'error': str(e)})
-            
-            t = threading.Thread(target=worker)
-            t.start()
-            
-            # Récupération des hôtels existants pour détection doublons
-            existing_hotels_map = {}
-            try:
-                all_hotels = firebase.get_hotels(user_id)
-                for h in all_hotels:
-                    key = (h.get('name', '').lower().strip(), h.get('city', '').lower().strip())
-                    existing_hotels_map[key] = h
-            except Exception as e:
-                current_app.logger.error(f"Erreur chargement cache hôtels: {e}")
+    data = request.get_json(silent=True) or {}
+    queries = data.get('queries')
+    if queries is not None and not isinstance(queries, list):
+        return jsonify({'success': False, 'error': 'queries doit être une liste'}), 400
+    
+    job_id = enqueue_gps_guide_pregeneration(queries=queries, force=bool(data.get('force', False)))
+    if not job_id:
+        return jsonify({'success': False, 'error': 'File de tâches indisponible'}), 503
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status_url': url_for('admin.api_get_job', job_id=job_id),
+        'events_url': url_for('admin.api_job_events', job_id=job_id)
+    }), 202
 
-            hotels_data = None
-            
-            while True:
-                try:
-                    item = q.get(timeout=0.1) # Non-blocking wait
-                    if item['type'] == 'progress':
-                        yield json.dumps({'progress': item['percent'], 'message': item['message']}) + '\n'
-                    elif item['type'] == 'result':
-                        hotels_data = item['data']
-                        break
-                    elif item['type'] == 'error':
-                        yield json.dumps({'error': item['error']}) + '\n'
-                        return
-                except queue.Empty:
-                    continue
-            
-            t.join()
-            
-            if not hotels_data:
-                return
 
-            yield json.dumps({'progress': 80, 'message': 'Sauvegarde des données...'}) + '\n'
-            
-            # 2. Sauvegarde des hôtels (Streaming)
-            imported_count = 0
-            duplicates_count = 0
-            updated_count = 0
-            errors_count = 0
-            
-            total_hotels = len(hotels_data)
-            
-            for i, hotel_data in enumerate(hotels_data):
-                # Progression sauvegarde
-                if i % 5 == 0:
-                    pct = 80 + int((i / total_hotels) * 15)
-                    yield json.dumps({'progress': pct, 'message': f'Sauvegarde hôtel {i+1}/{total_hotels}...'}) + '\n'
-                
-                try:
-                    name = hotel_data.get('name', '').strip()
-                    city = hotel_data.get('city', '').strip()
-                    key = (name.lower(), city.lower())
-                    
-                    hotel_id = None
-                    existing = existing_hotels_map.get(key)
-                    
-                    if skip_duplicates and existing:
-                        duplicates_count += 1
-                        hotel_id = existing['id']
-                        
-                        # UPDATE: On met à jour le partenaire si pas déjà présent
-                        updates = {}
-                        if partner_id:
-                            current_partners = existing.get('partnerIds', [])
-                            if partner_id not in current_partners:
-                                current_partners.append(partner_id)
-                                updates['partnerIds'] = current_partners
-                        
-                        if updates:
-                            firebase.update_hotel(user_id, hotel_id, updates)
-                            updated_count += 1
-                            
-                    else:
-                        # CREATE
-                        hotel_dict = {
-                            'name': name,
-                            'city': city,
-                            'address': hotel_data.get('address'),
-                            'description': hotel_data.get('description'),
-                            'type': hotel_data.get('type', 'hotel'),
-                            'partnerIds': [partner_id] if partner_id else [],
-                            'contact': {
-                                'phone': hotel_data.get('phone'),
-                                'website': hotel_data.get('website')
-                            },
-                            'photos': []
-                        }
-                        
-                        hotel_id = firebase.create_hotel(user_id, hotel_dict)
-                        imported_count += 1
-                        
-                        # Ajout au cache pour les doublons INTRA-fichier
-                        hotel_dict['id'] = hotel_id
-                        existing_hotels_map[key] = hotel_dict
-
-                    # Téléchargement photos (si demandé)
-                    if download_photos and hotel_data.get('website'):
-                        try:
-                            # Vérifie si l'hôtel a déjà des photos (pour éviter de re-télécharger inutilement si update)
-                            current_hotel = existing_hotels_map.get(key)
-                            if current_hotel and current_hotel.get('photos') and len(current_hotel.get('photos')) > 0:
-                                # Déjà des photos, on skip pour économiser l'API
-                                continue
-                                
-                            # 1. Recherche du Place ID
-                            search_url = 'https://maps.googleapis.com/maps/api/place/findplacefromtext/json'
-                            search_params = {
-                                'input': f"{name} {city}",
-                                'inputtype': 'textquery',
-                                'fields': 'place_id',
-                                'key': current_app.config.get('GOOGLE_MAPS_API_KEY')
-                            }
-                            
-                            response = requests.get(search_url, params=search_params, timeout=10)
-                            search_results = response.json()
-                            
-                            if search_results.get('status') == 'OK' and search_results.get('candidates'):
-                                place_id = search_results['candidates'][0]['place_id']
-                                
-                                # 2. Récupération des photos (max 5)
-                                details_url = 'https://maps.googleapis.com/maps/api/place/details/json'
-                                details_params = {
-                                    'place_id': place_id,
-                                    'fields': 'photos',
-                                    'key': current_app.config.get('GOOGLE_MAPS_API_KEY')
-                                }
-                                
-                                # Gallery Images
-                                gallery_images_json = request.form.get('gallery_images')
-                                gallery_images = []
-                                
-                                if gallery_images_json:
-                                    try:
-                                        import json
-                                        gallery_images = json.loads(gallery_images_json)
-                                    except:
-                                         # Fallback if comma separated
-                                         gallery_images = gallery_images_json.split(',')
-                                         
-                                # Ensure it's always a list even if empty
-                                if not isinstance(gallery_images, list):
-                                    gallery_images = []
-                                details_response = requests.get(details_url, params=details_params, timeout=10)
-                                details_data = details_response.json()
-                                
-                                if details_data.get('status') == 'OK' and 'photos' in details_data.get('result', {}):
-                                    photos = details_data['result']['photos'][:5]
-                                    photo_urls = []
-                                    
-                                    for idx, photo in enumerate(photos):
-                                        photo_reference = photo['photo_reference']
-                                        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=1600&photoreference={photo_reference}&key={current_app.config.get('GOOGLE_MAPS_API_KEY')}"
-                                        
-                                        # Téléchargement de l'image
-                                        img_response = requests.get(photo_url, timeout=20)
-                                        if img_response.status_code == 200:
-                                            # Upload vers Firebase Storage
-                                            timestamp = int(datetime.now().timestamp() * 1000)
-                                            # Nom de fichier sécurisé
-                                            safe_name = "".join([c for c in name if c.isalnum()]).lower()
-                                            file_path = f"users/{user_id}/hotels/{safe_name}_{timestamp}_{idx}.jpg"
-                                            
-                                            public_url = firebase.upload_file_from_bytes(
-                                                img_response.content, 
-                                                file_path, 
-                                                content_type='image/jpeg'
-                                            )
-                                            
-                                            if public_url:
-                                                photo_urls.append(public_url)
-                                    
-                                    # 3. Mise à jour de l'hôtel avec les URLs des photos
-                                    if photo_urls:
-                                        # On fusionne avec les existantes si il y en a (cas rare ici car on a checké avant)
-                                        current_photos = []
-                                        if existing:
-                                            # Re-fetch pour être sûr ou utiliser cache
-                                            current_photos = existing.get('photos', [])
-                                            
-                                        new_photos_list = current_photos + photo_urls
-                                        # Update dans Firebase
-                                        firebase.update_hotel(user_id, hotel_id, {'photos': new_photos_list})
-                                        # Update cache
-                                        if existing:
-                                            existing['photos'] = new_photos_list
-                                            
-                                        current_app.logger.info(f"📸 {len(photo_urls)} photos téléchargées pour {name}")
-                            
-                        except Exception as e:
-                            current_app.logger.error(f"⚠️ Erreur téléchargement photos pour {name}: {e}")
-                            pass
-                        
-                except Exception as e:
-                    current_app.logger.error(f"Erreur import hôtel {hotel_data.get('name')}: {e}")
-                    errors_count += 1
+@bp.route('/api/metrics/slow-requests', methods=['GET'])
+@login_required
+def api_slow_requests():
+    """API: Routes les plus lentes du worker courant (durées et appels moyens par requête)"""
+    from app.services.instrumentation import get_slow_request_report
+    
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'success': True, **get_slow_request_report(limit)})
+
+
+@bp.route('/api/change-feed', methods=['GET'])
+@login_required
+def api_change_feed_status():
+    """API: État des écoutes Firestore du worker courant (collections, événements, relances)"""
+    from app.services.change_feed import get_change_feed
+    
+    return jsonify({'success': True, **get_change_feed().status()})
+
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def api_get_job(job_id):
+    """API: État d'une tâche de fond (progression, résultat ou erreur)"""
+    from app.services.job_queue import get_job_store
+    
+    job = get_job_store().get(job_id)
+    if not job:
+        return jsonify({'success': False, 'error': 'Tâche introuvable'}), 404
+    
+    job.pop('checkpoint', None)
+    return jsonify({'success': True, 'job': job})
+
+
+@bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+@login_required
+def api_job_events(job_id):
+    """API: Progression d'une tâche en Server-Sent Events (le navigateur se reconnecte seul)"""
+    from app.services.job_queue import get_job_store, STATUS_DONE, STATUS_FAILED
+    from flask import Response
+    import json
+    
+    store = get_job_store()
+    
+    def events():
+        last_update = None
+        # Connexion courte : ne bloque pas un worker gunicorn pendant tout l'import
+        for _ in range(25):
+            job = store.get(job_id)
+            if not job:
+                yield f"event: error\ndata: {json.dumps({'error': 'Tâche introuvable'})}\n\n"
+                return
             
-            yield json.dumps({'progress': 100, 'message': 'Terminé !', 'result': {
-                'success': True,
-                'imported': imported_count,
-                'duplicates': duplicates_count,
-                'errors': errors_count
-            }}) + '\n'
+            if job['updatedAt'] != last_update:
+                last_update = job['updatedAt']
+                job.pop('checkpoint', None)
+                yield f"data: {json.dumps(job)}\n\n"
             
-        except Exception as e:
-            current_app.logger.error(f"Erreur globale import: {e}")
-            yield json.dumps({'error': str(e)}) + '\n'
-
-    return Response(stream_with_context(generate()), mimetype='application/json')
+            if job['status'] in (STATUS_DONE, STATUS_FAILED):
+                return
+            time.sleep(1)
+        
+        yield "retry: 1000\n\n"
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 
@@ -3304,9 +3211,11 @@ def api_generate_teaser(trip_id):
         
         trip['days'] = enriched_days
         
-        # 3. Generate
+        # 3. Generate (réponse en cache sauf si une nouvelle version est demandée)
         from app.services.gemini_service import generate_trip_teaser
-        teaser_text = generate_trip_teaser(trip)
+        data = request.get_json(silent=True) or {}
+        force_refresh = bool(data.get('forceRefresh')) or request.args.get('refresh') == '1'
+        teaser_text = generate_trip_teaser(trip, force_refresh=force_refresh)
         
         return jsonify({'teaser': teaser_text})
         
@@ -3314,6 +3223,23 @@ def api_generate_teaser(trip_id):
         current_app.logger.error(f"Error generating teaser: {e}")
         return jsonify({'error': str(e)}), 500
 
+
+@bp.route('/api/llm-cache/stats', methods=['GET'])
+@login_required
+def api_llm_cache_stats():
+    """API: Statistiques du cache des réponses Gemini (hit-rate par catégorie)"""
+    from app.services.llm_cache import get_llm_cache
+    return jsonify({'success': True, 'stats': get_llm_cache().get_stats()})
+
+
+@bp.route('/api/llm-cache', methods=['DELETE'])
+@login_required
+def api_clear_llm_cache():
+    """API: Vide le cache Gemini (optionnel: ?namespace=teaser)"""
+    from app.services.llm_cache import get_llm_cache
+    get_llm_cache().clear(request.args.get('namespace'))
+    return jsonify({'success': True})
+
 @bp.route('/trips/<trip_id>/publish', methods=['GET'])
 @login_required
 def publish_trip_view(trip_id):
@@ -3536,11 +3462,15 @@ def publish_trip_action(trip_id):
                 if lat and lng:
                      map_points.append(f"{lat},{lng}")
 
-        # Generate Map URL
+        # Generate Map Image : rendue une fois ici et stockée (repli : URL Google Static Maps)
         api_key = current_app.config.get('GOOGLE_MAPS_API_KEY', '')
         if map_points:
+            from app.services.map_renderer import store_route_map
             path_str = "|".join(map_points)
-            publish_data['mapImage'] = f"https://maps.googleapis.com/maps/api/staticmap?size=600x400&maptype=terrain&path=color:0xd946efff|weight:4|{path_str}&key={api_key}"
+            publish_data['mapImage'] = (
+                store_route_map(firebase, map_points, f"maps/published/{publish_data['slug']}")
+                or f"https://maps.googleapis.com/maps/api/staticmap?size=600x400&maptype=terrain&path=color:0xd946efff|weight:4|{path_str}&key={api_key}"
+            )
         else:
             # Fallback
             publish_data['mapImage'] = 'https://maps.googleapis.com/maps/api/staticmap?center=France&zoom=5&size=600x400&key=' + api_key
@@ -3555,6 +3485,10 @@ def publish_trip_action(trip_id):
         
         publish_data['highlights'] = trip.get('highlights', [])
         
+        # Vue publique dénormalisée (POIs + partenaires figés, une lecture groupée)
+        publish_data['partnerIds'] = trip.get('partnerIds', [])
+        publish_data.update(materialize_public_view(firebase, days, publish_data['partnerIds']))
+        
         # Public Days (Sanitized)
         public_days = []
         for d in days:
@@ -3566,7 +3500,7 @@ def publish_trip_action(trip_id):
                     if isinstance(item, dict):
                         day_pois.append(item)
                     elif isinstance(item, str):
-                        poi = firebase.get_poi(item)
+                        poi = publish_data['publicView']['pois'].get(item)
                         if poi:
                             day_pois.append(poi)
 
@@ -3582,10 +3516,14 @@ def publish_trip_action(trip_id):
                  'poi_objects': day_pois # ⭐ Save full objects for slideshow
              })
         publish_data['days'] = public_days
-        publish_data['partnerIds'] = trip.get('partnerIds', [])
         
     firebase.update_published_trip(publish_data['slug'], publish_data)
     
+    # Purge des pages publiques en cache (nouveau slug + ancien si renommé)
+    get_page_cache().purge(publish_data['slug'])
+    if trip and trip.get('publishedSlug') != publish_data['slug']:
+        get_page_cache().purge(trip.get('publishedSlug'))
+    
     # 2. Update Internal Trip Status AND Stats
     internal_update = {
         'isPublished': True, 
@@ -3614,6 +3552,7 @@ def unpublish_trip_action(trip_id):
     trip = firebase.get_trip(user_id, trip_id)
     if trip and trip.get('publishedSlug'):
         firebase.update_published_trip(trip['publishedSlug'], {'isActive': False})
+        get_page_cache().purge(trip['publishedSlug'])
         
     firebase.update_trip(user_id, trip_id, {'isPublished': False})
     
@@ -8,7 +8,7 @@ import uuid
 import os
 
 from app.services import FirebaseService
-from app.services.email_service import EmailService
+from app.services.email_service import get_email_service
 from app.config import Config
 
 bp = Blueprint('bookings', __name__, url_prefix='/bookings')
@@ -136,8 +136,7 @@ def manage_participants(booking_id):
             return jsonify({'error': 'Nombre maximum de participants atteint'}), 400
         
         # Vérifie si l'email n'est pas déjà dans les participants
-        participants = firebase.get_booking_participants(booking_id)
-        if any(p.email == email for p in participants):
+        if firebase.participant_email_exists(booking_id, email):
             return jsonify({'error': 'Cet email est déjà dans le groupe'}), 400
         
         # Crée le participant
@@ -158,18 +157,14 @@ def manage_participants(booking_id):
             'addedByUserId': current_user.user_id
         }
         
-        participant_id = firebase.create_participant(booking_id, participant_data)
+        # Crée le participant (compteurs + capacité vérifiés dans la même transaction)
+        participant_id = firebase.create_participant(booking_id, participant_data, enforce_capacity=True)
         
         if participant_id:
-            # Met à jour le compteur de participants
-            firebase.update_booking(booking_id, {
-                'currentParticipants': len(participants) + 1
-            })
-            
             # Envoie email d'invitation
             try:
                 from app.models import Participant
-                email_service = EmailService(os.getenv('EMAIL_SERVICE', 'mock'))
+                email_service = get_email_service()
                 base_url = os.getenv('BASE_URL', 'http://localhost:5000')
                 trip = firebase.get_published_trip(booking.trip_template_id)
                 
@@ -192,13 +187,17 @@ def manage_participants(booking_id):
                     invitation_token=participant_data['invitationToken'],
                     base_url=base_url
                 )
-                print(f"📧 Email d'invitation envoyé à {email}")
+                print(f"📧 Email d'invitation mis en file pour {email}")
             except Exception as e:
                 print(f"⚠️  Erreur envoi email invitation: {e}")
             
             flash(f'{first_name} {last_name} a été ajouté au groupe!', 'success')
             return jsonify({'success': True, 'participant_id': participant_id})
         else:
+            # Groupe complété entre-temps par un ajout concurrent ?
+            booking = firebase.get_booking(booking_id)
+            if booking and not booking.has_available_slots():
+                return jsonify({'error': 'Nombre maximum de participants atteint'}), 400
             return jsonify({'error': 'Erreur lors de l\'ajout du participant'}), 500
     
     # GET: Liste des participants
@@ -223,8 +222,7 @@ def remove_participant(booking_id, participant_id):
         return jsonify({'error': 'Non autorisé'}), 403
     
     # Récupère le participant
-    participants = firebase.get_booking_participants(booking_id)
-    participant = next((p for p in participants if p.participant_id == participant_id), None)
+    participant = firebase.get_participant(booking_id, participant_id)
     
     if not participant:
         return jsonify({'error': 'Participant introuvable'}), 404
@@ -233,13 +231,8 @@ def remove_participant(booking_id, participant_id):
     if participant.role == 'organizer':
         return jsonify({'error': 'Impossible de supprimer l\'organisateur'}), 400
     
-    # Suppression
+    # Suppression (compteurs du booking décrémentés dans la même transaction)
     if firebase.delete_participant(booking_id, participant_id):
-        # Met à jour le compteur de participants
-        firebase.update_booking(booking_id, {
-            'currentParticipants': len(participants) - 1
-        })
-        
         flash('Participant retiré du groupe.', 'success')
         return jsonify({'success': True})
     else:
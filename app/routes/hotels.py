@@ -2,7 +2,9 @@
 Routes pour la gestion des hôtels via l'API RateHawk
 """
 from flask import Blueprint, jsonify, request
-from app.services.ratehawk_service import get_ratehawk_service
+from app.services.ratehawk_service import RateHawkService, get_ratehawk_service
+from app.services.firebase_service import FirebaseService
+from app.config import Config
 import logging
 
 # Configuration du logger
@@ -233,6 +235,117 @@ def prebook_rate():
         }), 500
 
 
+def get_current_user_id():
+    """Retourne l'userId actuel (fixe pour l'admin)"""
+    return 'sam-user'
+
+
+def _expected_prices_from_trip(trip_id, room_type='double'):
+    """
+    Calcule le prix attendu de chaque étape d'un voyage depuis le
+    defaultPricing des hôtels de la banque (prix par nuit x nuits)
+    
+    Args:
+        trip_id (str): ID du voyage
+        room_type (str): 'double' ou 'solo'
+    
+    Returns:
+        dict: {day_id: {'expected_price': float, 'label': str}}
+    """
+    firebase = FirebaseService(Config.APP_ID)
+    days = firebase.get_trip_days_with_hotels(get_current_user_id(), trip_id)
+    price_field = 'priceSolo' if room_type == 'solo' else 'priceDouble'
+    
+    expected = {}
+    for day in days:
+        pricing = day.get('hotel', {}).get('defaultPricing', {})
+        nightly = pricing.get(price_field) or day.get(price_field) or 0
+        expected[day['id']] = {
+            'expected_price': float(nightly) * int(day.get('nights', 1) or 1),
+            'label': f"{day.get('dayName', '')} - {day.get('hotelName', '')}".strip(' -')
+        }
+    return expected
+
+
+@bp.route('/prebook/batch', methods=['POST'])
+def prebook_rates_batch():
+    """
+    Pré-réservation en parallèle de toutes les étapes d'une réservation
+    avec rapport des écarts de prix par rapport au defaultPricing du voyage
+    
+    Request body (JSON):
+        {
+            "trip_id": "...",              (optionnel, pour les prix attendus)
+            "room_type": "double",         (optionnel: double | solo)
+            "price_increase_percent": 0,
+            "timeout": 90,                 (optionnel, en secondes)
+            "stages": [
+                {"stage_id": "<day_id>", "rate_hash": "...", "rate_key": "...",
+                 "expected_price": 180.0}  (expected_price optionnel si trip_id)
+            ]
+        }
+    
+    Returns:
+        JSON: Rapport consolidé (200 si tout est OK, 207 si échec partiel)
+        
+    Example:
+        POST /api/hotels/prebook/batch
+    """
+    try:
+        data = request.get_json() or {}
+        stages = data.get('stages')
+        
+        if not stages or not isinstance(stages, list):
+            return jsonify({
+                'status': 'error',
+                'message': 'Missing required field: stages'
+            }), 400
+        
+        # Timeout global optionnel, borné à TIMEOUT_PREBOOK_BATCH
+        timeout = data.get('timeout')
+        if timeout is not None:
+            try:
+                timeout = float(timeout)
+            except (TypeError, ValueError):
+                timeout = None
+            if timeout is None or not 0 < timeout < float('inf'):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Invalid field: timeout (positive number of seconds expected)'
+                }), 400
+            timeout = min(timeout, RateHawkService.TIMEOUT_PREBOOK_BATCH)
+        
+        # Complète les prix attendus depuis le voyage
+        if data.get('trip_id'):
+            expected = _expected_prices_from_trip(data['trip_id'], data.get('room_type', 'double'))
+            for stage in stages:
+                reference = expected.get(stage.get('stage_id'))
+                if reference:
+                    stage.setdefault('expected_price', reference['expected_price'])
+                    stage.setdefault('label', reference['label'])
+        
+        service = get_ratehawk_service()
+        result = service.prebook_rates_batch(
+            stages,
+            price_increase_percent=data.get('price_increase_percent', 0),
+            timeout=timeout
+        )
+        
+        if result['status'] == 'success':
+            return jsonify(result), 200
+        elif result['status'] == 'partial':
+            return jsonify(result), 207  # Multi-Status
+        else:
+            return jsonify(result), 502
+            
+    except Exception as e:
+        logger.error(f"❌ Error in batch prebook: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
 @bp.route('/suggest', methods=['GET'])
 def suggest_location():
     """
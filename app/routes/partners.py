@@ -4,6 +4,7 @@ Routes pour la gestion des partenaires
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from app.services.firebase_service import FirebaseService
 from app.config import Config
+from app.services.published_trip_service import enqueue_rematerialization
 
 bp = Blueprint('partners', __name__, url_prefix='/admin')
 
@@ -173,6 +174,8 @@ def update_partner(partner_id):
         success = firebase.update_partner(partner_id, update_data)
         
         if success:
+            # Les voyages publiés qui le référencent sont re-matérialisés en tâche de fond
+            enqueue_rematerialization(partner_id=partner_id)
             return jsonify({
                 'success': True,
                 'message': 'Partenaire mis à jour avec succès'
@@ -203,6 +206,8 @@ def delete_partner(partner_id):
         success = firebase.delete_partner(partner_id)
         
         if success:
+            # Les voyages publiés qui le référencent sont re-matérialisés en tâche de fond
+            enqueue_rematerialization(partner_id=partner_id)
             return jsonify({
                 'success': True,
                 'message': 'Partenaire supprimé avec succès'
@@ -4,6 +4,7 @@ Routes pour la gestion des POIs (Points d'Intérêt)
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from app.services.firebase_service import FirebaseService
 from app.config import Config
+from app.services.published_trip_service import enqueue_rematerialization
 
 bp = Blueprint('pois', __name__, url_prefix='/admin')
 
@@ -230,6 +231,8 @@ def update_poi(poi_id):
         success = firebase.update_poi(poi_id, update_data)
         
         if success:
+            # Les voyages publiés qui le référencent sont re-matérialisés en tâche de fond
+            enqueue_rematerialization(poi_id=poi_id)
             return jsonify({
                 'success': True,
                 'message': 'POI mis à jour avec succès'
@@ -260,6 +263,8 @@ def delete_poi(poi_id):
         success = firebase.delete_poi(poi_id)
         
         if success:
+            # Les voyages publiés qui le référencent sont re-matérialisés en tâche de fond
+            enqueue_rematerialization(poi_id=poi_id)
             return jsonify({
                 'success': True,
                 'message': 'POI supprimé avec succès'
@@ -8,105 +8,76 @@ import random
 import string
 from datetime import datetime
 from app.services.firebase_service import FirebaseService
+from app.services.page_cache import get_page_cache, make_cached_response
+from app.services.published_trip_service import materialize_public_view, poi_ids_of_day
 
 bp = Blueprint('public', __name__)
 
 def generate_join_code():
-    """Génère un code de groupe unique (ex: VOYAGE-X9YH)"""
+    """
+    Génère un code de groupe candidat (ex: TRIP-X9YH)
+    L'unicité est vérifiée par create_booking (index joinCodes) qui retire un code si besoin
+    """
     chars = string.ascii_uppercase + string.digits
     suffix = ''.join(random.choices(chars, k=4))
     return f"TRIP-{suffix}" 
 
-@bp.route('/voyage/<slug>')
-def view_published_trip(slug):
+def _render_published_trip(slug):
     """
-    Affiche un voyage publié (Page Teaser)
+    Rendu complet de la page teaser (partenaires + POIs)
+
+    Returns:
+        dict: {'body', 'version'} ou None si le voyage n'existe pas / n'est pas actif
     """
-    try:
-        firebase_service = FirebaseService()
-        
-        # Récupérer le voyage publié depuis Firebase
-        trip_data = firebase_service.get_published_trip(slug)
-        
-        if not trip_data:
-            abort(404)
-        
-        # Vérifier si le voyage est actif (publié)
-        if not trip_data.get('isActive', False):
-            # En mode dev/admin on pourrait vouloir le voir quand même, 
-            # mais pour le public c'est caché.
-            abort(404)
-        
-        # Charger les partenaires
-        partner_ids = trip_data.get('partnerIds', [])
-        partners = []
-        partner_theme = {
-            'primary_color': None,
-            'secondary_color': None
-        }
-        
-        if partner_ids:
-            for partner_id in partner_ids:
-                partner = firebase_service.get_partner(partner_id)
-                if partner and partner.get('isActive', True):
-                    partners.append(partner)
-            
-            # Utilise le premier partenaire pour le thème
-            if partners:
-                first_partner = partners[0]
-                partner_theme = {
-                    'primary_color': first_partner.get('color', '#667eea'),
-                    'secondary_color': first_partner.get('displayConfig', {}).get('secondaryColor', '#764ba2')
-                }
-        
-        # Enrichir les jours avec les POIs
-        days = trip_data.get('days', [])
-        for day in days:
-            day_pois = []
-            poi_ids = day.get('pois', [])
-            
-            if poi_ids:
-                category_icons = {
-                    'monument': '🏰',
-                    'nature': '🌲',
-                    'museum': '🎨',
-                    'activity': '⚡',
-                    'viewpoint': '🔭',
-                    'other': '📍'
-                }
-                
-                for poi_id in poi_ids:
-                    poi = firebase_service.get_poi(poi_id)
-                    if poi:
-                        day_pois.append({
-                            'id': poi.get('id'),
-                            'name': poi.get('name'),
-                            'category': poi.get('category'),
-                            'icon': category_icons.get(poi.get('category', 'other'), '📍'),
-                            'description': poi.get('description', ''),
-                            'website': poi.get('website', '')
-                        })
-            
-            day['pois'] = day_pois
-        
-        total_distance = sum(day.get('distance', 0) for day in days)
-        
-        trip = {
-            'title': trip_data.get('title', ''),
-            'description': trip_data.get('description', ''), 
-            'pricePerPerson': trip_data.get('pricePerPerson', 0),
-            'days': days,
-            'slug': slug,
-            'coverImage': trip_data.get('coverImage', ''),
-            'gallery': trip_data.get('gallery', []),
-            'mapImage': trip_data.get('mapImage', ''), # Static map image
-            'teaserText': trip_data.get('teaserText', '') 
-        }
-        
-        trip_json = json.dumps(trip)
-        google_maps_key = current_app.config.get('GOOGLE_MAPS_API_KEY', '')
-        
-        return render_template(
+    firebase_service = FirebaseService()
+    
+    # Récupérer le voyage publié depuis Firebase
+    trip_data = firebase_service.get_published_trip(slug)
+    
+    if not trip_data:
+        return None
+    
+    # Vérifier si le voyage est actif (publié)
+    if not trip_data.get('isActive', False):
+        # En mode dev/admin on pourrait vouloir le voir quand même, 
+        # mais pour le public c'est caché.
+        return None
+    
+    # Vue publique figée à la publication (POIs + partenaires) : une seule lecture
+    view = trip_data.get('publicView')
+    if not view:
+        # Voyage publié avant la dénormalisation : on la calcule à la volée
+        view = materialize_public_view(
+            firebase_service, trip_data.get('days', []), trip_data.get('partnerIds', [])
+        )['publicView']
+    
+    partners = view.get('partners', [])
+    partner_theme = view.get('partnerTheme') or {'primary_color': None, 'secondary_color': None}
+    
+    # Enrichir les jours avec les POIs
+    days = trip_data.get('days', [])
+    for day in days:
+        day['pois'] = [view['pois'][poi_id] for poi_id in poi_ids_of_day(day) if poi_id in view.get('pois', {})]
+    
+    total_distance = view.get('totalDistance', 0)
+    
+    trip = {
+        'title': trip_data.get('title', ''),
+        'description': trip_data.get('description', ''), 
+        'pricePerPerson': trip_data.get('pricePerPerson', 0),
+        'days': days,
+        'slug': slug,
+        'coverImage': trip_data.get('coverImage', ''),
+        'gallery': trip_data.get('gallery', []),
+        'mapImage': trip_data.get('mapImage', ''), # Static map image
+        'teaserText': trip_data.get('teaserText', '') 
+    }
+    
+    trip_json = json.dumps(trip)
+    google_maps_key = current_app.config.get('GOOGLE_MAPS_API_KEY', '')
+    
+    return {
+        'body': render_template(
             'public/trip.html',
             trip=trip,
             trip_json=trip_json,
@@ -114,11 +85,34 @@ def view_published_trip(slug):
             google_maps_key=google_maps_key,
             partners=partners,
             partner_theme=partner_theme
-        )
-        
+        ),
+        'version': trip_data.get('publishedAt')
+    }
+
+
+@bp.route('/voyage/<slug>')
+def view_published_trip(slug):
+    """
+    Affiche un voyage publié (Page Teaser)
+    Page mise en cache (stale-while-revalidate) pour le publishedAt courant,
+    purgée à la (dé)publication
+    """
+    try:
+        published = FirebaseService().get_published_trip_version(slug)
+        entry = None
+        if published and published.get('isActive', False):
+            entry = get_page_cache().get_or_render(
+                'public.view_published_trip', slug, lambda: _render_published_trip(slug),
+                version=published.get('publishedAt')
+            )
     except Exception as e:
         current_app.logger.error(f"Error loading published trip {slug}: {str(e)}")
         abort(404)
+    
+    if not entry:
+        abort(404)
+    
+    return make_cached_response(entry)
 
 @bp.route('/voyage/<slug>/book')
 def booking_page(slug):
@@ -214,7 +208,7 @@ def create_checkout_session(slug):
         
         # Create Pending Booking
         booking_id = str(uuid.uuid4())
-        join_code = generate_join_code() if booking_type == 'group_leader' else ''
+        is_group_leader = booking_type == 'group_leader'
         
         new_booking = TripBooking(
             booking_id=booking_id,
@@ -223,10 +217,13 @@ def create_checkout_session(slug):
             start_date=None, # To be defined? Or fixed dates? Assumed open for now
             end_date=None,
             total_participants=total_pax,
+            # Le leader compte sans document participant : compteurs alignés sur currentParticipants
+            current_participants=1,
+            pilot_count=1,
+            passenger_count=0,
             total_amount=total_amount, # Amount for THIS transaction or Total Trip? Best to store Total Trip Value
             payment_status='pending',
             status='pending',
-            join_code=join_code,
             leader_details=participant_info
         )
         
@@ -237,9 +234,14 @@ def create_checkout_session(slug):
         booking_dict['tripTitle'] = trip_data.get('title')
         booking_dict['tripSlug'] = slug
         
-        # We save it to 'bookings' collection
+        # We save it to 'bookings' collection (with its joinCodes / accessTokens lookup docs)
         # Note: We don't have a UserId yet. We can use the 'booking_id' as document ID.
-        firebase_service.db.collection(f'artifacts/{firebase_service.app_id}/bookings').document(booking_id).set(booking_dict)
+        if not firebase_service.create_booking(
+            booking_dict,
+            booking_id=booking_id,
+            join_code_factory=generate_join_code if is_group_leader else None
+        ):
+            return jsonify({'error': 'Impossible de créer la réservation'}), 500
         
         # Create Stripe Session
         session_data = stripe_service.create_checkout_session(
@@ -255,8 +257,8 @@ def create_checkout_session(slug):
             }
         )
         
-        # Update booking with session ID
-        firebase_service.db.collection(f'artifacts/{firebase_service.app_id}/bookings').document(booking_id).update({
+        # Update booking with session ID (+ stripeSessions lookup doc)
+        firebase_service.update_booking(booking_id, {
             'stripeSessionId': session_data['session_id']
         })
         
@@ -280,13 +282,7 @@ def payment_success(slug):
     if session_id:
         try:
             # Find booking associated with this session
-            bookings_ref = firebase_service.db.collection(f'artifacts/{firebase_service.app_id}/bookings')
-            query = bookings_ref.where('stripeSessionId', '==', session_id).limit(1).stream()
-            
-            for b in query:
-                booking = b.to_dict()
-                booking['id'] = b.id
-                
+            booking = firebase_service.get_booking_by_stripe_session(session_id)
         except Exception as e:
             current_app.logger.error(f"Error fetching booking on success: {e}")
             
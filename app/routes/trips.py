@@ -6,6 +6,10 @@ from datetime import datetime
 import uuid
 
 from app.services import FirebaseService, StripeService
+from app.services.page_cache import (
+    get_page_cache, has_pending_flashes, make_cached_response, make_private_response
+)
+from app.services.trip_counters import get_trip_counter_buffer
 from app.config import Config
 
 # Theme Configuration
@@ -36,26 +40,61 @@ def list_trips():
     return render_template('trips/list.html', trips=trips)
 
 
+def _render_trip_detail(firebase, slug):
+    """
+    Rendu complet de la page détail (inclut les messages flash du visiteur :
+    jamais mis en cache quand il en a)
+
+    Returns:
+        dict: {'body', 'version'} ou None si le voyage n'existe pas
+    """
+    trip = firebase.get_published_trip(slug)
+    
+    if not trip:
+        return None
+    
+    # Resolve Theme
+    theme_key = trip.get('themeColor', 'yellow')
+    theme = THEMES.get(theme_key, THEMES['yellow'])
+
+    return {
+        'body': render_template('trips/detail_v2.html', trip=trip, theme=theme),
+        'version': trip.get('publishedAt')
+    }
+
+
 @bp.route('/<slug>')
 def trip_detail(slug):
     """Détail d'un voyage (teaser - sans infos complètes)"""
     firebase = FirebaseService(Config.APP_ID)
     
-    # Récupère le voyage publié
-    trip = firebase.get_published_trip(slug)
+    # Erreur de réservation à afficher (book_trip) : rendu propre au visiteur
+    if has_pending_flashes():
+        rendered = _render_trip_detail(firebase, slug)
+        if rendered:
+            get_trip_counter_buffer().record_view(slug)
+            return make_private_response(rendered['body'])
+        flash('Voyage introuvable.', 'error')
+        return redirect(url_for('trips.list_trips'))
     
-    if not trip:
+    # Page mise en cache (stale-while-revalidate) pour le publishedAt courant,
+    # purgée à la (dé)publication
+    published = firebase.get_published_trip_version(slug)
+    entry = None
+    if published:
+        entry = get_page_cache().get_or_render(
+            'trips.trip_detail', slug, lambda: _render_trip_detail(firebase, slug),
+            version=published.get('publishedAt')
+        )
+    
+    if not entry:
         flash('Voyage introuvable.', 'error')
         return redirect(url_for('trips.list_trips'))
     
     # Incrémente le compteur de vues
-    firebase.increment_trip_views(slug)
+    get_trip_counter_buffer().record_view(slug)
     
-    # Resolve Theme
-    theme_key = trip.get('themeColor', 'yellow')
-    theme = THEMES.get(theme_key, THEMES['yellow'])
-
-    return render_template('trips/detail_v2.html', trip=trip, theme=theme)
+    return make_cached_response(entry)
 
 
 @bp.route('/<slug>/book', methods=['POST'])
@@ -237,7 +276,7 @@ def book_trip(slug):
             })
             
             # Incrémente le compteur de checkouts
-            firebase.increment_trip_checkouts(slug)
+            get_trip_counter_buffer().record_checkout(slug)
             
             # Redirige vers Stripe Checkout
             return redirect(session.url, code=303)
@@ -0,0 +1,303 @@
+"""
+Proxy des ressources externes (fichiers GPX, cartes statiques) avec cache disque
+Session HTTP poolée, timeouts stricts, réponse en streaming, cache LRU borné
+par taille, revalidation conditionnelle amont et liste blanche d'hôtes
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Response, send_file, stream_with_context
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Hôtes autorisés (suffixes) : Firebase Storage + Google Static Maps
+PROXY_DEFAULT_ALLOWED_HOSTS = (
+    'storage.googleapis.com',
+    'firebasestorage.googleapis.com',
+    'firebasestorage.app',
+    'maps.googleapis.com'
+)
+
+PROXY_CACHE_MAX_BYTES = int(os.getenv('PROXY_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+PROXY_CACHE_MAX_ENTRY_BYTES = int(os.getenv('PROXY_CACHE_MAX_ENTRY_BYTES', str(20 * 1024 * 1024)))
+# Entrée servie sans revalidation pendant N secondes, puis revalidée (If-None-Match)
+PROXY_CACHE_FRESH_TTL = int(os.getenv('PROXY_CACHE_FRESH_TTL', str(24 * 3600)))
+PROXY_CLIENT_MAX_AGE = int(os.getenv('PROXY_CLIENT_MAX_AGE', '86400'))
+
+PROXY_CONNECT_TIMEOUT = 3.05
+PROXY_READ_TIMEOUT = 15
+PROXY_CHUNK_SIZE = 64 * 1024
+
+# On tente de se faire passer pour le site de prod si la clé Google est restreinte
+PROXY_UPSTREAM_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)',
+    'Referer': 'https://oldibike.be/'
+}
+
+
+class ProxyDiskCache:
+    """
+    Cache disque partagé entre workers : un fichier corps + un fichier méta JSON par URL.
+    L'ordre LRU suit la date de modification des fichiers (touchée à chaque hit).
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = PROXY_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir or os.getenv(
+            'PROXY_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'mototrip_proxy_cache')
+        )
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.body", f"{base}.json"
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Méta de l'entrée (avec 'path' du corps) ou None"""
+        body_path, meta_path = self._paths(self.key(url))
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if not os.path.exists(body_path):
+                return None
+            meta['path'] = body_path
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, url: str, **updates) -> Optional[Dict]:
+        """Marque l'entrée comme récemment utilisée (et met à jour sa méta si besoin)"""
+        body_path, meta_path = self._paths(self.key(url))
+        try:
+            if updates:
+                meta = self.get(url)
+                if not meta:
+                    return None
+                meta.pop('path', None)
+                meta.update(updates)
+                self._write_meta(meta_path, meta)
+            os.utime(body_path)
+        except OSError:
+            return None
+        return self.get(url)
+
+    def new_temp_file(self):
+        """Fichier temporaire dans le dossier du cache (rename atomique ensuite)"""
+        return tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.part', delete=False)
+
+    def _write_meta(self, meta_path: str, meta: Dict):
+        tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def commit(self, url: str, temp_path: str, meta: Dict):
+        """Installe un corps téléchargé dans le cache puis applique la limite de taille"""
+        body_path, meta_path = self._paths(self.key(url))
+        os.replace(temp_path, body_path)
+        self._write_meta(meta_path, meta)
+        self.evict()
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.body'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            for _, size, path in sorted(entries):
+                for stale_path in (path, path[:-len('.body')] + '.json'):
+                    try:
+                        os.remove(stale_path)
+                    except OSError:
+                        pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            logger.info(f"🧹 Proxy cache evicted down to {total // 1024} KB")
+
+
+class AssetProxy:
+    """Proxy HTTP des ressources externes, servies depuis le cache disque dès que possible"""
+
+    def __init__(self, cache: Optional[ProxyDiskCache] = None):
+        self.cache = cache or ProxyDiskCache()
+        extra_hosts = [h.strip().lower() for h in os.getenv('PROXY_ALLOWED_HOSTS', '').split(',') if h.strip()]
+        self.allowed_hosts = tuple(PROXY_DEFAULT_ALLOWED_HOSTS) + tuple(extra_hosts)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                              allowed_methods=('GET',))
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(PROXY_UPSTREAM_HEADERS)
+
+    def is_allowed(self, url: str) -> bool:
+        """Vérifie le schéma et l'hôte de l'URL (liste blanche de suffixes)"""
+        parsed = urlparse(url or '')
+        host = (parsed.hostname or '').lower()
+        if parsed.scheme not in ('http', 'https') or not host:
+            return False
+        return any(host == allowed or host.endswith(f".{allowed}") for allowed in self.allowed_hosts)
+
+    @staticmethod
+    def _etag(url: str, meta: Dict) -> str:
+        """ETag exposé aux clients (stable tant que le contenu amont ne change pas)"""
+        validator = meta.get('upstreamEtag') or meta.get('upstreamLastModified') or meta.get('fetchedAt')
+        return hashlib.sha1(f"{url}:{validator}".encode('utf-8')).hexdigest()
+
+    def _serve_cached(self, url: str, meta: Dict, hit: str) -> Response:
+        response = send_file(
+            meta['path'],
+            mimetype=meta.get('contentType'),
+            etag=self._etag(url, meta),
+            conditional=True,
+            max_age=PROXY_CLIENT_MAX_AGE
+        )
+        response.headers['Cache-Control'] = f"public, max-age={PROXY_CLIENT_MAX_AGE}"
+        response.headers['X-Proxy-Cache'] = hit
+        return response
+
+    def _stream_and_store(self, url: str, upstream: requests.Response, default_content_type: str) -> Response:
+        """Relaie le corps amont par morceaux tout en l'écrivant dans le cache"""
+        meta = {
+            'url': url,
+            'contentType': upstream.headers.get('Content-Type', default_content_type),
+            'upstreamEtag': upstream.headers.get('ETag'),
+            'upstreamLastModified': upstream.headers.get('Last-Modified'),
+            'fetchedAt': time.time()
+        }
+        declared_size = int(upstream.headers.get('Content-Length') or 0)
+        cacheable = declared_size <= PROXY_CACHE_MAX_ENTRY_BYTES
+
+        def generate():
+            temp = self.cache.new_temp_file() if cacheable else None
+            size = 0
+            completed = False
+            try:
+                for chunk in upstream.iter_content(chunk_size=PROXY_CHUNK_SIZE):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if temp is not None:
+                        if size > PROXY_CACHE_MAX_ENTRY_BYTES:
+                            # Trop gros pour le cache : on continue de relayer sans stocker
+                            temp.close()
+                            os.remove(temp.name)
+                            temp = None
+                        else:
+                            temp.write(chunk)
+                    yield chunk
+                completed = True
+            finally:
+                upstream.close()
+                if temp is not None:
+                    temp.close()
+                    if completed:
+                        self.cache.commit(url, temp.name, {**meta, 'size': size})
+                    else:
+                        os.remove(temp.name)
+
+        response = Response(stream_with_context(generate()), mimetype=meta['contentType'])
+        response.set_etag(self._etag(url, meta))
+        response.headers['Cache-Control'] = f"public, max-age={PROXY_CLIENT_MAX_AGE}"
+        response.headers['X-Proxy-Cache'] = 'MISS'
+        return response
+
+    def fetch(self, url: str, default_content_type: str = 'application/octet-stream') -> Response:
+        """
+        Sert une ressource externe via le cache
+
+        Args:
+            url (str): URL amont (doit appartenir à la liste blanche)
+            default_content_type (str): Type MIME si l'amont n'en fournit pas
+
+        Returns:
+            Response: Réponse Flask (streaming, fichier en cache, 304 ou erreur)
+        """
+        if not self.is_allowed(url):
+            logger.warning(f"⛔ Proxy refused host: {urlparse(url or '').hostname}")
+            return Response('Host not allowed', status=403)
+
+        meta = self.cache.get(url)
+        if meta and time.time() - meta.get('fetchedAt', 0) < PROXY_CACHE_FRESH_TTL:
+            return self._serve_cached(url, self.cache.touch(url) or meta, 'HIT')
+
+        # Requête conditionnelle si une version (périmée) est en cache
+        headers = {}
+        if meta and meta.get('upstreamEtag'):
+            headers['If-None-Match'] = meta['upstreamEtag']
+        if meta and meta.get('upstreamLastModified'):
+            headers['If-Modified-Since'] = meta['upstreamLastModified']
+
+        try:
+            upstream = self.session.get(url, headers=headers, stream=True,
+                                        timeout=(PROXY_CONNECT_TIMEOUT, PROXY_READ_TIMEOUT))
+        except requests.RequestException as e:
+            logger.error(f"❌ Proxy upstream error ({url[:80]}): {e}")
+            if meta:
+                return self._serve_cached(url, meta, 'STALE')
+            return Response('Upstream unavailable', status=502)
+
+        if upstream.status_code == 304 and meta:
+            upstream.close()
+            return self._serve_cached(url, self.cache.touch(url, fetchedAt=time.time()) or meta, 'REVALIDATED')
+
+        if upstream.status_code != 200:
+            upstream.close()
+            logger.error(f"❌ Proxy upstream status {upstream.status_code} ({url[:80]})")
+            if meta:
+                return self._serve_cached(url, meta, 'STALE')
+            return Response('', status=upstream.status_code)
+
+        return self._stream_and_store(url, upstream, default_content_type)
+
+
+# Instance globale du proxy (singleton pattern)
+_asset_proxy = None
+
+
+def get_asset_proxy() -> AssetProxy:
+    """
+    Retourne l'instance singleton de l'AssetProxy
+
+    Returns:
+        AssetProxy: Instance du proxy
+    """
+    global _asset_proxy
+    if _asset_proxy is None:
+        _asset_proxy = AssetProxy()
+    return _asset_proxy
@@ -0,0 +1,256 @@
+"""
+Flux de modifications Firestore (on_snapshot) pour invalider les caches en mémoire
+
+Chaque process web écoute les collections hotels, pois, partners, publishedTrips
+et gpsGuides : toute écriture (route, autre worker, process `worker`, script de
+migration) est publiée aux caches du process abonnés à la collection. Les
+caches peuvent ainsi garder des TTL longs sans servir de données périmées.
+
+Une collection n'est écoutée que si au moins un cache y est abonné (l'écoute
+charge la collection entière au démarrage). Si une écoute s'interrompt, elle
+est relancée et un événement `reset` demande aux abonnés de tout vider.
+"""
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+CHANGE_FEED_ENABLED = os.getenv('CHANGE_FEED_ENABLED', 'true').lower() != 'false'
+# Intervalle de vérification des écoutes (secondes)
+CHANGE_FEED_CHECK_INTERVAL = float(os.getenv('CHANGE_FEED_CHECK_INTERVAL', '30'))
+# Propriétaire des hôtels écoutés (utilisateur fixe de l'admin)
+CHANGE_FEED_USER_ID = os.getenv('CHANGE_FEED_USER_ID', 'sam-user')
+
+# Collections écoutables (chemin relatif à artifacts/{app_id})
+WATCHED_COLLECTIONS = {
+    'hotels': 'users/{user_id}/hotels',
+    'pois': 'pois',
+    'partners': 'partners',
+    'publishedTrips': 'publishedTrips',
+    'gpsGuides': 'gpsGuides'
+}
+
+# Sous-ensemble écouté (CHANGE_FEED_COLLECTIONS, séparées par des virgules)
+CHANGE_FEED_COLLECTIONS = [
+    name.strip() for name in os.getenv('CHANGE_FEED_COLLECTIONS', ','.join(WATCHED_COLLECTIONS)).split(',')
+    if name.strip() in WATCHED_COLLECTIONS
+]
+
+CHANGE_ADDED = 'added'
+CHANGE_MODIFIED = 'modified'
+CHANGE_REMOVED = 'removed'
+# Écoute relancée : des modifications ont pu être manquées
+CHANGE_RESET = 'reset'
+
+
+class ChangeFeed:
+    """
+    Écoutes on_snapshot d'un process et diffusion des événements aux abonnés
+
+    Événement : {'collection', 'documentId', 'change' (added / modified / removed / reset)}
+    (documentId vaut None pour un reset). Les abonnés sont appelés depuis le
+    thread de l'écoute : ils doivent être rapides (purge d'un cache).
+    """
+
+    def __init__(self, collections: List[str] = None):
+        self.collections = collections if collections is not None else CHANGE_FEED_COLLECTIONS
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = defaultdict(list)
+        self._watches: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._db = None
+        self._app_id = None
+        self._events: Dict[str, int] = defaultdict(int)
+        self._restarts = 0
+        self._last_event_at: Optional[float] = None
+
+    def subscribe(self, collection: str, handler: Callable[[Dict], None]):
+        """Abonne un handler aux modifications d'une collection (l'écoute démarre si besoin)"""
+        if collection not in WATCHED_COLLECTIONS:
+            raise ValueError(f"Collection non écoutable: {collection}")
+        with self._lock:
+            self._handlers[collection].append(handler)
+            started = self._db is not None
+        if started:
+            self._watch(collection)
+
+    def start(self, db, app_id: str):
+        """Démarre les écoutes des collections ayant des abonnés et le thread de surveillance"""
+        with self._lock:
+            if self._db is not None:
+                return
+            self._db = db
+            self._app_id = app_id
+            collections = list(self._handlers)
+
+        for collection in collections:
+            self._watch(collection)
+
+        threading.Thread(target=self._supervise, name='change-feed-supervisor', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            watches, self._watches = [w for w in self._watches.values() if w is not None], {}
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f"⚠️ Arrêt d'une écoute impossible: {e}")
+
+    def _collection_path(self, collection: str) -> str:
+        relative = WATCHED_COLLECTIONS[collection].format(user_id=CHANGE_FEED_USER_ID)
+        return f"artifacts/{self._app_id}/{relative}"
+
+    def _watch(self, collection: str) -> bool:
+        """Démarre l'écoute d'une collection (une seule par collection)"""
+        if collection not in self.collections:
+            return False
+        with self._lock:
+            if collection in self._watches or self._stop.is_set():
+                return False
+            # Réservé pendant l'ouverture (verrou relâché : le backend peut publier)
+            self._watches[collection] = None
+
+        initial = {'pending': True}
+
+        def on_snapshot(docs, changes, read_time):
+            # Premier appel : état initial de la collection, pas une modification
+            if initial['pending']:
+                initial['pending'] = False
+                return
+            for change in changes:
+                self.publish({
+                    'collection': collection,
+                    'documentId': change.document.id,
+                    'change': change.type.name.lower()
+                })
+
+        try:
+            watch = self._db.collection(self._collection_path(collection)).on_snapshot(on_snapshot)
+        except Exception as e:
+            logger.error(f"❌ Écoute de {collection} impossible: {e}")
+            with self._lock:
+                self._watches.pop(collection, None)
+            return False
+
+        with self._lock:
+            self._watches[collection] = watch
+        logger.info(f"👂 Écoute des modifications de {collection}")
+        return True
+
+    def publish(self, event: Dict):
+        """Diffuse un événement aux abonnés de sa collection"""
+        with self._lock:
+            handlers = list(self._handlers.get(event['collection'], ()))
+            self._events[event['collection']] += 1
+            self._last_event_at = time.time()
+
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"❌ Erreur d'invalidation ({event['collection']}/{event['documentId']}): {e}")
+
+    def _supervise(self):
+        """Relance les écoutes interrompues (erreur non récupérable du flux)"""
+        while not self._stop.wait(CHANGE_FEED_CHECK_INTERVAL):
+            with self._lock:
+                stopped = {name: watch for name, watch in self._watches.items()
+                           if watch is not None and not watch.is_active}
+                for name in stopped:
+                    self._watches.pop(name)
+
+            for collection, watch in stopped.items():
+                logger.warning(f"⚠️ Écoute de {collection} interrompue, relance")
+                try:
+                    watch.unsubscribe()
+                except Exception:
+                    pass
+                if self._watch(collection):
+                    with self._lock:
+                        self._restarts += 1
+                    self.publish({'collection': collection, 'documentId': None, 'change': CHANGE_RESET})
+
+    def status(self) -> Dict:
+        """État des écoutes (pour l'admin)"""
+        with self._lock:
+            return {
+                'enabled': CHANGE_FEED_ENABLED,
+                'watching': {name: bool(watch and watch.is_active) for name, watch in self._watches.items()},
+                'subscribed': sorted(self._handlers),
+                'events': dict(self._events),
+                'restarts': self._restarts,
+                'lastEventAt': self._last_event_at
+            }
+
+
+# ============================================
+# INVALIDATION DES CACHES DU PROCESS
+# ============================================
+
+def _invalidate_published_page(event: Dict):
+    from app.services.page_cache import get_page_cache
+
+    if event['change'] == CHANGE_RESET:
+        get_page_cache().clear()
+    else:
+        get_page_cache().purge(event['documentId'])
+
+
+def _invalidate_gps_guide(event: Dict):
+    from app.services.gps_guide_service import clear_cached_guides, discard_cached_guide
+
+    if event['change'] == CHANGE_RESET:
+        clear_cached_guides()
+    else:
+        discard_cached_guide(event['documentId'])
+
+
+def register_cache_invalidations(feed: ChangeFeed):
+    """Abonne les caches en mémoire existants à leurs collections"""
+    feed.subscribe('publishedTrips', _invalidate_published_page)
+    feed.subscribe('gpsGuides', _invalidate_gps_guide)
+
+
+# Instance globale du flux (singleton pattern)
+_change_feed = None
+
+
+def get_change_feed() -> ChangeFeed:
+    """
+    Retourne l'instance singleton du ChangeFeed (caches du process abonnés)
+
+    Returns:
+        ChangeFeed: Instance du flux
+    """
+    global _change_feed
+    if _change_feed is None:
+        _change_feed = ChangeFeed()
+        register_cache_invalidations(_change_feed)
+    return _change_feed
+
+
+def start_change_feed(app) -> Optional[ChangeFeed]:
+    """
+    Démarre les écoutes du process (CHANGE_FEED_ENABLED) : à appeler dans
+    chaque worker, après le fork (voir start_background_services)
+    """
+    if not CHANGE_FEED_ENABLED:
+        return None
+
+    from app.services.firebase_service import FirebaseService
+
+    app_id = app.config.get('APP_ID', 'default-app-id')
+    firebase = FirebaseService(app_id)
+    if firebase.db is None:
+        return None
+
+    feed = get_change_feed()
+    feed.start(firebase.db, app_id)
+    return feed
@@ -1,23 +1,50 @@
 """
 Service d'envoi d'emails pour MotoTrip
 Supporte plusieurs providers : SendGrid, AWS SES, SMTP
+
+En mode asynchrone, chaque email est une tâche de la file persistante
+(JobStore) : il survit à un redéploiement ou à un crash du process. La file
+en mémoire (EmailQueue) ne sert que si la file de tâches est indisponible.
 """
+import atexit
+import heapq
+import itertools
 import os
-from typing import Optional
-from flask import render_template_string
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.services.email_templates import render_email
+from app.services.job_queue import register_job_handler, get_job_store
+
+# File d'envoi asynchrone
+EMAIL_BATCH_SIZE = 50          # Messages max envoyés sur une même connexion par lot
+EMAIL_BATCH_WINDOW = 0.5       # Secondes d'attente pour regrouper les messages d'un lot
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_DELAY = 2     # Backoff exponentiel : 2s, 4s, 8s, 16s...
+EMAIL_IDLE_CLOSE = 30          # Fermeture de la connexion SMTP après N secondes d'inactivité
+EMAIL_JOB_ATTEMPTS = 3         # Tentatives d'une tâche d'envoi avant échec (2s puis 4s d'attente)
 
 
 class EmailService:
     """Service pour envoyer des emails via différents providers"""
     
-    def __init__(self, provider='smtp'):
+    def __init__(self, provider='smtp', async_send=None):
         """
         Initialise le service d'email
         
         Args:
             provider: 'sendgrid', 'ses', ou 'smtp'
+            async_send: Envoi via la file en arrière-plan (défaut: EMAIL_ASYNC, activé)
         """
         self.provider = provider.lower()
+        if async_send is None:
+            async_send = os.getenv('EMAIL_ASYNC', 'true').lower() != 'false'
+        self.async_send = async_send
+        self._smtp = None
+        # Connexion SMTP partagée entre threads (requêtes, thread d'envoi, atexit)
+        self._smtp_lock = threading.RLock()
         self.from_email = os.getenv('EMAIL_FROM', 'noreply@mototrip.com')
         self.from_name = os.getenv('EMAIL_FROM_NAME', 'MotoTrip')
         
@@ -133,9 +160,36 @@ class EmailService:
         
         return 'MessageId' in response
     
-    def _send_smtp(self, to_email: str, subject: str, html_content: str, text_content: Optional[str]) -> bool:
-        """Envoie via SMTP"""
+    def _smtp_connection(self):
+        """Connexion SMTP persistante (réutilisée entre les messages et les lots, sous _smtp_lock)"""
         import smtplib
+        
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except smtplib.SMTPException:
+                self.close()
+        
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
+        server.starttls()
+        if self.smtp_user and self.smtp_pass:
+            server.login(self.smtp_user, self.smtp_pass)
+        self._smtp = server
+        return server
+    
+    def close(self):
+        """Ferme la connexion SMTP persistante"""
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except Exception:
+                    pass
+                self._smtp = None
+    
+    def _send_smtp(self, to_email: str, subject: str, html_content: str, text_content: Optional[str]) -> bool:
+        """Envoie via SMTP (connexion réutilisée)"""
         from email.mime.multipart import MIMEMultipart
         from email.mime.text import MIMEText
         
@@ -148,262 +202,268 @@ class EmailService:
             msg.attach(MIMEText(text_content, 'plain'))
         msg.attach(MIMEText(html_content, 'html'))
         
-        with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-            server.starttls()
-            if self.smtp_user and self.smtp_pass:
-                server.login(self.smtp_user, self.smtp_pass)
-            server.send_message(msg)
+        # Un seul échange SMTP à la fois sur la connexion partagée
+        with self._smtp_lock:
+            try:
+                self._smtp_connection().send_message(msg)
+            except Exception:
+                # Connexion cassée : on la jette, le prochain envoi (ou retry) en rouvre une
+                self.close()
+                raise
         
         return True
     
+    def _dispatch(self, to_email: str, subject: str, html_content: str, text_content: Optional[str]) -> bool:
+        """
+        Enregistre l'email dans la file de tâches persistante (retour immédiat),
+        ou l'envoie directement si async désactivé
+        """
+        if self.async_send:
+            try:
+                get_job_store().enqueue('send_email', {
+                    'to': to_email,
+                    'subject': subject,
+                    'html': html_content,
+                    'text': text_content
+                })
+            except Exception as e:
+                # File de tâches indisponible : file en mémoire (perdue si le process s'arrête)
+                print(f"⚠️  File de tâches indisponible, email mis en file en mémoire: {e}")
+                get_email_queue().enqueue(to_email, subject, html_content, text_content)
+            return True
+        return self.send_email(to_email, subject, html_content, text_content)
+    
     # ============================================
     # EMAILS SPÉCIFIQUES MOTOTRIP
     # ============================================
     
     def send_booking_confirmation(self, email: str, booking, access_token: str, base_url: str) -> bool:
         """Email post-paiement acompte à l'organisateur"""
-        subject = "Votre réservation est confirmée ! 🎉"
-        
-        register_link = f"{base_url}/auth/register/{access_token}"
-        
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h1 style="color: #667eea;">🎉 Réservation confirmée !</h1>
-            
-            <p>Bonjour,</p>
-            
-            <p>Merci pour votre réservation ! Votre acompte de <strong>{booking.deposit_amount}€</strong> a été reçu.</p>
-            
-            <div style="background: #f0f4ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="margin-top: 0;">Récapitulatif de votre réservation</h3>
-                <p><strong>Voyage :</strong> {booking.trip_template_id}</p>
-                <p><strong>Dates :</strong> {booking.start_date} → {booking.end_date}</p>
-                <p><strong>Participants :</strong> {booking.total_participants} personne(s)</p>
-                <p><strong>Montant total :</strong> {booking.total_amount}€</p>
-                <p><strong>Acompte payé :</strong> {booking.deposit_amount}€</p>
-                <p><strong>Solde restant :</strong> {booking.remaining_amount}€</p>
-            </div>
-            
-            <h3>📝 Prochaines étapes</h3>
-            
-            <ol>
-                <li><strong>Créez votre compte</strong> pour accéder aux détails complets du voyage</li>
-                <li>Ajoutez les autres participants de votre groupe</li>
-                <li>Consultez l'itinéraire détaillé et les informations pratiques</li>
-            </ol>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{register_link}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
-                    Créer mon compte
-                </a>
-            </div>
-            
-            <p style="color: #666; font-size: 14px;">
-                Le lien est valable 7 jours. Si vous avez des questions, n'hésitez pas à nous contacter.
-            </p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            
-            <p style="color: #666; font-size: 12px; text-align: center;">
-                MotoTrip - Voyages moto d'exception<br>
-                Cet email a été envoyé à {email}
-            </p>
-        </body>
-        </html>
-        """
-        
-        text = f"""
-        RÉSERVATION CONFIRMÉE !
-        
-        Merci pour votre réservation ! Votre acompte de {booking.deposit_amount}€ a été reçu.
-        
-        Récapitulatif :
-        - Voyage : {booking.trip_template_id}
-        - Dates : {booking.start_date} → {booking.end_date}
-        - Participants : {booking.total_participants}
-        - Total : {booking.total_amount}€
-        - Acompte : {booking.deposit_amount}€
-        - Solde : {booking.remaining_amount}€
-        
-        Créez votre compte : {register_link}
-        
-        MotoTrip
-        """
-        
-        return self.send_email(email, subject, html, text)
+        subject, html, text = render_email(
+            'booking_confirmation',
+            email=email,
+            booking=booking,
+            register_link=f"{base_url}/auth/register/{access_token}"
+        )
+        return self._dispatch(email, subject, html, text)
     
     def send_participant_invitation(self, email: str, participant, booking, trip_name: str, organizer_name: str, invitation_token: str, base_url: str) -> bool:
         """Email invitation à un membre du groupe"""
-        subject = f"Vous êtes invité au voyage {trip_name} ! 🏍️"
-        
-        join_link = f"{base_url}/auth/join/{invitation_token}"
-        
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h1 style="color: #667eea;">🏍️ Invitation à un voyage moto !</h1>
-            
-            <p>Bonjour {participant.first_name},</p>
-            
-            <p><strong>{organizer_name}</strong> vous invite à participer au voyage <strong>{trip_name}</strong> !</p>
-            
-            <div style="background: #f0f4ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
-                <h3 style="margin-top: 0;">Informations du voyage</h3>
-                <p><strong>Dates :</strong> {booking.start_date} → {booking.end_date}</p>
-                <p><strong>Votre rôle :</strong> {"🏍️ Pilote" if participant.rider_type == "pilot" else "👤 Passager"}</p>
-            </div>
-            
-            <h3>📝 Créez votre compte</h3>
-            
-            <p>Pour accéder aux détails complets du voyage (itinéraire, hôtels, fichiers GPX), créez votre compte :</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{join_link}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
-                    Rejoindre le voyage
-                </a>
-            </div>
-            
-            <p style="color: #666; font-size: 14px;">
-                Ce lien d'invitation est personnel et expire dans 7 jours.
-            </p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            
-            <p style="color: #666; font-size: 12px; text-align: center;">
-                MotoTrip - Voyages moto d'exception<br>
-                Cet email a été envoyé à {email}
-            </p>
-        </body>
-        </html>
-        """
-        
-        text = f"""
-        INVITATION AU VOYAGE {trip_name.upper()}
-        
-        Bonjour {participant.first_name},
-        
-        {organizer_name} vous invite à participer au voyage {trip_name} !
-        
-        Dates : {booking.start_date} → {booking.end_date}
-        Votre rôle : {"Pilote" if participant.rider_type == "pilot" else "Passager"}
-        
-        Rejoignez le voyage : {join_link}
-        
-        MotoTrip
-        """
-        
-        return self.send_email(email, subject, html, text)
+        subject, html, text = render_email(
+            'participant_invitation',
+            email=email,
+            participant=participant,
+            booking=booking,
+            trip_name=trip_name,
+            organizer_name=organizer_name,
+            join_link=f"{base_url}/auth/join/{invitation_token}"
+        )
+        return self._dispatch(email, subject, html, text)
     
     def send_payment_reminder(self, email: str, booking, trip_name: str, payment_link: str) -> bool:
         """Email rappel paiement solde"""
-        subject = f"Finalisez votre paiement pour {trip_name}"
-        
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h1 style="color: #667eea;">💳 Paiement du solde</h1>
-            
-            <p>Bonjour,</p>
-            
-            <p>Votre voyage <strong>{trip_name}</strong> approche !</p>
-            
-            <div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #ffc107;">
-                <h3 style="margin-top: 0; color: #856404;">Solde restant à payer</h3>
-                <p style="font-size: 24px; font-weight: bold; color: #856404; margin: 10px 0;">{booking.remaining_amount}€</p>
-                <p style="color: #856404; margin-bottom: 0;">
-                    <small>Acompte déjà payé : {booking.deposit_amount}€</small>
-                </p>
-            </div>
-            
-            <p>Pour finaliser votre réservation, merci de procéder au paiement du solde :</p>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{payment_link}" style="background: #ffc107; color: #000; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
-                    Payer le solde
-                </a>
-            </div>
-            
-            <p style="color: #666; font-size: 14px;">
-                Paiement sécurisé via Stripe. Si vous avez des questions, contactez-nous.
-            </p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            
-            <p style="color: #666; font-size: 12px; text-align: center;">
-                MotoTrip - Voyages moto d'exception<br>
-                Cet email a été envoyé à {email}
-            </p>
-        </body>
-        </html>
-        """
-        
-        text = f"""
-        PAIEMENT DU SOLDE - {trip_name.upper()}
-        
-        Votre voyage approche !
-        
-        Solde restant : {booking.remaining_amount}€
-        (Acompte déjà payé : {booking.deposit_amount}€)
-        
-        Payer maintenant : {payment_link}
-        
-        MotoTrip
-        """
-        
-        return self.send_email(email, subject, html, text)
+        subject, html, text = render_email(
+            'payment_reminder',
+            email=email,
+            booking=booking,
+            trip_name=trip_name,
+            payment_link=payment_link
+        )
+        return self._dispatch(email, subject, html, text)
     
     def send_account_created_confirmation(self, email: str, user_name: str, booking_id: str, base_url: str) -> bool:
         """Email confirmation création compte"""
-        subject = "Bienvenue sur MotoTrip ! 🎉"
-        
-        booking_link = f"{base_url}/bookings/{booking_id}"
-        
-        html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <h1 style="color: #667eea;">🎉 Bienvenue {user_name} !</h1>
-            
-            <p>Votre compte MotoTrip a été créé avec succès.</p>
-            
-            <p>Vous pouvez maintenant accéder aux détails complets de votre voyage :</p>
-            
-            <ul>
-                <li>✅ Itinéraire jour par jour</li>
-                <li>✅ Informations sur les hôtels</li>
-                <li>✅ Fichiers GPX à télécharger</li>
-                <li>✅ Liste des participants</li>
-                <li>✅ Statut du paiement</li>
-            </ul>
-            
-            <div style="text-align: center; margin: 30px 0;">
-                <a href="{booking_link}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
-                    Voir mes réservations
-                </a>
-            </div>
-            
-            <p style="color: #666; font-size: 14px;">
-                Si vous avez des questions, notre équipe est là pour vous aider.
-            </p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            
-            <p style="color: #666; font-size: 12px; text-align: center;">
-                MotoTrip - Voyages moto d'exception<br>
-                Cet email a été envoyé à {email}
-            </p>
-        </body>
-        </html>
-        """
-        
-        text = f"""
-        BIENVENUE {user_name.upper()} !
-        
-        Votre compte MotoTrip est créé.
-        
-        Accédez à vos réservations : {booking_link}
-        
-        MotoTrip
-        """
-        
-        return self.send_email(email, subject, html, text)
+        subject, html, text = render_email(
+            'account_created',
+            email=email,
+            user_name=user_name,
+            booking_link=f"{base_url}/bookings/{booking_id}"
+        )
+        return self._dispatch(email, subject, html, text)
+
+
+class EmailQueue:
+    """
+    File d'envoi en arrière-plan : un thread regroupe les messages par lots et
+    les envoie sur une seule connexion provider, avec retry + backoff exponentiel
+    """
+    
+    def __init__(self, service: EmailService):
+        self.service = service
+        self._queue = queue.Queue()
+        self._retries = []  # tas (not_before, seq, message)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_activity = time.time()
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0}
+    
+    def enqueue(self, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None):
+        """Ajoute un email à la file (retour immédiat)"""
+        self._queue.put({
+            'to': to_email,
+            'subject': subject,
+            'html': html_content,
+            'text': text_content,
+            'attempts': 0
+        })
+        self._ensure_thread()
+    
+    def _ensure_thread(self):
+        """Démarre le thread d'envoi au premier message (après un éventuel fork gunicorn)"""
+        with self._lock:
+            if self._stop.is_set():
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-sender', daemon=True)
+                self._thread.start()
+    
+    def _due_retries(self) -> List[Dict]:
+        now = time.time()
+        due = []
+        with self._lock:
+            while self._retries and self._retries[0][0] <= now and len(due) < EMAIL_BATCH_SIZE:
+                due.append(heapq.heappop(self._retries)[2])
+        return due
+    
+    def _next_batch(self) -> List[Dict]:
+        """Attend un premier message puis regroupe ceux qui arrivent dans la fenêtre"""
+        batch = self._due_retries()
+        
+        with self._lock:
+            next_retry = self._retries[0][0] if self._retries else None
+        timeout = 1.0 if next_retry is None else max(0.05, min(1.0, next_retry - time.time()))
+        
+        if not batch:
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                return []
+        
+        deadline = time.time() + EMAIL_BATCH_WINDOW
+        while len(batch) < EMAIL_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _schedule_retry(self, message: Dict):
+        message['attempts'] += 1
+        if message['attempts'] >= EMAIL_MAX_ATTEMPTS:
+            self.stats['failed'] += 1
+            print(f"❌ Email abandonné après {message['attempts']} tentatives: {message['to']} ({message['subject']})")
+            return
+        
+        delay = EMAIL_RETRY_BASE_DELAY * (2 ** (message['attempts'] - 1))
+        self.stats['retried'] += 1
+        with self._lock:
+            heapq.heappush(self._retries, (time.time() + delay, next(self._seq), message))
+    
+    def send_batch(self, batch: List[Dict]):
+        """Envoie un lot sur la connexion courante du provider"""
+        for message in batch:
+            ok = self.service.send_email(message['to'], message['subject'], message['html'], message['text'])
+            if ok:
+                self.stats['sent'] += 1
+            else:
+                self._schedule_retry(message)
+        self._last_activity = time.time()
+        print(f"📧 Lot de {len(batch)} email(s) traité ({self.service.provider})")
+    
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self.send_batch(batch)
+                elif time.time() - self._last_activity > EMAIL_IDLE_CLOSE:
+                    self.service.close()
+            except Exception as e:
+                print(f"❌ Erreur thread email: {e}")
+                time.sleep(1)
+    
+    def flush(self, timeout: float = 30):
+        """Envoie synchroniquement les messages encore en file (arrêt du process)"""
+        # Arrête le thread d'envoi (il termine son lot en cours) avant de reprendre la main
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+        
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        with self._lock:
+            batch.extend(message for _, _, message in self._retries)
+            self._retries = []
+        if batch:
+            for message in batch:
+                self.service.send_email(message['to'], message['subject'], message['html'], message['text'])
+        self.service.close()
+
+
+@register_job_handler('send_email')
+def send_email_job(job: Dict, ctx) -> Dict:
+    """
+    Handler de la file de tâches : envoie un email (connexion du worker réutilisée
+    d'une tâche à l'autre), avec quelques tentatives avant de marquer l'échec
+    """
+    message = job['payload']
+    service = _get_job_email_service()
+    for attempt in range(EMAIL_JOB_ATTEMPTS):
+        if service.send_email(message['to'], message['subject'], message['html'], message.get('text')):
+            return {'sent': True, 'provider': service.provider}
+        if attempt + 1 < EMAIL_JOB_ATTEMPTS:
+            time.sleep(EMAIL_RETRY_BASE_DELAY * (2 ** attempt))
+    raise RuntimeError(f"Email non envoyé après {EMAIL_JOB_ATTEMPTS} tentatives: {message['to']} ({message['subject']})")
+
+
+def _get_job_email_service() -> EmailService:
+    """Service d'envoi direct des workers de tâches (provider EMAIL_SERVICE)"""
+    global _job_email_service
+    if _job_email_service is None:
+        _job_email_service = EmailService(os.getenv('EMAIL_SERVICE', 'mock'), async_send=False)
+    return _job_email_service
+
+
+# Instances globales (singleton pattern)
+_email_service = None
+_email_queue = None
+_job_email_service = None
+
+
+def get_email_service() -> EmailService:
+    """
+    Retourne l'instance singleton de l'EmailService (provider EMAIL_SERVICE)
+    Évite de réinitialiser le client provider à chaque requête
+    
+    Returns:
+        EmailService: Instance du service
+    """
+    global _email_service
+    if _email_service is None:
+        _email_service = EmailService(os.getenv('EMAIL_SERVICE', 'mock'))
+    return _email_service
+
+
+def get_email_queue() -> EmailQueue:
+    """
+    Retourne l'instance singleton de l'EmailQueue (provider EMAIL_SERVICE)
+    
+    Returns:
+        EmailQueue: File d'envoi
+    """
+    global _email_queue
+    if _email_queue is None:
+        _email_queue = EmailQueue(EmailService(os.getenv('EMAIL_SERVICE', 'mock'), async_send=False))
+        atexit.register(_email_queue.flush)
+    return _email_queue
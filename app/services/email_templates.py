@@ -0,0 +1,268 @@
+"""
+Templates des emails transactionnels MotoTrip (syntaxe Jinja)
+Compilés une seule fois au premier usage (voir get_compiled_email_templates)
+"""
+from jinja2 import Environment
+
+EMAIL_TEMPLATES = {
+    'booking_confirmation': {
+        'subject': "Votre réservation est confirmée ! 🎉",
+        'html': """
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h1 style="color: #667eea;">🎉 Réservation confirmée !</h1>
+            
+            <p>Bonjour,</p>
+            
+            <p>Merci pour votre réservation ! Votre acompte de <strong>{{ booking.deposit_amount }}€</strong> a été reçu.</p>
+            
+            <div style="background: #f0f4ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="margin-top: 0;">Récapitulatif de votre réservation</h3>
+                <p><strong>Voyage :</strong> {{ booking.trip_template_id }}</p>
+                <p><strong>Dates :</strong> {{ booking.start_date }} → {{ booking.end_date }}</p>
+                <p><strong>Participants :</strong> {{ booking.total_participants }} personne(s)</p>
+                <p><strong>Montant total :</strong> {{ booking.total_amount }}€</p>
+                <p><strong>Acompte payé :</strong> {{ booking.deposit_amount }}€</p>
+                <p><strong>Solde restant :</strong> {{ booking.remaining_amount }}€</p>
+            </div>
+            
+            <h3>📝 Prochaines étapes</h3>
+            
+            <ol>
+                <li><strong>Créez votre compte</strong> pour accéder aux détails complets du voyage</li>
+                <li>Ajoutez les autres participants de votre groupe</li>
+                <li>Consultez l'itinéraire détaillé et les informations pratiques</li>
+            </ol>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{{ register_link }}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
+                    Créer mon compte
+                </a>
+            </div>
+            
+            <p style="color: #666; font-size: 14px;">
+                Le lien est valable 7 jours. Si vous avez des questions, n'hésitez pas à nous contacter.
+            </p>
+            
+            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+            
+            <p style="color: #666; font-size: 12px; text-align: center;">
+                MotoTrip - Voyages moto d'exception<br>
+                Cet email a été envoyé à {{ email }}
+            </p>
+        </body>
+        </html>
+        """,
+        'text': """
+        RÉSERVATION CONFIRMÉE !
+        
+        Merci pour votre réservation ! Votre acompte de {{ booking.deposit_amount }}€ a été reçu.
+        
+        Récapitulatif :
+        - Voyage : {{ booking.trip_template_id }}
+        - Dates : {{ booking.start_date }} → {{ booking.end_date }}
+        - Participants : {{ booking.total_participants }}
+        - Total : {{ booking.total_amount }}€
+        - Acompte : {{ booking.deposit_amount }}€
+        - Solde : {{ booking.remaining_amount }}€
+        
+        Créez votre compte : {{ register_link }}
+        
+        MotoTrip
+        """
+    },
+    'participant_invitation': {
+        'subject': "Vous êtes invité au voyage {{ trip_name }} ! 🏍️",
+        'html': """
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h1 style="color: #667eea;">🏍️ Invitation à un voyage moto !</h1>
+            
+            <p>Bonjour {{ participant.first_name }},</p>
+            
+            <p><strong>{{ organizer_name }}</strong> vous invite à participer au voyage <strong>{{ trip_name }}</strong> !</p>
+            
+            <div style="background: #f0f4ff; padding: 20px; border-radius: 8px; margin: 20px 0;">
+                <h3 style="margin-top: 0;">Informations du voyage</h3>
+                <p><strong>Dates :</strong> {{ booking.start_date }} → {{ booking.end_date }}</p>
+                <p><strong>Votre rôle :</strong> {{ "🏍️ Pilote" if participant.rider_type == "pilot" else "👤 Passager" }}</p>
+            </div>
+            
+            <h3>📝 Créez votre compte</h3>
+            
+            <p>Pour accéder aux détails complets du voyage (itinéraire, hôtels, fichiers GPX), créez votre compte :</p>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{{ join_link }}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
+                    Rejoindre le voyage
+                </a>
+            </div>
+            
+            <p style="color: #666; font-size: 14px;">
+                Ce lien d'invitation est personnel et expire dans 7 jours.
+            </p>
+            
+            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+            
+            <p style="color: #666; font-size: 12px; text-align: center;">
+                MotoTrip - Voyages moto d'exception<br>
+                Cet email a été envoyé à {{ email }}
+            </p>
+        </body>
+        </html>
+        """,
+        'text': """
+        INVITATION AU VOYAGE {{ trip_name.upper() }}
+        
+        Bonjour {{ participant.first_name }},
+        
+        {{ organizer_name }} vous invite à participer au voyage {{ trip_name }} !
+        
+        Dates : {{ booking.start_date }} → {{ booking.end_date }}
+        Votre rôle : {{ "Pilote" if participant.rider_type == "pilot" else "Passager" }}
+        
+        Rejoignez le voyage : {{ join_link }}
+        
+        MotoTrip
+        """
+    },
+    'payment_reminder': {
+        'subject': "Finalisez votre paiement pour {{ trip_name }}",
+        'html': """
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h1 style="color: #667eea;">💳 Paiement du solde</h1>
+            
+            <p>Bonjour,</p>
+            
+            <p>Votre voyage <strong>{{ trip_name }}</strong> approche !</p>
+            
+            <div style="background: #fff3cd; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #ffc107;">
+                <h3 style="margin-top: 0; color: #856404;">Solde restant à payer</h3>
+                <p style="font-size: 24px; font-weight: bold; color: #856404; margin: 10px 0;">{{ booking.remaining_amount }}€</p>
+                <p style="color: #856404; margin-bottom: 0;">
+                    <small>Acompte déjà payé : {{ booking.deposit_amount }}€</small>
+                </p>
+            </div>
+            
+            <p>Pour finaliser votre réservation, merci de procéder au paiement du solde :</p>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{{ payment_link }}" style="background: #ffc107; color: #000; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
+                    Payer le solde
+                </a>
+            </div>
+            
+            <p style="color: #666; font-size: 14px;">
+                Paiement sécurisé via Stripe. Si vous avez des questions, contactez-nous.
+            </p>
+            
+            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+            
+            <p style="color: #666; font-size: 12px; text-align: center;">
+                MotoTrip - Voyages moto d'exception<br>
+                Cet email a été envoyé à {{ email }}
+            </p>
+        </body>
+        </html>
+        """,
+        'text': """
+        PAIEMENT DU SOLDE - {{ trip_name.upper() }}
+        
+        Votre voyage approche !
+        
+        Solde restant : {{ booking.remaining_amount }}€
+        (Acompte déjà payé : {{ booking.deposit_amount }}€)
+        
+        Payer maintenant : {{ payment_link }}
+        
+        MotoTrip
+        """
+    },
+    'account_created': {
+        'subject': "Bienvenue sur MotoTrip ! 🎉",
+        'html': """
+        <html>
+        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+            <h1 style="color: #667eea;">🎉 Bienvenue {{ user_name }} !</h1>
+            
+            <p>Votre compte MotoTrip a été créé avec succès.</p>
+            
+            <p>Vous pouvez maintenant accéder aux détails complets de votre voyage :</p>
+            
+            <ul>
+                <li>✅ Itinéraire jour par jour</li>
+                <li>✅ Informations sur les hôtels</li>
+                <li>✅ Fichiers GPX à télécharger</li>
+                <li>✅ Liste des participants</li>
+                <li>✅ Statut du paiement</li>
+            </ul>
+            
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="{{ booking_link }}" style="background: #667eea; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; display: inline-block; font-weight: bold;">
+                    Voir mes réservations
+                </a>
+            </div>
+            
+            <p style="color: #666; font-size: 14px;">
+                Si vous avez des questions, notre équipe est là pour vous aider.
+            </p>
+            
+            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+            
+            <p style="color: #666; font-size: 12px; text-align: center;">
+                MotoTrip - Voyages moto d'exception<br>
+                Cet email a été envoyé à {{ email }}
+            </p>
+        </body>
+        </html>
+        """,
+        'text': """
+        BIENVENUE {{ user_name.upper() }} !
+        
+        Votre compte MotoTrip est créé.
+        
+        Accédez à vos réservations : {{ booking_link }}
+        
+        MotoTrip
+        """
+    }
+}
+
+
+_compiled_templates = None
+
+
+def get_compiled_email_templates():
+    """
+    Retourne les templates compilés {nom: {'subject', 'html', 'text'}}
+    (HTML avec échappement automatique, texte brut sans)
+    """
+    global _compiled_templates
+    if _compiled_templates is None:
+        html_env = Environment(autoescape=True)
+        text_env = Environment(autoescape=False)
+        _compiled_templates = {
+            name: {
+                'subject': text_env.from_string(parts['subject']),
+                'html': html_env.from_string(parts['html']),
+                'text': text_env.from_string(parts['text'])
+            }
+            for name, parts in EMAIL_TEMPLATES.items()
+        }
+    return _compiled_templates
+
+
+def render_email(name, **context):
+    """
+    Rend un email à partir de son template compilé
+
+    Returns:
+        tuple: (subject, html, text)
+    """
+    template = get_compiled_email_templates()[name]
+    return (
+        template['subject'].render(**context),
+        template['html'].render(**context),
+        template['text'].render(**context)
+    )
@@ -4,6 +4,36 @@ Service Firebase pour gérer l'authentification, Firestore et Storage
 from firebase_admin import auth, firestore, storage
 from datetime import datetime
 from typing import Optional, Dict, List, Any
+import os
+import random
+
+# Limite Firestore du nombre d'opérations par WriteBatch
+BATCH_WRITE_LIMIT = 500
+
+# Documents d'index des réservations : champ du booking -> collection de lookup
+# (écrits avec la réservation, ils remplacent les where() sur toute la collection)
+BOOKING_LOOKUP_INDEXES = {
+    'joinCode': 'joinCodes',
+    'accessToken': 'accessTokens',
+    'stripeSessionId': 'stripeSessions'
+}
+JOIN_CODE_MAX_ATTEMPTS = 10
+# Réservations antérieures aux index : recherche par requête sur `bookings` en cas
+# d'index absent. 'auto' (défaut) : tant que backfill_booking_indexes.py n'a pas
+# été exécuté ; 'true' / 'false' pour forcer.
+BOOKING_INDEX_QUERY_FALLBACK = os.getenv('BOOKING_INDEX_QUERY_FALLBACK', 'auto').lower()
+# Document marquant la fin du rattrapage des index (artifacts/{app_id}/...)
+BOOKING_INDEXES_BACKFILL_DOC = 'meta/bookingIndexes'
+# App IDs dont les index sont rattrapés (constaté une fois par process)
+_backfilled_booking_indexes = set()
+
+# Backend de stockage : 'firestore' (Firebase) ou 'memory' (process local : dev sans
+# identifiants, benchmarks, tests de charge). Le backend en mémoire n'est jamais
+# choisi implicitement : sans identifiants, db et bucket restent à None.
+FIRESTORE_BACKEND = os.getenv('FIRESTORE_BACKEND', 'firestore').lower()
+
+# Nombre de shards des compteurs de voyages publiés (~1 écriture/s soutenue par shard)
+TRIP_COUNTER_SHARDS = int(os.getenv('TRIP_COUNTER_SHARDS', '10'))
 
 
 class FirebaseService:
@@ -16,6 +46,16 @@ class FirebaseService:
         self.app_id = app_id
         self.mock_mode = False
         
+        if FIRESTORE_BACKEND == 'memory':
+            # Backend en mémoire explicite : aucune connexion à Firebase
+            from app.services.memory_backend import get_memory_client, get_memory_bucket
+            self.db = get_memory_client()
+            self.bucket = get_memory_bucket()
+            if not FirebaseService._initialization_logged:
+                print("🧠 Backend en mémoire activé (FIRESTORE_BACKEND=memory)")
+            FirebaseService._initialization_logged = True
+            return
+        
         try:
             # Initialise Firestore
             self.db = firestore.client()
@@ -40,16 +80,9 @@ class FirebaseService:
                 self.mock_mode = True
         
         if self.mock_mode and not FirebaseService._initialization_logged:
-            print("⚠️  Mode MOCK activé")
-            self._mock_data = {
-                'trips': {},
-                'days': {}
-            }
-        elif not hasattr(self, '_mock_data'):
-            self._mock_data = {
-                'trips': {},
-                'days': {}
-            }
+            # Pas de repli silencieux en mémoire : les écritures seraient perdues au redémarrage
+            print("❌ Firebase indisponible : lectures et écritures échoueront "
+                  "(FIRESTORE_BACKEND=memory pour un backend local en mémoire)")
         
         # Marque l'initialisation comme loguée
         FirebaseService._initialization_logged = True
@@ -108,9 +141,6 @@ class FirebaseService:
     
     def get_user_trips(self, user_id: str) -> List[Dict]:
         """Récupère tous les voyages d'un utilisateur"""
-        if self.mock_mode:
-            return list(self._mock_data['trips'].get(user_id, {}).values())
-        
         try:
             trips_ref = self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/trips')
             trips = trips_ref.order_by('name').stream()
@@ -141,19 +171,6 @@ class FirebaseService:
     
     def create_trip(self, user_id: str, name: str, **kwargs) -> Optional[str]:
         """Crée un nouveau voyage"""
-        if self.mock_mode:
-            import uuid
-            trip_id = str(uuid.uuid4())
-            if user_id not in self._mock_data['trips']:
-                self._mock_data['trips'][user_id] = {}
-            self._mock_data['trips'][user_id][trip_id] = {
-                'id': trip_id,
-                'name': name,
-                'createdAt': datetime.now().isoformat(),
-                **kwargs
-            }
-            return trip_id
-        
         try:
             trip_data = {
                 'name': name,
@@ -244,6 +261,44 @@ class FirebaseService:
             print(f"Erreur lors de la récupération des étapes avec hôtels: {e}")
             return []
 
+    @staticmethod
+    def compute_trip_aggregates(days: List[Dict]) -> Dict:
+        """
+        Agrégats stockés sur le document voyage (évite de relire les étapes)
+        
+        Returns:
+            Dict: {'totalNights', 'dayCount', 'gpxIndex': [{'dayId', 'name', 'url', 'day'}]}
+        """
+        total_nights = 0
+        gpx_index = []
+        for i, day in enumerate(days, 1):
+            try:
+                total_nights += int(day.get('nights', 1) or 1)
+            except (TypeError, ValueError):
+                total_nights += 1
+            if day.get('gpxUrl'):
+                gpx_index.append({
+                    'dayId': day.get('id'),
+                    'name': day.get('gpxFile') or f"Jour {i}",
+                    'url': day['gpxUrl'],
+                    'day': f"Jour {i}"
+                })
+        return {
+            'totalNights': total_nights,
+            'dayCount': len(days),
+            'gpxIndex': gpx_index
+        }
+    
+    def refresh_trip_aggregates(self, user_id: str, trip_id: str) -> Optional[Dict]:
+        """Recalcule et enregistre totalNights / dayCount / gpxIndex sur le voyage"""
+        try:
+            aggregates = self.compute_trip_aggregates(self.get_trip_days(user_id, trip_id))
+            self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/trips').document(trip_id).update(aggregates)
+            return aggregates
+        except Exception as e:
+            print(f"Erreur lors du calcul des agrégats du voyage: {e}")
+            return None
+    
     def get_day(self, user_id: str, trip_id: str, day_id: str) -> Optional[Dict]:
         """Récupère une étape spécifique"""
         try:
@@ -263,6 +318,7 @@ class FirebaseService:
             day_data['createdAt'] = firestore.SERVER_TIMESTAMP
             
             doc_ref = self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/trips/{trip_id}/days').add(day_data)
+            self.refresh_trip_aggregates(user_id, trip_id)
             return doc_ref[1].id
         except Exception as e:
             print(f"Erreur lors de la création de l'étape: {e}")
@@ -272,6 +328,9 @@ class FirebaseService:
         """Met à jour une étape"""
         try:
             self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/trips/{trip_id}/days').document(day_id).update(data)
+            # Les agrégats ne dépendent que des nuits et des GPX
+            if {'nights', 'gpxUrl', 'gpxFile'} & set(data):
+                self.refresh_trip_aggregates(user_id, trip_id)
             return True
         except Exception as e:
             print(f"Erreur lors de la mise à jour de l'étape: {e}")
@@ -281,6 +340,7 @@ class FirebaseService:
         """Supprime une étape"""
         try:
             self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/trips/{trip_id}/days').document(day_id).delete()
+            self.refresh_trip_aggregates(user_id, trip_id)
             return True
         except Exception as e:
             print(f"Erreur lors de la suppression de l'étape: {e}")
@@ -501,6 +561,67 @@ class FirebaseService:
             print(f"Erreur lors de la récupération de l'URL: {e}")
             return None
     
+    # ============================================
+    # LECTURES GROUPÉES
+    # ============================================
+    
+    def get_documents_by_ids(self, collection_path: str, doc_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Récupère plusieurs documents d'une collection en un seul aller-retour (get_all)
+        
+        Returns:
+            Dict: id -> données (les documents inexistants sont absents)
+        """
+        try:
+            collection = self.db.collection(collection_path)
+            refs = [collection.document(doc_id) for doc_id in dict.fromkeys(doc_ids) if doc_id]
+            if not refs:
+                return {}
+            
+            result = {}
+            for doc in self.db.get_all(refs):
+                if doc.exists:
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    result[doc.id] = data
+            return result
+        except Exception as e:
+            print(f"Erreur lors de la lecture groupée ({collection_path}): {e}")
+            return {}
+    
+    def get_hotels_by_ids(self, user_id: str, hotel_ids: List[str]) -> Dict[str, Dict]:
+        """Récupère plusieurs hôtels de la banque en une lecture groupée (id -> hôtel)"""
+        return self.get_documents_by_ids(f'artifacts/{self.app_id}/users/{user_id}/hotels', hotel_ids)
+    
+    def get_restaurants_by_ids(self, user_id: str, restaurant_ids: List[str]) -> Dict[str, Dict]:
+        """Récupère plusieurs restaurants de la banque en une lecture groupée (id -> restaurant)"""
+        return self.get_documents_by_ids(f'artifacts/{self.app_id}/users/{user_id}/restaurants', restaurant_ids)
+    
+    def get_days_restaurant_suggestions(self, user_id: str, trip_id: str, day_ids: List[str]) -> Dict[str, List[Dict]]:
+        """
+        Récupère les suggestions de restaurants (brutes, sans enrichissement) de
+        plusieurs jours en parallèle
+        
+        Returns:
+            Dict: day_id -> liste de suggestions {'id', 'restaurantId', ...}
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        def fetch(day_id):
+            suggestions_ref = self.db.collection(
+                f'artifacts/{self.app_id}/users/{user_id}/trips/{trip_id}/days/{day_id}/restaurantSuggestions'
+            )
+            return [{**doc.to_dict(), 'id': doc.id} for doc in suggestions_ref.order_by('createdAt').stream()]
+        
+        try:
+            if not day_ids:
+                return {}
+            with ThreadPoolExecutor(max_workers=min(8, len(day_ids))) as executor:
+                return dict(zip(day_ids, executor.map(fetch, day_ids)))
+        except Exception as e:
+            print(f"Erreur lors de la récupération des suggestions: {e}")
+            return {}
+    
     # ============================================
     # GESTION DES VOYAGES PUBLIÉS
     # ============================================
@@ -518,6 +639,22 @@ class FirebaseService:
             print(f"Erreur lors de la récupération du voyage publié: {e}")
             return None
     
+    def get_published_trip_version(self, slug: str) -> Optional[Dict]:
+        """
+        Lecture légère d'un voyage publié (publishedAt + isActive seulement),
+        pour valider une page en cache sans relire tout le document
+        """
+        try:
+            doc = self.db.collection(f'artifacts/{self.app_id}/publishedTrips').document(slug).get(
+                field_paths=['publishedAt', 'isActive']
+            )
+            if doc.exists:
+                return doc.to_dict() or {}
+            return None
+        except Exception as e:
+            print(f"Erreur lors de la récupération de la version du voyage publié: {e}")
+            return None
+    
     def create_published_trip(self, slug: str, trip_data: Dict) -> bool:
         """Publie un voyage avec un slug unique"""
         try:
@@ -530,26 +667,34 @@ class FirebaseService:
             return False
     
     def update_published_trip(self, slug: str, data: Dict) -> bool:
-        """Met à jour (ou crée) un voyage publié"""
+        """
+        Met à jour (ou crée) un voyage publié : chaque champ fourni est remplacé
+        entièrement (merge=True fusionnerait les maps, un POI retiré de
+        publicView.pois y resterait)
+        """
         try:
-            self.db.collection(f'artifacts/{self.app_id}/publishedTrips').document(slug).set(data, merge=True)
+            self.db.collection(f'artifacts/{self.app_id}/publishedTrips').document(slug).set(
+                data, merge=list(data)
+            )
             return True
         except Exception as e:
             print(f"Erreur lors de la mise à jour du voyage publié: {e}")
             return False
 
     def find_booking_by_join_code(self, code: str) -> Optional[Dict]:
-        """Trouve une réservation via son code de groupe"""
+        """Trouve une réservation via son code de groupe (document joinCodes/{code})"""
         try:
             # Uppercase lookup
             code = code.upper().strip()
-            bookings = self.db.collection(f'artifacts/{self.app_id}/bookings')\
-                .where('joinCode', '==', code).limit(1).stream()
-            for b in bookings:
-                data = b.to_dict()
-                data['id'] = b.id
-                return data
-            return None
+            booking_id = self._lookup_booking_id('joinCode', code)
+            if not booking_id:
+                return None
+            doc = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return data
         except Exception as e:
             print(f"Erreur recherche code groupe: {e}")
             return None
@@ -580,6 +725,22 @@ class FirebaseService:
             print(f"Erreur lors de la récupération des voyages publiés: {e}")
             return []
     
+    def get_published_trips_referencing(self, field: str, value: str) -> List[Dict]:
+        """Récupère les voyages publiés dont le tableau `field` (poiRefs, partnerIds) contient `value`"""
+        try:
+            trips = self.db.collection(f'artifacts/{self.app_id}/publishedTrips')\
+                .where(field, 'array_contains', value).stream()
+            
+            result = []
+            for trip in trips:
+                trip_data = trip.to_dict()
+                trip_data['slug'] = trip.id
+                result.append(trip_data)
+            return result
+        except Exception as e:
+            print(f"Erreur lors de la recherche des voyages publiés ({field}={value}): {e}")
+            return []
+    
     def check_slug_exists(self, slug: str) -> bool:
         """Vérifie si un slug est déjà utilisé"""
         try:
@@ -604,29 +765,51 @@ class FirebaseService:
             print(f"Erreur lors de la création de la transaction: {e}")
             return None
     
-    def increment_trip_checkouts(self, slug: str) -> bool:
-        """Incrémente le compteur de checkouts d'un voyage publié"""
+    def increment_trip_counter(self, slug: str, field: str, amount: int = 1) -> bool:
+        """
+        Incrémente un compteur (views, checkouts) d'un voyage publié sur un shard
+        aléatoire : les écritures sont réparties sur TRIP_COUNTER_SHARDS documents
+        au lieu de contendre sur le document du voyage
+        """
         try:
-            doc_ref = self.db.collection(f'artifacts/{self.app_id}/publishedTrips').document(slug)
-            doc_ref.update({
-                'stats.checkouts': firestore.Increment(1)
-            })
+            shard_id = str(random.randrange(TRIP_COUNTER_SHARDS))
+            self.db.collection(f'artifacts/{self.app_id}/publishedTrips/{slug}/counterShards')\
+                .document(shard_id).set({field: firestore.Increment(amount)}, merge=True)
             return True
         except Exception as e:
-            print(f"Erreur lors de l'incrémentation des checkouts: {e}")
+            print(f"Erreur lors de l'incrémentation du compteur {field}: {e}")
             return False
     
-    def increment_trip_views(self, slug: str) -> bool:
+    def increment_trip_checkouts(self, slug: str, amount: int = 1) -> bool:
+        """Incrémente le compteur de checkouts d'un voyage publié"""
+        return self.increment_trip_counter(slug, 'checkouts', amount)
+    
+    def increment_trip_views(self, slug: str, amount: int = 1) -> bool:
         """Incrémente le compteur de vues d'un voyage publié"""
+        return self.increment_trip_counter(slug, 'views', amount)
+    
+    def get_published_trip_counters(self, slug: str) -> Dict:
+        """
+        Agrège les compteurs d'un voyage publié (somme des shards + ancien champ
+        `stats` du document, alimenté avant le passage aux shards)
+        """
+        stats = {'views': 0, 'checkouts': 0}
         try:
-            doc_ref = self.db.collection(f'artifacts/{self.app_id}/publishedTrips').document(slug)
-            doc_ref.update({
-                'stats.views': firestore.Increment(1)
-            })
-            return True
+            trips_ref = self.db.collection(f'artifacts/{self.app_id}/publishedTrips')
+            
+            doc = trips_ref.document(slug).get()
+            if doc.exists:
+                legacy = (doc.to_dict() or {}).get('stats') or {}
+                for field in stats:
+                    stats[field] += legacy.get(field, 0) or 0
+            
+            for shard in trips_ref.document(slug).collection('counterShards').stream():
+                shard_data = shard.to_dict() or {}
+                for field in stats:
+                    stats[field] += shard_data.get(field, 0) or 0
         except Exception as e:
-            print(f"Erreur lors de l'incrémentation des vues: {e}")
-            return False
+            print(f"Erreur lors de la lecture des compteurs: {e}")
+        return stats
     
     # ============================================
     # MÉTHODES UTILITAIRES
@@ -1101,18 +1284,125 @@ class FirebaseService:
             print(f"Erreur récupération booking: {e}")
             return None
 
+    def get_bookings_by_ids(self, booking_ids: List[str]) -> Dict[str, Any]:
+        """Récupère plusieurs réservations en une lecture groupée (id -> TripBooking)"""
+        from app.models import TripBooking
+        docs = self.get_documents_by_ids(f'artifacts/{self.app_id}/bookings', booking_ids)
+        return {booking_id: TripBooking.from_dict(booking_id, data) for booking_id, data in docs.items()}
+
     def get_booking_by_token(self, access_token: str):
-        """Récupère une réservation par son token d'accès"""
+        """Récupère une réservation par son token d'accès (document accessTokens/{token})"""
         try:
-            from app.models import TripBooking
-            bookings = self.db.collection(f'artifacts/{self.app_id}/bookings').where('accessToken', '==', access_token).limit(1).stream()
-            for booking in bookings:
-                return TripBooking.from_dict(booking.id, booking.to_dict())
-            return None
+            booking_id = self._lookup_booking_id('accessToken', access_token)
+            return self.get_booking(booking_id) if booking_id else None
         except Exception as e:
             print(f"Erreur récupération booking par token: {e}")
             return None
 
+    def get_booking_by_stripe_session(self, session_id: str) -> Optional[Dict]:
+        """Récupère une réservation par sa session Stripe Checkout (document stripeSessions/{id})"""
+        try:
+            booking_id = self._lookup_booking_id('stripeSessionId', session_id)
+            if not booking_id:
+                return None
+            doc = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id).get()
+            if not doc.exists:
+                return None
+            data = doc.to_dict()
+            data['id'] = doc.id
+            return data
+        except Exception as e:
+            print(f"Erreur récupération booking par session Stripe: {e}")
+            return None
+
+    def _booking_index_fallback_enabled(self) -> bool:
+        """Recherche par requête nécessaire (index des anciennes réservations pas encore rattrapés) ?"""
+        if BOOKING_INDEX_QUERY_FALLBACK in ('true', 'false'):
+            return BOOKING_INDEX_QUERY_FALLBACK == 'true'
+        if self.app_id in _backfilled_booking_indexes:
+            return False
+        if self.db.document(f'artifacts/{self.app_id}/{BOOKING_INDEXES_BACKFILL_DOC}').get().exists:
+            _backfilled_booking_indexes.add(self.app_id)
+            return False
+        return True
+
+    def _lookup_booking_id(self, field: str, value: str) -> Optional[str]:
+        """
+        Résout un booking ID via son document d'index (lecture directe).
+        Tant que les index des anciennes réservations ne sont pas rattrapés,
+        un index absent est recherché par requête puis créé pour les lectures suivantes.
+        """
+        if not value:
+            return None
+        index_ref = self.db.collection(f'artifacts/{self.app_id}/{BOOKING_LOOKUP_INDEXES[field]}').document(value)
+        doc = index_ref.get()
+        if doc.exists:
+            return doc.to_dict().get('bookingId')
+        if not self._booking_index_fallback_enabled():
+            return None
+
+        bookings = self.db.collection(f'artifacts/{self.app_id}/bookings').where(field, '==', value).limit(1).stream()
+        for booking in bookings:
+            index_ref.set({'bookingId': booking.id, 'createdAt': firestore.SERVER_TIMESTAMP})
+            return booking.id
+        return None
+
+    def _booking_index_refs(self, booking_data: Dict) -> Dict[str, Any]:
+        """Références des documents d'index pour les champs indexés présents (non vides)"""
+        return {
+            field: self.db.collection(f'artifacts/{self.app_id}/{collection}').document(booking_data[field])
+            for field, collection in BOOKING_LOOKUP_INDEXES.items()
+            if booking_data.get(field)
+        }
+
+    def backfill_booking_indexes(self) -> Dict[str, int]:
+        """
+        Crée les documents d'index (joinCodes, accessTokens, stripeSessions) des
+        réservations qui n'en ont pas, puis marque le rattrapage comme terminé :
+        la recherche par requête sur `bookings` est alors désactivée
+
+        Returns:
+            Dict: {'bookings', 'created', 'existing', 'conflicts'} (conflit : valeur
+                  déjà indexée vers une autre réservation, l'index existant est gardé)
+        """
+        stats = {'bookings': 0, 'created': 0, 'existing': 0, 'conflicts': 0}
+        pending = []
+        for booking in self.db.collection(f'artifacts/{self.app_id}/bookings').stream():
+            stats['bookings'] += 1
+            for ref in self._booking_index_refs(booking.to_dict() or {}).values():
+                pending.append((ref, booking.id))
+
+        batch, batch_size = self.db.batch(), 0
+        claimed = {}
+        for start in range(0, len(pending), BATCH_WRITE_LIMIT):
+            chunk = pending[start:start + BATCH_WRITE_LIMIT]
+            snapshots = {doc.reference.path: doc for doc in self.db.get_all([ref for ref, _ in chunk])}
+            for ref, booking_id in chunk:
+                doc = snapshots.get(ref.path)
+                owner = doc.to_dict().get('bookingId') if doc is not None and doc.exists else claimed.get(ref.path)
+                if owner == booking_id:
+                    stats['existing'] += 1
+                elif owner:
+                    stats['conflicts'] += 1
+                    print(f"⚠️  {ref.path} déjà indexé vers {owner}, réservation {booking_id} ignorée")
+                else:
+                    claimed[ref.path] = booking_id
+                    batch.set(ref, {'bookingId': booking_id, 'createdAt': firestore.SERVER_TIMESTAMP})
+                    batch_size += 1
+                    stats['created'] += 1
+                    if batch_size >= BATCH_WRITE_LIMIT:
+                        batch.commit()
+                        batch, batch_size = self.db.batch(), 0
+        if batch_size:
+            batch.commit()
+
+        self.db.document(f'artifacts/{self.app_id}/{BOOKING_INDEXES_BACKFILL_DOC}').set({
+            'backfilledAt': firestore.SERVER_TIMESTAMP,
+            **stats
+        })
+        _backfilled_booking_indexes.add(self.app_id)
+        return stats
+
     def get_user_bookings(self, user_id: str) -> List[Dict]:
         """Récupère toutes les réservations d'un utilisateur"""
         try:
@@ -1123,22 +1413,82 @@ class FirebaseService:
             print(f"Erreur récupération bookings user: {e}")
             return []
 
-    def create_booking(self, booking_data: Dict) -> Optional[str]:
-        """Crée une nouvelle réservation"""
+    def create_booking(self, booking_data: Dict, booking_id: Optional[str] = None,
+                       join_code_factory=None) -> Optional[str]:
+        """
+        Crée une nouvelle réservation et ses documents d'index (joinCodes,
+        accessTokens, stripeSessions) dans une même transaction
+
+        Args:
+            booking_data: Données de la réservation
+            booking_id: ID imposé (sinon généré par Firestore)
+            join_code_factory: Générateur de code de groupe ; le code est tiré
+                               jusqu'à en trouver un libre (unicité garantie)
+
+        Returns:
+            str: ID de la réservation, ou None (erreur, token ou code déjà pris)
+        """
         try:
             booking_data['createdAt'] = firestore.SERVER_TIMESTAMP
             booking_data['updatedAt'] = firestore.SERVER_TIMESTAMP
-            doc_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').add(booking_data)
-            return doc_ref[1].id
+            bookings = self.db.collection(f'artifacts/{self.app_id}/bookings')
+            booking_ref = bookings.document(booking_id) if booking_id else bookings.document()
+            join_codes = self.db.collection(f'artifacts/{self.app_id}/joinCodes')
+            # Codes d'anciennes réservations sans index : vérifiés aussi par requête
+            check_legacy_codes = join_code_factory is not None and self._booking_index_fallback_enabled()
+
+            @firestore.transactional
+            def create(transaction):
+                data = dict(booking_data)
+
+                # Lectures d'abord : tirage d'un code libre puis vérification des index
+                if join_code_factory:
+                    for _ in range(JOIN_CODE_MAX_ATTEMPTS):
+                        code = join_code_factory()
+                        if join_codes.document(code).get(transaction=transaction).exists:
+                            continue
+                        if check_legacy_codes and any(
+                            True for _ in transaction.get(bookings.where('joinCode', '==', code).limit(1))
+                        ):
+                            continue
+                        data['joinCode'] = code
+                        break
+                    else:
+                        raise ValueError("Aucun code de groupe libre trouvé")
+
+                index_refs = self._booking_index_refs(data)
+                for field, ref in index_refs.items():
+                    if ref.get(transaction=transaction).exists:
+                        raise ValueError(f"{field} déjà utilisé: {data[field]}")
+
+                transaction.set(booking_ref, data)
+                for ref in index_refs.values():
+                    transaction.set(ref, {'bookingId': booking_ref.id, 'createdAt': firestore.SERVER_TIMESTAMP})
+                return data
+
+            created = create(self.db.transaction())
+            if 'joinCode' in created:
+                booking_data['joinCode'] = created['joinCode']
+            return booking_ref.id
         except Exception as e:
             print(f"Erreur création booking: {e}")
             return None
 
     def update_booking(self, booking_id: str, data: Dict) -> bool:
-        """Met à jour une réservation"""
+        """Met à jour une réservation (et les documents d'index des champs indexés modifiés)"""
         try:
             data['updatedAt'] = firestore.SERVER_TIMESTAMP
-            self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id).update(data)
+            booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+            index_refs = self._booking_index_refs(data)
+            if not index_refs:
+                booking_ref.update(data)
+                return True
+
+            batch = self.db.batch()
+            batch.update(booking_ref, data)
+            for ref in index_refs.values():
+                batch.set(ref, {'bookingId': booking_id, 'createdAt': firestore.SERVER_TIMESTAMP})
+            batch.commit()
             return True
         except Exception as e:
             print(f"Erreur MAJ booking: {e}")
@@ -1154,6 +1504,111 @@ class FirebaseService:
             print(f"Erreur récupération all bookings: {e}")
             return []
 
+    # ============================================
+    # ÉVÉNEMENTS STRIPE (WEBHOOKS IDEMPOTENTS)
+    # ============================================
+
+    def record_stripe_event(self, event_id: str, event_data: Dict) -> Optional[Dict]:
+        """
+        Enregistre un événement Stripe s'il n'a jamais été reçu (create() atomique)
+
+        Returns:
+            Dict: {'created': True} si nouveau, {'created': False, 'status', 'receivedAt'}
+                  si rejoué, None en cas d'erreur
+        """
+        from google.api_core.exceptions import AlreadyExists
+
+        ref = self.db.collection(f'artifacts/{self.app_id}/stripeEvents').document(event_id)
+        try:
+            ref.create({
+                **event_data,
+                'status': 'received',
+                'receivedAt': firestore.SERVER_TIMESTAMP
+            })
+            return {'created': True}
+        except AlreadyExists:
+            data = (ref.get().to_dict() or {})
+            return {'created': False, 'status': data.get('status'), 'receivedAt': data.get('receivedAt')}
+        except Exception as e:
+            print(f"Erreur enregistrement événement Stripe: {e}")
+            return None
+
+    def get_stripe_event(self, event_id: str) -> Optional[Dict]:
+        """Récupère un événement Stripe enregistré"""
+        try:
+            doc = self.db.collection(f'artifacts/{self.app_id}/stripeEvents').document(event_id).get()
+            if doc.exists:
+                return {'id': doc.id, **doc.to_dict()}
+            return None
+        except Exception as e:
+            print(f"Erreur récupération événement Stripe: {e}")
+            return None
+
+    def update_stripe_event(self, event_id: str, data: Dict) -> bool:
+        """Met à jour le statut de traitement d'un événement Stripe"""
+        try:
+            data['updatedAt'] = firestore.SERVER_TIMESTAMP
+            self.db.collection(f'artifacts/{self.app_id}/stripeEvents').document(event_id).update(data)
+            return True
+        except Exception as e:
+            print(f"Erreur MAJ événement Stripe: {e}")
+            return False
+
+    def commit_booking_event(self, event_id: str, booking_id: str, booking_data: Dict,
+                             organizer_data: Optional[Dict] = None) -> Optional[str]:
+        """
+        Applique un événement Stripe à une réservation dans une seule transaction :
+        réservation, organisateur (optionnel) et statut de l'événement sont écrits
+        ensemble, et un événement déjà traité n'est jamais réappliqué.
+
+        Args:
+            event_id: ID de l'événement Stripe
+            booking_id: ID de la réservation
+            booking_data: Champs à mettre à jour sur la réservation
+            organizer_data: Champs à mettre à jour sur l'utilisateur organisateur
+
+        Returns:
+            str: 'applied', 'duplicate' ou 'missing' (réservation introuvable)
+
+        Raises:
+            Exception: Erreur Firestore (la tâche sera marquée en échec)
+        """
+        event_ref = self.db.collection(f'artifacts/{self.app_id}/stripeEvents').document(event_id)
+        booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+
+        @firestore.transactional
+        def apply(transaction):
+            # Lectures d'abord (contrainte des transactions Firestore)
+            event_doc = event_ref.get(transaction=transaction)
+            if event_doc.exists and (event_doc.to_dict() or {}).get('status') == 'processed':
+                return 'duplicate'
+
+            booking_doc = booking_ref.get(transaction=transaction)
+            if not booking_doc.exists:
+                return 'missing'
+
+            # Organisateur absent (compte supprimé...) : le paiement est appliqué quand même
+            user_ref = None
+            organizer_id = (booking_doc.to_dict() or {}).get('organizerUserId')
+            if organizer_data and organizer_id:
+                user_ref = self.db.collection(f'artifacts/{self.app_id}/users').document(organizer_id)
+                if not user_ref.get(transaction=transaction).exists:
+                    print(f"⚠️  Organisateur {organizer_id} introuvable pour booking {booking_id}")
+                    user_ref = None
+
+            transaction.update(booking_ref, {**booking_data, 'updatedAt': firestore.SERVER_TIMESTAMP})
+            if user_ref is not None:
+                transaction.update(user_ref, organizer_data)
+
+            transaction.set(event_ref, {
+                'status': 'processed',
+                'bookingId': booking_id,
+                'processedAt': firestore.SERVER_TIMESTAMP
+            }, merge=True)
+            return 'applied'
+
+        return apply(self.db.transaction())
+
     # ============================================
     # GESTION DES PARTICIPANTS
     # ============================================
@@ -1168,6 +1623,18 @@ class FirebaseService:
             print(f"Erreur récupération participants: {e}")
             return []
 
+    def get_participant(self, booking_id: str, participant_id: str):
+        """Récupère un participant par son ID"""
+        try:
+            from app.models import Participant
+            doc = self.db.collection(f'artifacts/{self.app_id}/bookings/{booking_id}/participants').document(participant_id).get()
+            if doc.exists:
+                return Participant.from_dict(doc.id, doc.to_dict())
+            return None
+        except Exception as e:
+            print(f"Erreur récupération participant: {e}")
+            return None
+
     def get_participant_by_token(self, invitation_token: str):
         """Récupère un participant par son token d'invitation"""
         try:
@@ -1183,39 +1650,151 @@ class FirebaseService:
             print(f"Erreur récupération participant par token: {e}")
             return None
 
-    def create_participant(self, booking_id: str, participant_data: Dict) -> Optional[str]:
-        """Ajoute un participant à une réservation"""
+    @staticmethod
+    def _rider_counter(rider_type: Optional[str]) -> str:
+        """Champ compteur du booking correspondant à un type de participant"""
+        return 'passengerCount' if rider_type == 'passenger' else 'pilotCount'
+
+    def _participant_counters(self, booking_ref, booking_data: Dict, transaction=None) -> Dict[str, int]:
+        """
+        Compteurs de participants du booking (pilotCount, passengerCount, currentParticipants).
+        Réservations antérieures aux compteurs : recalculés une fois depuis la sous-collection.
+        """
+        if 'pilotCount' in booking_data and 'passengerCount' in booking_data:
+            return {
+                'pilotCount': booking_data.get('pilotCount', 0),
+                'passengerCount': booking_data.get('passengerCount', 0),
+                'currentParticipants': booking_data.get('pilotCount', 0) + booking_data.get('passengerCount', 0)
+            }
+
+        counters = {'pilotCount': 0, 'passengerCount': 0, 'currentParticipants': 0}
+        participants_query = booking_ref.collection('participants')
+        docs = transaction.get(participants_query) if transaction else participants_query.stream()
+        for doc in docs:
+            counters[self._rider_counter(doc.to_dict().get('riderType', 'pilot'))] += 1
+            counters['currentParticipants'] += 1
+        return counters
+
+    def create_participant(self, booking_id: str, participant_data: Dict,
+                           enforce_capacity: bool = False) -> Optional[str]:
+        """
+        Ajoute un participant à une réservation et met à jour les compteurs
+        du booking dans la même transaction
+
+        Args:
+            booking_id: ID de la réservation
+            participant_data: Données du participant
+            enforce_capacity: Refuse l'ajout si totalParticipants est atteint
+                              (vérifié dans la transaction : pas de surréservation)
+
+        Returns:
+            str: ID du participant, ou None (erreur ou groupe complet)
+        """
         try:
-            participant_data['createdAt'] = firestore.SERVER_TIMESTAMP
-            doc_ref = self.db.collection(f'artifacts/{self.app_id}/bookings/{booking_id}/participants').add(participant_data)
-            return doc_ref[1].id
+            booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+            participant_ref = booking_ref.collection('participants').document()
+
+            @firestore.transactional
+            def create(transaction):
+                booking_doc = booking_ref.get(transaction=transaction)
+                if not booking_doc.exists:
+                    print(f"Erreur création participant: booking {booking_id} introuvable")
+                    return None
+
+                booking_data = booking_doc.to_dict()
+                counters = self._participant_counters(booking_ref, booking_data, transaction)
+                if enforce_capacity and counters['currentParticipants'] >= booking_data.get('totalParticipants', 1):
+                    print(f"⚠️  Booking {booking_id} complet ({counters['currentParticipants']} participants)")
+                    return None
+
+                counters[self._rider_counter(participant_data.get('riderType', 'pilot'))] += 1
+                counters['currentParticipants'] += 1
+
+                transaction.set(participant_ref, {**participant_data, 'createdAt': firestore.SERVER_TIMESTAMP})
+                transaction.update(booking_ref, {**counters, 'updatedAt': firestore.SERVER_TIMESTAMP})
+                return participant_ref.id
+
+            return create(self.db.transaction())
         except Exception as e:
             print(f"Erreur création participant: {e}")
             return None
 
     def update_participant(self, booking_id: str, participant_id: str, data: Dict) -> bool:
-        """Met à jour un participant"""
+        """Met à jour un participant (compteurs du booking ajustés si riderType change)"""
         try:
-            self.db.collection(f'artifacts/{self.app_id}/bookings/{booking_id}/participants').document(participant_id).update(data)
-            return True
+            booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+            participant_ref = booking_ref.collection('participants').document(participant_id)
+            if 'riderType' not in data:
+                participant_ref.update(data)
+                return True
+
+            @firestore.transactional
+            def update(transaction):
+                participant_doc = participant_ref.get(transaction=transaction)
+                booking_doc = booking_ref.get(transaction=transaction)
+                if not participant_doc.exists or not booking_doc.exists:
+                    return False
+
+                counters = self._participant_counters(booking_ref, booking_doc.to_dict(), transaction)
+                previous = self._rider_counter(participant_doc.to_dict().get('riderType', 'pilot'))
+                counters[previous] = max(0, counters[previous] - 1)
+                counters[self._rider_counter(data['riderType'])] += 1
+
+                transaction.update(participant_ref, data)
+                transaction.update(booking_ref, {**counters, 'updatedAt': firestore.SERVER_TIMESTAMP})
+                return True
+
+            return update(self.db.transaction())
         except Exception as e:
             print(f"Erreur MAJ participant: {e}")
             return False
 
     def delete_participant(self, booking_id: str, participant_id: str) -> bool:
-        """Supprime un participant"""
-        try:
-            self.db.collection(f'artifacts/{self.app_id}/bookings/{booking_id}/participants').document(participant_id).delete()
-            return True
+        """Supprime un participant et décrémente les compteurs du booking (transaction)"""
+        try:
+            booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+            participant_ref = booking_ref.collection('participants').document(participant_id)
+
+            @firestore.transactional
+            def delete(transaction):
+                participant_doc = participant_ref.get(transaction=transaction)
+                booking_doc = booking_ref.get(transaction=transaction)
+                if not participant_doc.exists:
+                    return False
+
+                if booking_doc.exists:
+                    counters = self._participant_counters(booking_ref, booking_doc.to_dict(), transaction)
+                    counter = self._rider_counter(participant_doc.to_dict().get('riderType', 'pilot'))
+                    counters[counter] = max(0, counters[counter] - 1)
+                    counters['currentParticipants'] = max(0, counters['currentParticipants'] - 1)
+                    transaction.update(booking_ref, {**counters, 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+                transaction.delete(participant_ref)
+                return True
+
+            return delete(self.db.transaction())
         except Exception as e:
             print(f"Erreur suppression participant: {e}")
             return False
 
+    def participant_email_exists(self, booking_id: str, email: str) -> bool:
+        """Vérifie si un email figure déjà parmi les participants (lecture d'un seul document)"""
+        try:
+            participants = self.db.collection(f'artifacts/{self.app_id}/bookings/{booking_id}/participants')\
+                .where('email', '==', email).limit(1).stream()
+            return any(True for _ in participants)
+        except Exception as e:
+            print(f"Erreur vérification email participant: {e}")
+            return False
+
     def count_pilots(self, booking_id: str) -> int:
-        """Compte le nombre de pilotes dans une réservation"""
+        """Nombre de pilotes d'une réservation (compteur pilotCount du booking)"""
         try:
-            participants = self.get_booking_participants(booking_id)
-            return sum(1 for p in participants if p.rider_type == 'pilot')
+            booking_ref = self.db.collection(f'artifacts/{self.app_id}/bookings').document(booking_id)
+            doc = booking_ref.get()
+            if not doc.exists:
+                return 0
+            return self._participant_counters(booking_ref, doc.to_dict())['pilotCount']
         except Exception as e:
             print(f"Erreur comptage pilotes: {e}")
             return 0
@@ -1383,28 +1962,26 @@ class FirebaseService:
             print(f"Erreur lors de la recherche par Google Place ID: {e}")
             return None
     
-    def create_hotel(self, user_id: str, hotel_data: Dict) -> Optional[str]:
-        """Crée un nouvel hôtel dans la banque"""
-        try:
-            # Initialise la structure complète
-            hotel_doc = {
-                'name': hotel_data.get('name'),
-                'city': hotel_data.get('city'),
-                'address': hotel_data.get('address', ''),
-                'googlePlaceId': hotel_data.get('googlePlaceId', ''),
-                
-                'contact': {
-                    'phone': hotel_data.get('contact', {}).get('phone', ''),
-                    'email': hotel_data.get('contact', {}).get('email', ''),
-                    'website': hotel_data.get('contact', {}).get('website', '')
-                },
-                
-                'defaultPricing': {
-                    'priceDouble': float(hotel_data.get('defaultPricing', {}).get('priceDouble', 0)),
-                    'priceSolo': float(hotel_data.get('defaultPricing', {}).get('priceSolo', 0)),
-                    'currency': 'EUR'
-                },
-                
+    def _build_hotel_doc(self, user_id: str, hotel_data: Dict) -> Dict:
+        """Construit la structure complète d'un document hôtel"""
+        return {
+            'name': hotel_data.get('name'),
+            'city': hotel_data.get('city'),
+            'address': hotel_data.get('address', ''),
+            'googlePlaceId': hotel_data.get('googlePlaceId', ''),
+            
+            'contact': {
+                'phone': hotel_data.get('contact', {}).get('phone', ''),
+                'email': hotel_data.get('contact', {}).get('email', ''),
+                'website': hotel_data.get('contact', {}).get('website', '')
+            },
+            
+            'defaultPricing': {
+                'priceDouble': float(hotel_data.get('defaultPricing', {}).get('priceDouble', 0)),
+                'priceSolo': float(hotel_data.get('defaultPricing', {}).get('priceSolo', 0)),
+                'currency': 'EUR'
+            },
+            
             'photos': hotel_data.get('photos', []),
             'partnerIds': hotel_data.get('partnerIds', []),
             'type': hotel_data.get('type', 'hotel'),
@@ -1415,17 +1992,22 @@ class FirebaseService:
                 'totalRatings': 0,
                 'lastRatingAt': None
             },
-                
-                'usageStats': {
-                    'usedInTrips': [],
-                    'usedCount': 0,
-                    'lastUsed': None
-                },
-                
-                'createdAt': firestore.SERVER_TIMESTAMP,
-                'createdBy': user_id,
-                'updatedAt': firestore.SERVER_TIMESTAMP
-            }
+            
+            'usageStats': {
+                'usedInTrips': [],
+                'usedCount': 0,
+                'lastUsed': None
+            },
+            
+            'createdAt': firestore.SERVER_TIMESTAMP,
+            'createdBy': user_id,
+            'updatedAt': firestore.SERVER_TIMESTAMP
+        }
+    
+    def create_hotel(self, user_id: str, hotel_data: Dict) -> Optional[str]:
+        """Crée un nouvel hôtel dans la banque"""
+        try:
+            hotel_doc = self._build_hotel_doc(user_id, hotel_data)
             
             doc_ref = self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/hotels').add(hotel_doc)
             return doc_ref[1].id
@@ -1433,6 +2015,78 @@ class FirebaseService:
             print(f"Erreur lors de la création de l'hôtel: {e}")
             return None
     
+    def allocate_hotel_id(self, user_id: str) -> str:
+        """Réserve un ID de document hôtel (généré localement, sans appel réseau)"""
+        return self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/hotels').document().id
+    
+    def iter_bulk_upsert_hotels(self, user_id: str, creates: List[Dict], updates: List[Dict]):
+        """
+        Crée et met à jour des hôtels par WriteBatch (max 500 opérations par commit)
+        
+        Args:
+            creates: Hôtels à créer (même format que create_hotel, 'id' optionnel pré-alloué)
+            updates: Mises à jour {'id': ..., 'partnerIds': [...], ...autres champs}
+                     Les partnerIds sont ajoutés via ArrayUnion (sans lecture préalable)
+        
+        Yields:
+            Dict: Progression après chaque commit
+                  {'committed': n, 'total': n, 'batch': i, 'batches': n, 'created': n, 'updated': n, 'errors': n}
+        """
+        hotels_ref = self.db.collection(f'artifacts/{self.app_id}/users/{user_id}/hotels')
+        
+        operations = [('create', hotel) for hotel in creates] + [('update', update) for update in updates]
+        total = len(operations)
+        total_batches = (total + BATCH_WRITE_LIMIT - 1) // BATCH_WRITE_LIMIT
+        progress = {'committed': 0, 'total': total, 'batch': 0, 'batches': total_batches,
+                    'created': 0, 'updated': 0, 'errors': 0}
+        
+        for start in range(0, total, BATCH_WRITE_LIMIT):
+            chunk = operations[start:start + BATCH_WRITE_LIMIT]
+            batch = self.db.batch()
+            
+            for op, data in chunk:
+                if op == 'create':
+                    hotel_id = data.get('id') or hotels_ref.document().id
+                    data['id'] = hotel_id
+                    batch.set(hotels_ref.document(hotel_id), self._build_hotel_doc(user_id, data))
+                else:
+                    fields = {k: v for k, v in data.items() if k not in ('id', 'partnerIds')}
+                    if data.get('partnerIds'):
+                        fields['partnerIds'] = firestore.ArrayUnion(list(data['partnerIds']))
+                    fields['updatedAt'] = firestore.SERVER_TIMESTAMP
+                    batch.update(hotels_ref.document(data['id']), fields)
+            
+            try:
+                batch.commit()
+                progress['created'] += sum(1 for op, _ in chunk if op == 'create')
+                progress['updated'] += sum(1 for op, _ in chunk if op == 'update')
+            except Exception as e:
+                print(f"Erreur lors du commit groupé des hôtels: {e}")
+                progress['errors'] += len(chunk)
+            
+            progress['committed'] += len(chunk)
+            progress['batch'] += 1
+            yield dict(progress)
+    
+    def bulk_upsert_hotels(self, user_id: str, creates: List[Dict], updates: List[Dict],
+                           progress_callback=None) -> Dict:
+        """
+        Version non-streaming de iter_bulk_upsert_hotels
+        
+        Returns:
+            Dict: Bilan {'created': n, 'updated': n, 'errors': n, 'batches': n}
+        """
+        result = {'created': 0, 'updated': 0, 'errors': 0, 'batches': 0}
+        try:
+            for progress in self.iter_bulk_upsert_hotels(user_id, creates, updates):
+                result = {key: progress[key] for key in ('created', 'updated', 'errors')}
+                result['batches'] = progress['batch']
+                if progress_callback:
+                    progress_callback(progress)
+        except Exception as e:
+            print(f"Erreur lors de l'import groupé des hôtels: {e}")
+        return result
+    
     def update_hotel(self, user_id: str, hotel_id: str, data: Dict) -> bool:
         """Met à jour un hôtel"""
         try:
@@ -2034,17 +2688,54 @@ class FirebaseService:
             print(f"Erreur lecture guide GPS: {e}")
             return None
 
-    def save_gps_guide(self, key: str, data: Dict) -> bool:
-        """Sauvegarde un guide GPS généré par l'IA"""
+    def save_gps_guide(self, key: str, data: Dict, version: Optional[int] = None, source: str = 'live') -> bool:
+        """
+        Sauvegarde un guide GPS généré par l'IA
+
+        Args:
+            key: Clé canonique de l'appareil
+            data: Guide (title, icon, content)
+            version: Version du générateur (prompt/modèle) ayant produit le guide
+            source: 'live' (requête utilisateur) ou 'pregenerated' (job de préchauffage)
+        """
         try:
-            self.db.collection(f'artifacts/{self.app_id}/gpsGuides').document(key).set({
+            doc = {
                 **data,
+                'source': source,
+                'revision': firestore.Increment(1),
                 'updatedAt': firestore.SERVER_TIMESTAMP
-            })
+            }
+            if version is not None:
+                doc['guideVersion'] = version
+            # merge : conserve le compteur de révisions d'une version à l'autre
+            self.db.collection(f'artifacts/{self.app_id}/gpsGuides').document(key).set(doc, merge=True)
             return True
         except Exception as e:
             print(f"Erreur sauvegarde guide GPS: {e}")
             return False
+
+    def record_gps_guide_query(self, key: str, query: str) -> bool:
+        """Journalise une question GPS non couverte par les guides statiques (catalogue de préchauffage)"""
+        try:
+            self.db.collection(f'artifacts/{self.app_id}/gpsGuideQueries').document(key).set({
+                'count': firestore.Increment(1),
+                'lastQuery': query[:200],
+                'lastSeenAt': firestore.SERVER_TIMESTAMP
+            }, merge=True)
+            return True
+        except Exception as e:
+            print(f"Erreur journal guide GPS: {e}")
+            return False
+
+    def get_top_gps_guide_queries(self, limit: int = 100) -> List[Dict]:
+        """Questions GPS les plus fréquentes (journal des requêtes)"""
+        try:
+            docs = self.db.collection(f'artifacts/{self.app_id}/gpsGuideQueries')\
+                .order_by('count', direction=firestore.Query.DESCENDING).limit(limit).stream()
+            return [{'key': doc.id, **doc.to_dict()} for doc in docs]
+        except Exception as e:
+            print(f"Erreur lecture journal guides GPS: {e}")
+            return []
     
     def get_poi(self, poi_id: str) -> Optional[Dict]:
         """Récupère un POI spécifique"""
@@ -2059,6 +2750,10 @@ class FirebaseService:
             print(f"Erreur lors de la récupération du POI: {e}")
             return None
     
+    def get_pois_by_ids(self, poi_ids: List[str]) -> Dict[str, Dict]:
+        """Récupère plusieurs POIs en une seule lecture groupée (id -> POI)"""
+        return self.get_documents_by_ids(f'artifacts/{self.app_id}/pois', poi_ids)
+    
     def create_poi(self, poi_data: Dict) -> Optional[str]:
         """Crée un nouveau POI (collection globale)"""
         try:
@@ -2,23 +2,110 @@
 Service Gemini AI pour parser les données Excel d'import d'hôtels
 Utilise la même clé API que Google Maps/Places
 """
+from __future__ import annotations
 
-import google.generativeai as genai
 import os
 import json
 import re
 import random
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
-# Configure Gemini avec la clé Google Maps existante
+from app.services.llm_cache import get_llm_cache
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Clé Google Maps existante (Gemini est configuré au premier appel)
 GOOGLE_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY')
 
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    
 # Modèle à utiliser (Gemini 2.5 Flash - rapide et efficace pour le parsing)
 MODEL_NAME = 'gemini-2.5-flash'
 
+# Traitement des imports Excel par lots (en parallèle)
+BATCH_SIZE = 10
+MAX_PARALLEL_BATCHES = int(os.getenv('GEMINI_MAX_PARALLEL_BATCHES', '4'))
+MAX_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_MAX_RPM', '60'))
+BATCH_MAX_RETRIES = 2
+
+# Parsing local (sans LLM) quand le mapping des colonnes est fiable
+LOCAL_PARSE_REQUIRED_COLUMNS = ('name', 'city', 'address')
+LOCAL_PARSE_MIN_FILL_RATE = 0.8
+
+# Durées de vie du cache des réponses Gemini (secondes)
+CACHE_TTL_IMPORT = 30 * 24 * 3600
+CACHE_TTL_TEASER = 7 * 24 * 3600
+CACHE_TTL_GPS_GUIDE = 90 * 24 * 3600
+GPS_GUIDE_MODEL_NAME = 'gemini-3-pro-preview'
+
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _get_genai():
+    """
+    Importe et configure google.generativeai au premier appel : l'import
+    coûte plusieurs centaines de ms et n'est utile qu'aux routes qui appellent Gemini
+    """
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                from app.services.instrumentation import instrument_gemini
+
+                if GOOGLE_API_KEY:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                instrument_gemini(genai)
+                _genai = genai
+    return _genai
+
+
+def _parse_json_response(text: str):
+    """Retire les éventuels backticks markdown et parse le JSON"""
+    text = text.strip()
+    text = re.sub(r'^```json\s*', '', text)
+    text = re.sub(r'^```\s*', '', text)
+    text = re.sub(r'\s*```$', '', text)
+    return json.loads(text)
+
+
+def _generate_cached(prompt: str, parse: Callable, ttl: int, namespace: str,
+                     model_name: str = MODEL_NAME, model=None, force_refresh: bool = False):
+    """
+    Appelle Gemini en passant par le cache persistant des réponses
+    
+    La réponse n'est mise en cache que si `parse` réussit, pour ne jamais
+    resservir une réponse inexploitable.
+    
+    Args:
+        prompt: Prompt envoyé au modèle
+        parse: Fonction appliquée au texte brut (ex: _parse_json_response)
+        ttl: Durée de vie de l'entrée en secondes
+        namespace: Catégorie pour les statistiques (import, teaser, gps_guide...)
+        model_name: Nom du modèle (fait partie de la clé de cache)
+        model: Instance GenerativeModel à réutiliser (optionnel)
+        force_refresh: Ignore le cache et régénère la réponse
+        
+    Returns:
+        Résultat de `parse`
+    """
+    cache = get_llm_cache()
+    
+    if not force_refresh:
+        cached = cache.get(model_name, prompt, namespace=namespace)
+        if cached is not None:
+            return parse(cached)
+    
+    model = model or _get_genai().GenerativeModel(model_name)
+    text = model.generate_content(prompt).text.strip()
+    result = parse(text)
+    cache.set(model_name, prompt, text, ttl=ttl, namespace=namespace)
+    return result
+
 
 def parse_hotel_data(raw_data: Dict[str, str]) -> Optional[Dict]:
     """
@@ -85,7 +172,7 @@ Retourne UNIQUEMENT le JSON (sans markdown, sans backticks):
 """
 
         # Appelle Gemini
-        model = genai.GenerativeModel(MODEL_NAME)
+        model = _get_genai().GenerativeModel(MODEL_NAME)
         response = model.generate_content(prompt)
         
         # Parse la réponse JSON
@@ -241,10 +328,95 @@ def normalize_phone(phone: str) -> str:
     return phone if phone else ''
 
 
-import pandas as pd
-import io
+NAME_PREFIX_PATTERN = r"^(?:maison d['’]h[ôo]tes|chambres? d['’]h[ôo]tes|b&b|g[îi]te|h[ôo]tel)\s+à\s+"
+
+
+def mapping_confidence(df: pd.DataFrame, mapping: Dict) -> float:
+    """
+    Mesure la fiabilité du mapping détecté pour les colonnes essentielles
+    (name, city, address) : taux de remplissage minimum de ces colonnes
+    
+    Returns:
+        Score entre 0 et 1 (0 si une colonne essentielle est absente)
+    """
+    if df.empty:
+        return 0.0
+    
+    fill_rates = []
+    for standard_col in LOCAL_PARSE_REQUIRED_COLUMNS:
+        found_col = mapping.get(standard_col)
+        if not found_col or found_col not in df.columns:
+            return 0.0
+        values = df[found_col].astype(str).str.strip()
+        fill_rates.append((values != '').mean())
+    
+    return float(min(fill_rates))
+
 
-def detect_excel_structure(df_preview: pd.DataFrame) -> Dict:
+def normalize_dataframe_locally(final_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Applique en vectorisé (Pandas) les mêmes règles que le prompt Gemini :
+    nettoyage du nom, type normalisé, téléphone au format +32...
+    
+    Args:
+        final_df: DataFrame aux colonnes standard (name, city, address, ...)
+        
+    Returns:
+        DataFrame normalisé avec les 7 colonnes standard
+    """
+    import pandas as pd
+    
+    def column(name):
+        if name in final_df.columns:
+            return final_df[name].astype(str).str.strip()
+        return pd.Series('', index=final_df.index)
+    
+    # Nom : garde ce qui suit " | " puis retire les préfixes "Chambre d'hôtes à", etc.
+    name = column('name')
+    name = name.where(~name.str.contains(' | ', regex=False), name.str.split(' | ', n=1, regex=False).str[-1])
+    name = name.str.replace(NAME_PREFIX_PATTERN, '', case=False, regex=True).str.strip()
+    
+    # Type
+    type_lower = column('type').str.lower()
+    hotel_type = pd.Series('hotel', index=final_df.index)
+    hotel_type = hotel_type.mask(type_lower.str.contains('gite|gîte', regex=True), 'gite')
+    hotel_type = hotel_type.mask(type_lower.str.contains('maison', regex=False), 'maison_hote')
+    hotel_type = hotel_type.mask(type_lower.str.contains('chambre|b&b', regex=True), 'chambre_hote')
+    hotel_type = hotel_type.mask(type_lower.isin(['hotel', 'gite', 'chambre_hote', 'maison_hote']), type_lower)
+    
+    # Téléphone (les cellules numériques Excel arrivent en "32471...0.0")
+    phone = column('phone').str.replace(r'\.0$', '', regex=True).str.replace(r'[^\d+]', '', regex=True)
+    starts_0032 = phone.str.startswith('0032')
+    starts_32 = phone.str.startswith('32') & (phone.str.len() >= 10)
+    starts_0 = phone.str.startswith('0') & ~starts_0032 & (phone.str.len() >= 9)
+    phone = phone.mask(starts_0032, '+' + phone.str[2:])
+    phone = phone.mask(starts_32, '+' + phone)
+    phone = phone.mask(starts_0, '+32' + phone.str[1:])
+    
+    return pd.DataFrame({
+        'name': name,
+        'city': column('city'),
+        'address': column('address'),
+        'type': hotel_type,
+        'description': column('description').str[:500].str.strip(),
+        'phone': phone,
+        'website': column('website')
+    })
+
+
+def local_rows_validity(normalized_df: pd.DataFrame) -> pd.Series:
+    """
+    Valide les lignes normalisées localement : les lignes invalides
+    (nom ou ville vide, nom anormalement long) sont confiées à Gemini
+    
+    Returns:
+        Masque booléen des lignes valides
+    """
+    name_len = normalized_df['name'].str.len()
+    return (name_len > 0) & (name_len <= 120) & (normalized_df['city'].str.len() > 0)
+
+
+def detect_excel_structure(df_preview: pd.DataFrame, force_refresh: bool = False) -> Dict:
     """
     Utilise Gemini pour détecter la structure du fichier Excel (ligne d'en-tête et mapping des colonnes)
     """
@@ -284,28 +456,155 @@ RETOURNE UNIQUEMENT CE JSON:
 }}
 Si une colonne n'est pas trouvée, mets null.
 """
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(prompt)
-        
-        text = response.text.strip()
-        text = re.sub(r'^```json\s*', '', text)
-        text = re.sub(r'^```\s*', '', text)
-        text = re.sub(r'\s*```$', '', text)
-        
-        return json.loads(text)
+        return _generate_cached(prompt, _parse_json_response, CACHE_TTL_IMPORT,
+                                namespace='excel_structure', force_refresh=force_refresh)
     except Exception as e:
         print(f"⚠️ Erreur détection structure: {e}")
         return {"header_row_index": 0, "column_mapping": {}}
 
-def parse_excel_file_with_gemini(file_bytes: bytes, filename: str, progress_callback=None) -> Optional[list]:
+class _RateLimiter:
+    """Limiteur simple (thread-safe) : espace les appels d'un intervalle minimum"""
+    
+    def __init__(self, max_per_minute: int):
+        self.interval = 60.0 / max_per_minute if max_per_minute > 0 else 0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+    
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _build_batch_prompt(csv_data: str) -> str:
+    """Construit le prompt d'extraction pour un lot de lignes CSV"""
+    return f"""
+Analyse les données CSV d'hôtels ci-dessous.
+Les colonnes sont DÉJÀ normalisées (name, city, address, type, description, phone, website).
+
+DONNÉES CSV:
+{csv_data}
+
+TACHE:
+Extrais les données en JSON propre.
+1. Nettoie le "name" (retire "Chambre d'hôtes à", etc. et garde après " | " si présent).
+2. Normalise le "type" (hotel, gite, chambre_hote, maison_hote).
+3. Ajoute +32 au "phone" si nécessaire.
+
+RETOURNE UNIQUEMENT UN TABLEAU JSON:
+[
+  {{
+    "name": "...",
+    "city": "...",
+    "address": "...",
+    "type": "...",
+    "description": "...",
+    "phone": "...",
+    "website": "..."
+  }}
+]
+"""
+
+
+def _run_batch(model, batch_num: int, csv_data: str, limiter: _RateLimiter,
+               max_retries: int = BATCH_MAX_RETRIES, force_refresh: bool = False) -> List[Dict]:
+    """
+    Envoie un lot à Gemini avec retry (backoff exponentiel)
+    
+    Returns:
+        Liste des hôtels extraits (vide si le lot échoue définitivement)
+    """
+    prompt = _build_batch_prompt(csv_data)
+    cache = get_llm_cache()
+    
+    for attempt in range(max_retries + 1):
+        try:
+            # Les lots déjà vus ne consomment ni quota ni créneau du limiteur
+            if attempt == 0 and not force_refresh:
+                cached = cache.get(MODEL_NAME, prompt, namespace='excel_batch')
+                if cached is not None:
+                    batch_hotels = _parse_json_response(cached)
+                    return batch_hotels if isinstance(batch_hotels, list) else []
+            
+            limiter.wait()
+            batch_hotels = _generate_cached(prompt, _parse_json_response, CACHE_TTL_IMPORT,
+                                            namespace='excel_batch', model=model, force_refresh=True)
+            return batch_hotels if isinstance(batch_hotels, list) else []
+        except Exception as e:
+            if attempt < max_retries:
+                delay = 2 ** attempt
+                print(f"⚠️ Lot {batch_num} en échec ({e}), nouvel essai dans {delay}s...")
+                time.sleep(delay)
+            else:
+                print(f"❌ Erreur lot {batch_num}: {e}")
+    
+    return []
+
+
+def process_batches_concurrently(batches: List[str], progress_callback=None,
+                                 max_workers: int = MAX_PARALLEL_BATCHES,
+                                 max_per_minute: int = MAX_REQUESTS_PER_MINUTE,
+                                 force_refresh: bool = False) -> List[Dict]:
+    """
+    Traite les lots CSV en parallèle (nombre de lots simultanés plafonné,
+    débit limité, retry par lot) et fusionne les résultats dans l'ordre du fichier
+    
+    Args:
+        batches: Données CSV de chaque lot
+        progress_callback: callback(message, pourcentage) appelé à chaque lot terminé (10% -> 80%)
+        max_workers: Nombre max d'appels Gemini simultanés
+        max_per_minute: Nombre max d'appels Gemini par minute
+        force_refresh: Ignore le cache des réponses Gemini
+        
+    Returns:
+        Liste des hôtels extraits, dans l'ordre des lots
+    """
+    total_batches = len(batches)
+    if not total_batches:
+        return []
+    
+    # Un seul modèle partagé par tous les lots
+    model = _get_genai().GenerativeModel(MODEL_NAME)
+    limiter = _RateLimiter(max_per_minute)
+    results = [[] for _ in batches]
+    completed = 0
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total_batches))) as executor:
+        futures = {
+            executor.submit(_run_batch, model, index + 1, csv_data, limiter,
+                            force_refresh=force_refresh): index
+            for index, csv_data in enumerate(batches)
+        }
+        
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            completed += 1
+            
+            if progress_callback:
+                percent = 10 + int((completed / total_batches) * 70)
+                progress_callback(f"Analyse lot {completed}/{total_batches}...", percent)
+    
+    return [hotel for batch_hotels in results for hotel in batch_hotels]
+
+
+def parse_excel_file_with_gemini(file_bytes: bytes, filename: str, progress_callback=None,
+                                 force_refresh: bool = False) -> Optional[list]:
     """
     Parse le fichier Excel localement avec Pandas et envoie les données textuelles à Gemini
+    (les réponses sont mises en cache : un ré-import du même fichier ne rappelle pas Gemini,
+    sauf avec force_refresh=True)
     """
     
     if not GOOGLE_API_KEY:
         print("⚠️ GOOGLE_MAPS_API_KEY non configurée")
         return None
     
+    import io
+    import pandas as pd
+    
     try:
         if progress_callback:
             progress_callback("Analyse de la structure du fichier...", 5)
@@ -322,7 +621,7 @@ def parse_excel_file_with_gemini(file_bytes: bytes, filename: str, progress_call
                 df_preview = pd.read_csv(io.BytesIO(file_bytes), header=None, nrows=20, sep=';', engine='python')
         else:
             df_preview = pd.read_excel(io.BytesIO(file_bytes), header=None, nrows=20)
-        structure = detect_excel_structure(df_preview)
+        structure = detect_excel_structure(df_preview, force_refresh=force_refresh)
         
         header_row = structure.get('header_row_index', 0)
         mapping = structure.get('column_mapping', {})
@@ -355,67 +654,34 @@ def parse_excel_file_with_gemini(file_bytes: bytes, filename: str, progress_call
         if 'description' in final_df.columns:
             final_df['description'] = final_df['description'].astype(str).apply(lambda x: x[:300] + '...' if len(x) > 300 else x)
             
-        # 4. Traitement par lots (Chunking)
-        BATCH_SIZE = 10
+        # 4. Chemin rapide : parsing local si le mapping est fiable,
+        #    seules les lignes invalides partent chez Gemini
         all_hotels = []
-        
-        total_rows = len(final_df)
-        print(f"🔄 Traitement de {total_rows} lignes en lots de {BATCH_SIZE}...")
-        
-        for i in range(0, total_rows, BATCH_SIZE):
-            batch_num = i//BATCH_SIZE + 1
-            total_batches = (total_rows + BATCH_SIZE - 1) // BATCH_SIZE
+        llm_df = final_df
+        
+        confidence = mapping_confidence(df, mapping)
+        if confidence >= LOCAL_PARSE_MIN_FILL_RATE:
+            local_df = normalize_dataframe_locally(final_df)
+            valid = local_rows_validity(local_df)
+            all_hotels = local_df[valid].to_dict('records')
+            llm_df = final_df[~valid]
+            print(f"⚡ Parsing local (confiance {confidence:.0%}): {len(all_hotels)} lignes, {len(llm_df)} pour Gemini")
             
             if progress_callback:
-                percent = 10 + int((i / total_rows) * 70)
-                progress_callback(f"Analyse lot {batch_num}/{total_batches}...", percent)
-            
-            batch_df = final_df.iloc[i:i+BATCH_SIZE]
-            csv_data = batch_df.to_csv(index=False)
-            
-            prompt = f"""
-Analyse les données CSV d'hôtels ci-dessous.
-Les colonnes sont DÉJÀ normalisées (name, city, address, type, description, phone, website).
-
-DONNÉES CSV:
-{csv_data}
-
-TACHE:
-Extrais les données en JSON propre.
-1. Nettoie le "name" (retire "Chambre d'hôtes à", etc. et garde après " | " si présent).
-2. Normalise le "type" (hotel, gite, chambre_hote, maison_hote).
-3. Ajoute +32 au "phone" si nécessaire.
-
-RETOURNE UNIQUEMENT UN TABLEAU JSON:
-[
-  {{
-    "name": "...",
-    "city": "...",
-    "address": "...",
-    "type": "...",
-    "description": "...",
-    "phone": "...",
-    "website": "..."
-  }}
-]
-"""
-            try:
-                model = genai.GenerativeModel(MODEL_NAME)
-                response = model.generate_content(prompt)
-                
-                text = response.text.strip()
-                text = re.sub(r'^```json\s*', '', text)
-                text = re.sub(r'^```\s*', '', text)
-                text = re.sub(r'\s*```$', '', text)
-                
-                batch_hotels = json.loads(text)
-                if isinstance(batch_hotels, list):
-                    all_hotels.extend(batch_hotels)
-            except Exception as e:
-                print(f"❌ Erreur lot {batch_num}: {e}")
-                continue
-        
-        # 5. Normalisation finale
+                progress_callback(f"{len(all_hotels)} lignes analysées localement...", 15)
+        
+        # 5. Traitement par lots (Chunking) en parallèle
+        total_rows = len(llm_df)
+        batches = [
+            llm_df.iloc[i:i+BATCH_SIZE].to_csv(index=False)
+            for i in range(0, total_rows, BATCH_SIZE)
+        ]
+        if batches:
+            print(f"🔄 Traitement de {total_rows} lignes en {len(batches)} lots de {BATCH_SIZE}...")
+            all_hotels.extend(process_batches_concurrently(batches, progress_callback=progress_callback,
+                                                           force_refresh=force_refresh))
+        
+        # 6. Normalisation finale
         normalized_hotels = []
         for hotel in all_hotels:
             normalized = {
@@ -496,8 +762,11 @@ def parse_full_excel_file(excel_data_str: str) -> Optional[list]:
     return None
 
 
-def generate_trip_teaser(trip_data: Dict) -> str:
-    """Génère un texte marketing pour le teaser d'un voyage"""
+def generate_trip_teaser(trip_data: Dict, force_refresh: bool = False) -> str:
+    """
+    Génère un texte marketing pour le teaser d'un voyage
+    (mis en cache tant que le voyage ne change pas, force_refresh=True pour une nouvelle version)
+    """
     if not GOOGLE_API_KEY:
         return "Description automatique indisponible (Clé API manquante)."
     
@@ -518,9 +787,12 @@ def generate_trip_teaser(trip_data: Dict) -> str:
                 if isinstance(poi, dict) and poi.get('name'):
                    all_pois.append(poi.get('name'))
         
+        # Tirage reproductible pour un même voyage (sinon le prompt change à chaque appel
+        # et le cache ne sert jamais)
         selected_pois = []
         if all_pois:
-            selected_pois = random.sample(all_pois, min(2, len(all_pois)))
+            rng = random.Random(f"{trip_data.get('id', '')}|{'|'.join(all_pois)}")
+            selected_pois = rng.sample(all_pois, min(2, len(all_pois)))
         
         pois_instruction = ""
         if selected_pois:
@@ -543,9 +815,8 @@ def generate_trip_teaser(trip_data: Dict) -> str:
         {days_summary}
         """
         
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return _generate_cached(prompt, str.strip, CACHE_TTL_TEASER,
+                                namespace='teaser', force_refresh=force_refresh)
         
     except Exception as e:
         print(f"Error generating teaser: {e}")
@@ -577,7 +848,7 @@ def test_parsing():
         print("❌ Échec du parsing")
 
 
-def generate_gps_guide(query: str) -> Dict:
+def generate_gps_guide(query: str, force_refresh: bool = False) -> Dict:
     """
     Génère un guide GPS expert via Gemini pour une requête donnée.
     Retourne un dictionnaire avec le contenu HTML structuré.
@@ -625,15 +896,9 @@ def generate_gps_guide(query: str) -> Dict:
     """
 
     try:
-        model = genai.GenerativeModel('gemini-3-pro-preview')
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        # Clean markdown
-        text = re.sub(r'^```json\s*', '', text)
-        text = re.sub(r'^```\s*', '', text)
-        text = re.sub(r'\s*```$', '', text)
-        
-        return json.loads(text)
+        return _generate_cached(prompt, _parse_json_response, CACHE_TTL_GPS_GUIDE,
+                                namespace='gps_guide', model_name=GPS_GUIDE_MODEL_NAME,
+                                force_refresh=force_refresh)
     except Exception as e:
         print(f"Gemini Error: {e}")
         return {"found": False, "error": str(e)}
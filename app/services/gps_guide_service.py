@@ -0,0 +1,431 @@
+"""
+Assistant GPS moto : résolution d'une question en guide d'import GPX
+Cascade : LRU en mémoire -> guides statiques (index de mots-clés) -> Firestore
+-> génération Gemini (une seule génération par clé, même en concurrence)
+Un job de préchauffage génère à l'avance les guides des appareils courants
+"""
+import os
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import unidecode
+from flask import current_app
+
+from app.services.gps_guides_data import GPS_GUIDES
+from app.services.job_queue import register_job_handler, get_job_store
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+GPS_GUIDE_LRU_SIZE = int(os.getenv('GPS_GUIDE_LRU_SIZE', '512'))
+# Une entrée en mémoire est relue dans Firestore après N secondes (guides régénérés)
+GPS_GUIDE_LRU_TTL = int(os.getenv('GPS_GUIDE_LRU_TTL', '3600'))
+
+# Expressions ramenées à un seul jeton avant découpage
+DEVICE_PHRASE_ALIASES = {
+    'tom tom': 'tomtom',
+    'liberty rider': 'liberty',
+    'osm and': 'osmand',
+    'gaia gps': 'gaia',
+    'zumo xt2': 'zumo xt 2',
+    'beeline moto': 'beeline'
+}
+
+# Jetons équivalents (variantes d'écriture) -> forme canonique
+DEVICE_TOKEN_ALIASES = {
+    'libertyrider': 'liberty',
+    'zumoxt': 'zumo xt',
+    'xt2': 'xt 2',
+    'iphone': 'ios',
+    'apple': 'ios',
+    'carplay': 'ios',
+    'androidauto': 'android'
+}
+
+# Version du générateur (prompt / modèle) : l'incrémenter fait régénérer les guides
+GPS_GUIDE_VERSION = 1
+
+# Préchauffage : appareils toujours inclus dans le catalogue (en plus du journal des requêtes)
+DEFAULT_DEVICE_CATALOGUE = (
+    'Garmin Zumo XT', 'Garmin Zumo XT2', 'Garmin Zumo 396', 'Garmin Montana 700',
+    'TomTom Rider 550', 'TomTom Rider 500', 'BMW Navigator VI', 'BMW Connected Ride Navigator',
+    'Calimoto', 'Liberty Rider', 'Kurviger', 'Scenic', 'REVER', 'MyRoute-app', 'OsmAnd',
+    'Gaia GPS', 'Google Maps', 'Waze', 'Beeline Moto II', 'Chigee AIO-5', 'Carpuride'
+)
+GPS_PREGEN_LIMIT = 100
+GPS_PREGEN_CONCURRENCY = int(os.getenv('GPS_PREGEN_CONCURRENCY', '3'))
+GPS_PREGEN_RATE_PER_MINUTE = int(os.getenv('GPS_PREGEN_RATE_PER_MINUTE', '10'))
+# Planification du préchauffage par le process worker (0 = désactivé)
+GPS_PREGEN_INTERVAL_HOURS = float(os.getenv('GPS_PREGEN_INTERVAL_HOURS', '24'))
+# Délai avant le premier préchauffage (pas de rafale Gemini à chaque déploiement)
+GPS_PREGEN_INITIAL_DELAY_MINUTES = float(os.getenv('GPS_PREGEN_INITIAL_DELAY_MINUTES', '60'))
+# Appareils traités par tâche : le reste est replanifié en fin de file, pour que
+# les autres tâches (imports, webhooks Stripe) passent entre deux lots
+GPS_PREGEN_BATCH_SIZE = int(os.getenv('GPS_PREGEN_BATCH_SIZE', '10'))
+
+# Mots de la question qui ne désignent pas l'appareil
+QUERY_STOPWORDS = {
+    'comment', 'mettre', 'charger', 'importer', 'import', 'installer', 'transferer', 'envoyer',
+    'utiliser', 'ouvrir', 'lire', 'sur', 'dans', 'avec', 'pour', 'mon', 'ma', 'mes', 'le', 'la',
+    'les', 'un', 'une', 'des', 'de', 'du', 'au', 'aux', 'et', 'ou', 'je', 'j', 'l', 'd', 'a',
+    'est', 'ce', 'que', 'qu', 'quoi', 'faire', 'fichier', 'fichiers', 'gpx', 'trace', 'traces',
+    'itineraire', 'roadbook', 'gps', 'moto', 'app', 'application', 'appli', 'how', 'to', 'on',
+    'my', 'the', 'in', 'with', 'file', 'put', 'load'
+}
+
+# Mots-clés des guides statiques, par ordre de priorité (le premier guide trouvé gagne)
+STATIC_GUIDE_KEYWORDS = (
+    ('liberty', ('liberty',)),
+    ('calimoto', ('calimoto',)),
+    ('garmin', ('garmin', 'zumo', 'xt')),
+    ('tomtom', ('tomtom', 'rider')),
+    ('osmand', ('osmand', 'gaia'))
+)
+
+
+def _build_keyword_index() -> Dict[str, tuple]:
+    """Index jeton -> (priorité, clé de guide statique), calculé une fois à l'import"""
+    index = {}
+    for priority, (guide_key, keywords) in enumerate(STATIC_GUIDE_KEYWORDS):
+        if guide_key not in GPS_GUIDES:
+            continue
+        for keyword in (guide_key,) + keywords:
+            index.setdefault(keyword, (priority, guide_key))
+    return index
+
+
+STATIC_GUIDE_INDEX = _build_keyword_index()
+
+
+def device_tokens(query: str) -> List[str]:
+    """Jetons canoniques de l'appareil (accents, alias, mots vides retirés ; triés, uniques)"""
+    text = unidecode.unidecode(query or '').lower()
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    text = f" {' '.join(text.split())} "
+    for phrase, replacement in DEVICE_PHRASE_ALIASES.items():
+        text = text.replace(f" {phrase} ", f" {replacement} ")
+
+    tokens = set()
+    for token in text.split():
+        for canonical in DEVICE_TOKEN_ALIASES.get(token, token).split():
+            if canonical not in QUERY_STOPWORDS:
+                tokens.add(canonical)
+    return sorted(tokens)
+
+
+def guide_key(query: str) -> str:
+    """
+    Clé canonique d'une question (ex: "Zumo XT Garmin" et "garmin zumo xt" -> "garmin_xt_zumo")
+    """
+    return '_'.join(device_tokens(query))
+
+
+def legacy_guide_key(query: str) -> str:
+    """Ancienne clé Firestore (avant normalisation) pour relire les guides déjà générés"""
+    return re.sub(r'[^a-z0-9]', '_', query.lower())
+
+
+def match_static_guide(tokens: List[str]) -> Optional[str]:
+    """Clé du guide statique correspondant aux jetons (priorité la plus haute)"""
+    matches = [STATIC_GUIDE_INDEX[token] for token in tokens if token in STATIC_GUIDE_INDEX]
+    return min(matches)[1] if matches else None
+
+
+class GuideLRU:
+    """Cache LRU en mémoire (par process) des guides résolus, avec TTL"""
+
+    def __init__(self, max_entries: int = GPS_GUIDE_LRU_SIZE, ttl: int = GPS_GUIDE_LRU_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Dict):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SingleFlight:
+    """Regroupe les appels concurrents de même clé : un seul calcul, résultat partagé"""
+
+    def __init__(self):
+        self._calls: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Dict]) -> Dict:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error']:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = func()
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call['event'].set()
+
+
+_guide_lru = GuideLRU()
+_single_flight = SingleFlight()
+
+
+def discard_cached_guide(key: str):
+    """Retire un guide du LRU du process (guide modifié dans Firestore, voir change_feed)"""
+    _guide_lru.discard(key)
+
+
+def clear_cached_guides():
+    _guide_lru.clear()
+
+
+def _generate_and_store(firebase, query: str, key: str) -> Dict:
+    from app.services.gemini_service import generate_gps_guide
+
+    # Un autre worker a pu générer ce guide pendant l'attente
+    stored = firebase.get_gps_guide(key)
+    if stored:
+        return {'found': True, 'data': stored}
+
+    ai_result = generate_gps_guide(query)
+    if ai_result.get('found', False) and not ai_result.get('needs_clarification'):
+        firebase.save_gps_guide(key, ai_result['data'], version=GPS_GUIDE_VERSION, source='live')
+        return {'found': True, 'data': ai_result['data']}
+    return ai_result
+
+
+def answer_gps_query(firebase, query: str) -> Dict:
+    """
+    Résout une question GPS en guide
+
+    Args:
+        firebase: Instance FirebaseService
+        query: Question de l'utilisateur (ex: "Comment mettre sur mon Zumo XT ?")
+
+    Returns:
+        Dict: {'found': True, 'data': {...}} ou réponse Gemini (not found / clarification)
+    """
+    tokens = device_tokens(query)
+    key = '_'.join(tokens) or legacy_guide_key(query)
+
+    # 1. LRU en mémoire
+    cached = _guide_lru.get(key)
+    if cached:
+        return cached
+
+    # 2. Guides statiques premium (index de mots-clés, aucun accès réseau)
+    static_key = match_static_guide(tokens)
+    if static_key:
+        result = {'found': True, 'data': GPS_GUIDES[static_key]}
+        _guide_lru.set(key, result)
+        return result
+
+    # 3. Firestore (clé canonique, puis ancienne clé pour les guides déjà générés)
+    # La question est journalisée : le préchauffage part des appareils les plus demandés
+    firebase.record_gps_guide_query(key, query)
+    stored = firebase.get_gps_guide(key)
+    if not stored:
+        legacy_key = legacy_guide_key(query)
+        if legacy_key != key:
+            stored = firebase.get_gps_guide(legacy_key)
+            if stored:
+                firebase.save_gps_guide(key, stored)
+    if stored:
+        result = {'found': True, 'data': stored}
+        _guide_lru.set(key, result)
+        return result
+
+    # 4. Génération Gemini (une seule par clé, les requêtes concurrentes attendent le résultat)
+    result = _single_flight.do(key, lambda: _generate_and_store(firebase, query, key))
+    if result.get('found') and result.get('data'):
+        _guide_lru.set(key, result)
+    return result
+
+
+# ============================================
+# PRÉCHAUFFAGE (PRÉ-GÉNÉRATION DES GUIDES)
+# ============================================
+
+def build_device_catalogue(firebase, limit: int = GPS_PREGEN_LIMIT) -> List[str]:
+    """
+    Catalogue d'appareils à préchauffer : journal des requêtes (les plus fréquentes
+    d'abord), appareils courants et clés des guides statiques ; une entrée par clé canonique
+    """
+    candidates = [entry.get('lastQuery') for entry in firebase.get_top_gps_guide_queries(limit)]
+    candidates += list(DEFAULT_DEVICE_CATALOGUE) + list(GPS_GUIDES.keys())
+
+    catalogue = {}
+    for query in candidates:
+        key = guide_key(query or '')
+        if key and key not in catalogue:
+            catalogue[key] = query
+    return list(catalogue.values())[:limit]
+
+
+def pregenerate_gps_guides(firebase, queries: Optional[List[str]] = None, force: bool = False,
+                           concurrency: int = GPS_PREGEN_CONCURRENCY,
+                           per_minute: int = GPS_PREGEN_RATE_PER_MINUTE,
+                           progress: Optional[Callable] = None) -> Dict:
+    """
+    Génère (en parallèle, sous limite de débit) les guides manquants ou d'une version antérieure
+
+    Args:
+        firebase: Instance FirebaseService
+        queries: Appareils à traiter (défaut: build_device_catalogue)
+        force: Régénère même les guides à jour
+        concurrency: Générations simultanées
+        per_minute: Appels Gemini maximum par minute
+        progress: Callback(done, total, message)
+
+    Returns:
+        Dict: Compteurs {'generated', 'static', 'fresh', 'failed', 'total'}
+    """
+    from app.services.gemini_service import _RateLimiter, generate_gps_guide
+
+    queries = queries if queries is not None else build_device_catalogue(firebase)
+    limiter = _RateLimiter(per_minute)
+    summary = {'generated': 0, 'static': 0, 'fresh': 0, 'failed': 0, 'total': len(queries)}
+    lock = threading.Lock()
+
+    def process(query: str) -> str:
+        tokens = device_tokens(query)
+        key = '_'.join(tokens)
+        if not key:
+            return 'failed'
+        # Appareils couverts par un guide statique : déjà instantanés
+        if match_static_guide(tokens):
+            return 'static'
+
+        stored = firebase.get_gps_guide(key)
+        if stored and not force and stored.get('guideVersion', 0) >= GPS_GUIDE_VERSION:
+            return 'fresh'
+
+        limiter.wait()
+        result = generate_gps_guide(query, force_refresh=force)
+        if not result.get('found') or result.get('needs_clarification'):
+            return 'failed'
+
+        firebase.save_gps_guide(key, result['data'], version=GPS_GUIDE_VERSION, source='pregenerated')
+        _guide_lru.discard(key)
+        return 'generated'
+
+    def run(query: str):
+        try:
+            outcome = process(query)
+        except Exception as e:
+            logger.error(f"❌ GPS guide pre-generation error ({query}): {e}")
+            outcome = 'failed'
+        with lock:
+            summary[outcome] += 1
+            done = summary['generated'] + summary['static'] + summary['fresh'] + summary['failed']
+        if progress:
+            progress(done, summary['total'], f"{query}: {outcome}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        list(executor.map(run, queries))
+
+    logger.info(f"🧭 GPS guides pre-generation: {summary}")
+    return summary
+
+
+@register_job_handler('gps_guide_pregeneration')
+def pregeneration_job(job: Dict, ctx) -> Dict:
+    """
+    Handler de la file de tâches pour le préchauffage des guides GPS : traite un
+    lot de GPS_PREGEN_BATCH_SIZE appareils et replanifie le reste
+    """
+    from app.services import FirebaseService
+
+    payload = job['payload']
+    firebase = FirebaseService(current_app.config.get('APP_ID', 'default-app-id'))
+    force = payload.get('force', False)
+
+    queries = payload.get('queries')
+    if queries is None:
+        queries = build_device_catalogue(firebase)
+    batch, remaining = queries[:GPS_PREGEN_BATCH_SIZE], queries[GPS_PREGEN_BATCH_SIZE:]
+
+    def progress(done, total, message):
+        ctx.report(int(done * 100 / total) if total else 100, message)
+
+    summary = pregenerate_gps_guides(firebase, queries=batch, force=force, progress=progress)
+    if remaining:
+        summary['remaining'] = len(remaining)
+        summary['nextJobId'] = enqueue_gps_guide_pregeneration(queries=remaining, force=force)
+    return summary
+
+
+def enqueue_gps_guide_pregeneration(queries: Optional[List[str]] = None, force: bool = False) -> Optional[str]:
+    """Planifie un préchauffage des guides GPS dans la file de tâches"""
+    try:
+        return get_job_store().enqueue('gps_guide_pregeneration', {'queries': queries, 'force': force})
+    except Exception as e:
+        logger.error(f"❌ Impossible de planifier le préchauffage des guides GPS: {e}")
+        return None
+
+
+def start_pregeneration_scheduler(interval_hours: float = GPS_PREGEN_INTERVAL_HOURS) -> Optional[threading.Thread]:
+    """
+    Thread daemon qui planifie le préchauffage toutes les N heures (process worker uniquement,
+    pour n'avoir qu'un planificateur quel que soit le nombre de workers web).
+    Le premier passage attend GPS_PREGEN_INITIAL_DELAY_MINUTES ; un passage est
+    sauté si un préchauffage est encore en file ou en cours.
+    """
+    if interval_hours <= 0:
+        return None
+
+    def loop():
+        time.sleep(GPS_PREGEN_INITIAL_DELAY_MINUTES * 60)
+        while True:
+            try:
+                if get_job_store().has_pending('gps_guide_pregeneration'):
+                    logger.info("🗓️  GPS guide pre-generation still pending, skipped")
+                else:
+                    job_id = enqueue_gps_guide_pregeneration()
+                    logger.info(f"🗓️  GPS guide pre-generation scheduled (job {job_id})")
+            except Exception as e:
+                logger.error(f"❌ GPS guide pre-generation scheduling error: {e}")
+            time.sleep(interval_hours * 3600)
+
+    thread = threading.Thread(target=loop, name='gps-guide-scheduler', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,254 @@
+"""
+Import d'hôtels depuis un fichier Excel/CSV (exécuté en tâche de fond)
+Parsing Gemini -> écritures groupées Firestore -> photos Google Places
+"""
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import requests
+from flask import current_app
+
+from app.services.job_queue import register_job_handler
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+MAX_PHOTOS_PER_HOTEL = 5
+
+
+def _plan_writes(firebase, user_id: str, hotels_data: List[Dict], partner_id: str,
+                 skip_duplicates: bool) -> Dict:
+    """
+    Prépare les créations et ajouts de partenaire (avec IDs pré-alloués pour
+    que les écritures soient idempotentes en cas de reprise)
+
+    Returns:
+        Dict: {'creates', 'updates', 'photoTargets', 'duplicates', 'errors'}
+    """
+    existing_hotels_map = {}
+    try:
+        for h in firebase.get_hotels(user_id):
+            key = (h.get('name', '').lower().strip(), h.get('city', '').lower().strip())
+            existing_hotels_map[key] = h
+    except Exception as e:
+        logger.error(f"Erreur chargement cache hôtels: {e}")
+
+    creates = []
+    updates = []
+    photo_targets = []
+    duplicates_count = 0
+    errors_count = 0
+
+    for hotel_data in hotels_data:
+        try:
+            name = hotel_data.get('name', '').strip()
+            city = hotel_data.get('city', '').strip()
+            key = (name.lower(), city.lower())
+
+            existing = existing_hotels_map.get(key)
+
+            if skip_duplicates and existing:
+                duplicates_count += 1
+
+                # UPDATE: On ajoute le partenaire si pas déjà présent (ArrayUnion, sans relecture)
+                current_partners = existing.setdefault('partnerIds', [])
+                if partner_id and partner_id not in current_partners:
+                    current_partners.append(partner_id)
+                    updates.append({'id': existing['id'], 'partnerIds': [partner_id]})
+            else:
+                # CREATE (ID pré-alloué pour les doublons INTRA-fichier et les photos)
+                existing = {
+                    'id': firebase.allocate_hotel_id(user_id),
+                    'name': name,
+                    'city': city,
+                    'address': hotel_data.get('address'),
+                    'description': hotel_data.get('description'),
+                    'type': hotel_data.get('type', 'hotel'),
+                    'partnerIds': [partner_id] if partner_id else [],
+                    'contact': {
+                        'phone': hotel_data.get('phone'),
+                        'website': hotel_data.get('website')
+                    },
+                    'photos': []
+                }
+                creates.append(existing)
+
+                # Ajout au cache pour les doublons INTRA-fichier
+                existing_hotels_map[key] = existing
+
+            if hotel_data.get('website'):
+                photo_targets.append({
+                    'hotelId': existing['id'],
+                    'name': name,
+                    'city': city,
+                    'photos': list(existing.get('photos') or [])
+                })
+        except Exception as e:
+            logger.error(f"Erreur import hôtel {hotel_data.get('name')}: {e}")
+            errors_count += 1
+
+    return {
+        'creates': creates,
+        'updates': updates,
+        'photoTargets': photo_targets,
+        'duplicates': duplicates_count,
+        'errors': errors_count
+    }
+
+
+def _download_place_photos(firebase, user_id: str, name: str, city: str) -> List[str]:
+    """Recherche l'hôtel sur Google Places et importe ses photos dans Storage"""
+    api_key = current_app.config.get('GOOGLE_MAPS_API_KEY')
+
+    # 1. Recherche du Place ID
+    search_results = requests.get(
+        'https://maps.googleapis.com/maps/api/place/findplacefromtext/json',
+        params={'input': f"{name} {city}", 'inputtype': 'textquery', 'fields': 'place_id', 'key': api_key},
+        timeout=10
+    ).json()
+
+    if search_results.get('status') != 'OK' or not search_results.get('candidates'):
+        return []
+
+    # 2. Récupération des photos (max 5)
+    details_data = requests.get(
+        'https://maps.googleapis.com/maps/api/place/details/json',
+        params={'place_id': search_results['candidates'][0]['place_id'], 'fields': 'photos', 'key': api_key},
+        timeout=10
+    ).json()
+
+    if details_data.get('status') != 'OK' or 'photos' not in details_data.get('result', {}):
+        return []
+
+    photo_urls = []
+    safe_name = "".join([c for c in name if c.isalnum()]).lower()
+    for idx, photo in enumerate(details_data['result']['photos'][:MAX_PHOTOS_PER_HOTEL]):
+        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=1600&photoreference={photo['photo_reference']}&key={api_key}"
+
+        # Téléchargement de l'image puis upload vers Firebase Storage
+        img_response = requests.get(photo_url, timeout=20)
+        if img_response.status_code == 200:
+            timestamp = int(datetime.now().timestamp() * 1000)
+            file_path = f"users/{user_id}/hotels/{safe_name}_{timestamp}_{idx}.jpg"
+            public_url = firebase.upload_file_from_bytes(img_response.content, file_path, content_type='image/jpeg')
+            if public_url:
+                photo_urls.append(public_url)
+
+    return photo_urls
+
+
+def run_hotel_import(firebase, user_id: str, file_bytes: bytes, filename: str, options: Dict,
+                     report: Callable, checkpoint: Dict = None) -> Dict:
+    """
+    Exécute l'import complet d'un fichier d'hôtels
+
+    Args:
+        firebase: Instance FirebaseService
+        user_id: Propriétaire de la banque d'hôtels
+        file_bytes: Contenu du fichier Excel/CSV
+        filename: Nom du fichier (pour détecter le CSV)
+        options: {'partnerId', 'downloadPhotos', 'skipDuplicates', 'forceRefresh'}
+        report: report(progress, message, checkpoint=None) pour publier l'avancement
+        checkpoint: Point de reprise d'une exécution interrompue
+
+    Returns:
+        Dict: {'success', 'imported', 'duplicates', 'errors'}
+    """
+    from app.services.gemini_service import parse_excel_file_with_gemini
+
+    checkpoint = checkpoint or {}
+    partner_id = options.get('partnerId')
+
+    # 1. Parsing (Gemini / local) - sauté si déjà fait avant l'interruption
+    hotels_data = checkpoint.get('hotelsData')
+    if hotels_data is None:
+        report(5, 'Lecture du fichier...')
+        hotels_data = parse_excel_file_with_gemini(
+            file_bytes, filename,
+            progress_callback=lambda msg, pct: report(pct, msg),
+            force_refresh=options.get('forceRefresh', False)
+        )
+        if not hotels_data:
+            raise ValueError("Aucun hôtel n'a pu être extrait du fichier")
+        report(80, 'Sauvegarde des données...', {'hotelsData': hotels_data})
+
+    # 2. Préparation des écritures (créations + ajouts de partenaire)
+    plan = checkpoint.get('plan')
+    if plan is None:
+        plan = _plan_writes(firebase, user_id, hotels_data, partner_id, options.get('skipDuplicates', True))
+        report(80, 'Sauvegarde des données...', {'plan': plan, 'committed': 0, 'created': 0, 'updated': 0})
+
+    # 3. Sauvegarde groupée (WriteBatch de 500 opérations), reprise après le dernier commit
+    committed = checkpoint.get('committed', 0)
+    created = checkpoint.get('created', 0)
+    updated = checkpoint.get('updated', 0)
+    errors_count = plan['errors'] + checkpoint.get('writeErrors', 0)
+
+    creates = plan['creates'][committed:]
+    updates = plan['updates'][max(0, committed - len(plan['creates'])):]
+    total_ops = len(plan['creates']) + len(plan['updates'])
+
+    write_errors = checkpoint.get('writeErrors', 0)
+    for progress in firebase.iter_bulk_upsert_hotels(user_id, creates, updates):
+        done = committed + progress['committed']
+        pct = 80 + int((done / max(total_ops, 1)) * 10)
+        report(pct, f"Sauvegarde lot {progress['batch']}/{progress['batches']} ({done}/{total_ops})...", {
+            'committed': done,
+            'created': created + progress['created'],
+            'updated': updated + progress['updated'],
+            'writeErrors': write_errors + progress['errors']
+        })
+        last = progress
+    if creates or updates:
+        created += last['created']
+        updated += last['updated']
+        errors_count += last['errors']
+
+    # 4. Téléchargement photos (si demandé), reprise à l'hôtel suivant
+    if options.get('downloadPhotos'):
+        targets = plan['photoTargets']
+        done_ids = set()
+        for i in range(checkpoint.get('photosIndex', 0), len(targets)):
+            target = targets[i]
+            report(90 + int((i / len(targets)) * 9), f"Photos hôtel {i+1}/{len(targets)}...", {'photosIndex': i})
+
+            # Déjà des photos (ou doublon intra-fichier déjà traité), on skip pour économiser l'API
+            if target['photos'] or target['hotelId'] in done_ids:
+                continue
+            done_ids.add(target['hotelId'])
+
+            try:
+                photo_urls = _download_place_photos(firebase, user_id, target['name'], target['city'])
+                if photo_urls:
+                    firebase.update_hotel(user_id, target['hotelId'], {'photos': target['photos'] + photo_urls})
+                    logger.info(f"📸 {len(photo_urls)} photos téléchargées pour {target['name']}")
+            except Exception as e:
+                logger.error(f"⚠️ Erreur téléchargement photos pour {target['name']}: {e}")
+
+    return {
+        'success': True,
+        'imported': created,
+        'updated': updated,
+        'duplicates': plan['duplicates'],
+        'errors': errors_count
+    }
+
+
+@register_job_handler('hotel_import')
+def hotel_import_job(job: Dict, ctx) -> Dict:
+    """Handler de la file de tâches pour l'import d'hôtels"""
+    from app.services import FirebaseService
+
+    payload = job['payload']
+    firebase = FirebaseService(current_app.config.get('APP_ID', 'default-app-id'))
+
+    return run_hotel_import(
+        firebase,
+        payload['userId'],
+        ctx.data,
+        payload['filename'],
+        payload['options'],
+        report=ctx.report,
+        checkpoint=ctx.checkpoint
+    )
@@ -0,0 +1,431 @@
+"""
+Instrumentation des requêtes HTTP : nombre et durée des appels Firestore, Storage,
+APIs externes (RateHawk, Google, Stripe...) et Gemini faits par chaque requête
+Restitution : en-tête Server-Timing, métriques Prometheus (/metrics) et journal
+des requêtes lentes (pour repérer les N+1 par route)
+
+Ces données décrivent les routes et leurs appels : /metrics n'existe que si
+METRICS_TOKEN est défini, et Server-Timing n'est ajouté que pour un admin
+connecté (ou pour tous avec SERVER_TIMING_PUBLIC=true, ex: benchmarks).
+"""
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+import logging
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from flask import Response, current_app, g, request, session
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+# /metrics exige "Authorization: Bearer <METRICS_TOKEN>" (route absente sans token)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+# Server-Timing sur toutes les réponses (défaut : admins connectés uniquement)
+SERVER_TIMING_PUBLIC = os.getenv('SERVER_TIMING_PUBLIC', 'false').lower() == 'true'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '1000'))
+SLOW_REQUEST_LOG_SIZE = int(os.getenv('SLOW_REQUEST_LOG_SIZE', '100'))
+
+# Seuils de l'histogramme des durées de requête (secondes)
+REQUEST_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Méthodes FirebaseService qui travaillent sur Storage (les autres : Firestore)
+STORAGE_METHOD_PREFIXES = ('upload_', 'delete_file', 'get_file_url', 'get_storage')
+
+# Catégorie d'un appel `requests` selon l'hôte (premier suffixe trouvé)
+HTTP_HOST_CATEGORIES = (
+    ('storage.googleapis.com', 'storage'),
+    ('firebasestorage.googleapis.com', 'storage'),
+    ('googleapis.com', 'google_api'),
+    ('api.stripe.com', 'stripe'),
+    ('worldota.net', 'ratehawk')
+)
+
+# Profondeur d'appel instrumenté : seuls les appels de premier niveau sont comptés
+# (une méthode FirebaseService qui en appelle une autre = un seul appel)
+_depth: ContextVar[int] = ContextVar('instrumentation_depth', default=0)
+_current: ContextVar[Optional['RequestMetrics']] = ContextVar('instrumentation_request', default=None)
+
+_installed = False
+
+
+class RequestMetrics:
+    """Appels comptés pendant une requête HTTP (threads lancés par la requête non inclus)"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.categories: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.calls: Dict[tuple, int] = defaultdict(int)
+
+    def add(self, category: str, name: str, elapsed: float):
+        stats = self.categories[category]
+        stats[0] += 1
+        stats[1] += elapsed
+        self.calls[(category, name)] += 1
+
+    def top_calls(self, limit: int = 5) -> List[str]:
+        """Appels les plus répétés (ex: "firestore.get_hotel x40")"""
+        ranked = sorted(self.calls.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [f"{category}.{name} x{count}" for (category, name), count in ranked]
+
+
+class MetricsRegistry:
+    """Agrégats du process (un par worker gunicorn : Prometheus scrape chaque instance)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests_total: Dict[tuple, int] = defaultdict(int)
+        self.request_buckets: Dict[str, List[int]] = {}
+        self.request_sum: Dict[str, float] = defaultdict(float)
+        self.request_count: Dict[str, int] = defaultdict(int)
+        self.request_max: Dict[str, float] = defaultdict(float)
+        self.calls_total: Dict[str, int] = defaultdict(int)
+        self.calls_seconds: Dict[str, float] = defaultdict(float)
+        self.method_calls: Dict[tuple, int] = defaultdict(int)
+        self.endpoint_calls: Dict[tuple, int] = defaultdict(int)
+        self.slow_requests = deque(maxlen=SLOW_REQUEST_LOG_SIZE)
+
+    def observe_call(self, category: str, name: str, elapsed: float):
+        with self._lock:
+            self.calls_total[category] += 1
+            self.calls_seconds[category] += elapsed
+            self.method_calls[(category, name)] += 1
+
+    def observe_request(self, endpoint: str, method: str, status: int, elapsed: float,
+                        metrics: RequestMetrics):
+        with self._lock:
+            self.requests_total[(endpoint, method, status)] += 1
+            buckets = self.request_buckets.setdefault(endpoint, [0] * len(REQUEST_DURATION_BUCKETS))
+            for i, bound in enumerate(REQUEST_DURATION_BUCKETS):
+                if elapsed <= bound:
+                    buckets[i] += 1
+            self.request_sum[endpoint] += elapsed
+            self.request_count[endpoint] += 1
+            self.request_max[endpoint] = max(self.request_max[endpoint], elapsed)
+            for category, (count, _) in metrics.categories.items():
+                self.endpoint_calls[(endpoint, category)] += count
+
+    def record_slow(self, entry: Dict):
+        with self._lock:
+            self.slow_requests.append(entry)
+
+    def slowest_endpoints(self, limit: int = 20) -> List[Dict]:
+        """Routes classées par durée moyenne, avec le nombre moyen d'appels par requête"""
+        with self._lock:
+            report = []
+            for endpoint, count in self.request_count.items():
+                calls = {
+                    category: round(total / count, 1)
+                    for (ep, category), total in self.endpoint_calls.items() if ep == endpoint
+                }
+                report.append({
+                    'endpoint': endpoint,
+                    'requests': count,
+                    'avg_ms': round(self.request_sum[endpoint] / count * 1000, 1),
+                    'max_ms': round(self.request_max[endpoint] * 1000, 1),
+                    'avg_calls': calls
+                })
+        return sorted(report, key=lambda r: r['avg_ms'], reverse=True)[:limit]
+
+    def render_prometheus(self) -> str:
+        """Exposition au format texte Prometheus (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            lines += ['# HELP mototrip_http_requests_total Requêtes HTTP traitées',
+                      '# TYPE mototrip_http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self.requests_total.items()):
+                lines.append(f'mototrip_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+            lines += ['# HELP mototrip_http_request_duration_seconds Durée des requêtes HTTP',
+                      '# TYPE mototrip_http_request_duration_seconds histogram']
+            for endpoint, buckets in sorted(self.request_buckets.items()):
+                for bound, count in zip(REQUEST_DURATION_BUCKETS, buckets):
+                    lines.append(f'mototrip_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {count}')
+                lines.append(f'mototrip_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le="+Inf")} {self.request_count[endpoint]}')
+                lines.append(f'mototrip_http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {self.request_sum[endpoint]:.6f}')
+                lines.append(f'mototrip_http_request_duration_seconds_count{_labels(endpoint=endpoint)} {self.request_count[endpoint]}')
+
+            lines += ['# HELP mototrip_backend_call_duration_seconds Appels Firestore / Storage / APIs externes / Gemini',
+                      '# TYPE mototrip_backend_call_duration_seconds summary']
+            for category, count in sorted(self.calls_total.items()):
+                lines.append(f'mototrip_backend_call_duration_seconds_sum{_labels(category=category)} {self.calls_seconds[category]:.6f}')
+                lines.append(f'mototrip_backend_call_duration_seconds_count{_labels(category=category)} {count}')
+
+            lines += ['# HELP mototrip_backend_calls_by_method_total Appels par méthode (ou hôte)',
+                      '# TYPE mototrip_backend_calls_by_method_total counter']
+            for (category, name), count in sorted(self.method_calls.items()):
+                lines.append(f'mototrip_backend_calls_by_method_total{_labels(category=category, method=name)} {count}')
+
+            lines += ['# HELP mototrip_endpoint_backend_calls_total Appels faits par les requêtes de chaque route',
+                      '# TYPE mototrip_endpoint_backend_calls_total counter']
+            for (endpoint, category), count in sorted(self.endpoint_calls.items()):
+                lines.append(f'mototrip_endpoint_backend_calls_total{_labels(endpoint=endpoint, category=category)} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(**labels) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """Retourne le registre de métriques du process"""
+    return _registry
+
+
+# ============================================
+# SONDES
+# ============================================
+
+@contextmanager
+def track(category: str, name: str):
+    """
+    Compte et chronomètre un appel (ignoré s'il est imbriqué dans un appel déjà compté)
+
+    Usage:
+        with track('gemini', 'generate_trip_teaser'):
+            ...
+    """
+    depth = _depth.get()
+    if depth:
+        yield
+        return
+
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _depth.reset(token)
+        _record(category, name, elapsed)
+
+
+def _record(category: str, name: str, elapsed: float):
+    _registry.observe_call(category, name, elapsed)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add(category, name, elapsed)
+
+
+def _instrumented_generator(func: Callable, category, name_of: Optional[Callable] = None) -> Callable:
+    """
+    Enveloppe une fonction génératrice : le travail est fait à chaque itération,
+    la durée compte donc chaque next() (un seul appel enregistré, à la fin)
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _depth.get():
+            return (yield from func(*args, **kwargs))
+
+        call_category = category(args, kwargs) if callable(category) else category
+        name = name_of(args, kwargs) if name_of else func.__name__
+        generator = func(*args, **kwargs)
+        elapsed = 0.0
+        try:
+            while True:
+                token = _depth.set(1)
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration as stop:
+                    return stop.value
+                finally:
+                    elapsed += time.perf_counter() - start
+                    _depth.reset(token)
+                yield item
+        finally:
+            generator.close()
+            _record(call_category, name, elapsed)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _instrumented(func: Callable, category, name_of: Optional[Callable] = None) -> Callable:
+    """Enveloppe une fonction ; category et name_of peuvent dépendre des arguments"""
+    if getattr(func, '__instrumented__', False):
+        return func
+    if inspect.isgeneratorfunction(func):
+        return _instrumented_generator(func, category, name_of)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        call_category = category(args, kwargs) if callable(category) else category
+        name = name_of(args, kwargs) if name_of else func.__name__
+        with track(call_category, name):
+            return func(*args, **kwargs)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_class(cls, category: Callable[[str], str]):
+    """Enveloppe toutes les méthodes publiques d'une classe (category(nom) -> catégorie)"""
+    for name, attr in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(attr):
+            continue
+        setattr(cls, name, _instrumented(attr, category(name)))
+
+
+def _firebase_category(method_name: str) -> str:
+    return 'storage' if method_name.startswith(STORAGE_METHOD_PREFIXES) else 'firestore'
+
+
+def _http_host(args, kwargs) -> str:
+    url = kwargs.get('url') or (args[2] if len(args) > 2 else '')
+    return (urlparse(str(url)).hostname or 'unknown').lower()
+
+
+def _http_category(args, kwargs) -> str:
+    host = _http_host(args, kwargs)
+    for suffix, category in HTTP_HOST_CATEGORIES:
+        if host == suffix or host.endswith(f".{suffix}"):
+            return category
+    return 'http'
+
+
+def install_instrumentation():
+    """Installe les sondes (une fois par process) sur les services et les clients HTTP"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from app.services.firebase_service import FirebaseService
+    from app.services.ratehawk_service import RateHawkService
+    import requests
+
+    instrument_class(FirebaseService, _firebase_category)
+
+    # RateHawk : un appel par endpoint (l'appel `requests` interne n'est pas recompté)
+    RateHawkService._make_request = _instrumented(
+        RateHawkService._make_request, 'ratehawk',
+        name_of=lambda args, kwargs: kwargs.get('endpoint') or (args[2] if len(args) > 2 else '?')
+    )
+
+    # Tous les appels `requests` (Google Places/Maps, Stripe, proxy, tuiles...) : requests.get()
+    # et requests.request() passent aussi par Session.request
+    requests.Session.request = _instrumented(requests.Session.request, _http_category, name_of=_http_host)
+
+    # Gemini : google.generativeai n'est importé qu'au premier appel (gemini_service),
+    # qui appelle instrument_gemini ; sondé ici seulement s'il est déjà chargé
+    genai = sys.modules.get('google.generativeai')
+    if genai is not None:
+        instrument_gemini(genai)
+
+
+def instrument_gemini(genai):
+    """Sonde GenerativeModel.generate_content (si l'instrumentation est active, une seule fois)"""
+    if not _installed:
+        return
+    genai.GenerativeModel.generate_content = _instrumented(
+        genai.GenerativeModel.generate_content, 'gemini',
+        name_of=lambda args, kwargs: getattr(args[0], 'model_name', 'gemini')
+    )
+
+
+# ============================================
+# INTÉGRATION FLASK
+# ============================================
+
+def _server_timing(metrics: RequestMetrics, total: float) -> str:
+    parts = [f'app;dur={total * 1000:.1f}']
+    for category, (count, elapsed) in sorted(metrics.categories.items()):
+        parts.append(f'{category};dur={elapsed * 1000:.1f};desc="{count} calls"')
+    return ', '.join(parts)
+
+
+def _server_timing_allowed() -> bool:
+    """Server-Timing réservé aux admins (sauf SERVER_TIMING_PUBLIC)"""
+    if SERVER_TIMING_PUBLIC:
+        return True
+    # Sans cookie de session, pas d'accès à la session (sinon Vary: Cookie sur les pages publiques)
+    if current_app.config.get('SESSION_COOKIE_NAME', 'session') not in request.cookies:
+        return False
+    return bool(session.get('admin_logged_in'))
+
+
+def init_instrumentation(app):
+    """
+    Active l'instrumentation des requêtes de l'application (METRICS_ENABLED)
+    et enregistre la route /metrics
+    """
+    if not METRICS_ENABLED:
+        return
+    install_instrumentation()
+
+    @app.before_request
+    def _start_request_metrics():
+        g.request_metrics = RequestMetrics()
+        _current.set(g.request_metrics)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+
+        elapsed = time.perf_counter() - metrics.started_at
+        endpoint = request.endpoint or 'unmatched'
+        if _server_timing_allowed():
+            response.headers['Server-Timing'] = _server_timing(metrics, elapsed)
+        _registry.observe_request(endpoint, request.method, response.status_code, elapsed, metrics)
+
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            calls = {category: count for category, (count, _) in metrics.categories.items()}
+            top_calls = metrics.top_calls()
+            _registry.record_slow({
+                'at': time.time(),
+                'endpoint': endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 1),
+                'calls': calls,
+                'top_calls': top_calls
+            })
+            logger.warning(
+                f"🐢 Slow request {request.method} {request.path} ({endpoint}) "
+                f"{elapsed * 1000:.0f}ms - calls: {calls} - top: {', '.join(top_calls)}"
+            )
+        return response
+
+    @app.teardown_request
+    def _reset_request_metrics(error=None):
+        _current.set(None)
+
+    if not METRICS_TOKEN:
+        logger.info("ℹ️  METRICS_TOKEN non défini : route /metrics désactivée")
+        return
+
+    @app.route('/metrics')
+    def metrics():
+        """Métriques Prometheus du worker courant"""
+        if request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return Response('Unauthorized', status=401)
+        return Response(_registry.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+def get_slow_request_report(limit: int = 20) -> Dict:
+    """Routes les plus lentes et dernières requêtes au-dessus de SLOW_REQUEST_MS"""
+    return {
+        'slow_request_ms': SLOW_REQUEST_MS,
+        'slowest_endpoints': _registry.slowest_endpoints(limit),
+        'recent_slow_requests': list(_registry.slow_requests)[-limit:][::-1]
+    }
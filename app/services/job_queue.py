@@ -0,0 +1,409 @@
+"""
+File de tâches en arrière-plan (imports longs hors du cycle requête/réponse)
+Stockage SQLite local par défaut, interface JobStore prévue pour un backend Redis
+
+Le fichier SQLite n'est partagé qu'entre les process d'une même machine : un
+process `worker` déployé dans son propre conteneur (Railway) doit lire le même
+fichier que le web, donc JOB_QUEUE_PATH doit pointer vers un volume monté sur
+les deux services. Sinon, garder le worker embarqué (JOBS_EMBEDDED_WORKER=true).
+"""
+import importlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Statuts d'une tâche
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# Tâche "running" sans battement de cœur depuis N secondes = worker mort -> reprise
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '600'))
+JOB_MAX_ATTEMPTS = 3
+WORKER_POLL_INTERVAL = 1.0
+
+# Handlers enregistrés par type de tâche
+JOB_HANDLERS: Dict[str, Callable] = {}
+
+# Modules qui déclarent des handlers (importés au démarrage d'un worker)
+JOB_HANDLER_MODULES = [
+    'app.services.hotel_import_service',
+    'app.services.published_trip_service',
+    'app.services.stripe_event_service',
+    'app.services.gps_guide_service',
+    'app.services.email_service',
+    'app.services.trip_snapshot'
+]
+
+
+def register_job_handler(job_type: str):
+    """
+    Décorateur : associe une fonction handler(job, ctx) -> result à un type de tâche
+    """
+    def decorator(func):
+        JOB_HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+class JobStore(ABC):
+    """Interface d'un stockage de tâches (SQLite aujourd'hui, Redis plus tard)"""
+
+    @abstractmethod
+    def enqueue(self, job_type: str, payload: Dict, data: Optional[bytes] = None) -> str:
+        pass
+
+    @abstractmethod
+    def claim_next(self, worker_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    def get_data(self, job_id: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def update_progress(self, job_id: str, progress: int, message: str = '',
+                        checkpoint: Optional[Dict] = None) -> None:
+        pass
+
+    @abstractmethod
+    def complete(self, job_id: str, result: Dict) -> None:
+        pass
+
+    @abstractmethod
+    def fail(self, job_id: str, error: str) -> None:
+        pass
+
+    @abstractmethod
+    def requeue_stale(self, stale_after: int = JOB_STALE_SECONDS) -> int:
+        pass
+
+    @abstractmethod
+    def has_pending(self, job_type: str) -> bool:
+        pass
+
+
+class SQLiteJobStore(JobStore):
+    """Stockage des tâches dans un fichier SQLite partagé par les process de la machine"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv(
+            'JOB_QUEUE_PATH',
+            os.path.join(tempfile.gettempdir(), 'mototrip_jobs.sqlite3')
+        )
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    data BLOB,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    message TEXT NOT NULL DEFAULT '',
+                    checkpoint TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker_id TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    heartbeat_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at)')
+
+    def _connect(self):
+        """Connexion SQLite (une par opération, sûre entre threads et process)"""
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _row_to_job(row) -> Dict:
+        return {
+            'id': row['id'],
+            'type': row['type'],
+            'status': row['status'],
+            'payload': json.loads(row['payload']),
+            'progress': row['progress'],
+            'message': row['message'],
+            'checkpoint': json.loads(row['checkpoint']) if row['checkpoint'] else {},
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'attempts': row['attempts'],
+            'createdAt': row['created_at'],
+            'updatedAt': row['updated_at']
+        }
+
+    def enqueue(self, job_type: str, payload: Dict, data: Optional[bytes] = None) -> str:
+        """Ajoute une tâche à la file et retourne son ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, type, status, payload, data, message, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, job_type, STATUS_QUEUED, json.dumps(payload), data,
+                 'En attente...', now, now)
+            )
+        return job_id
+
+    def claim_next(self, worker_id: str) -> Optional[Dict]:
+        """Réserve atomiquement la plus ancienne tâche en attente"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute(
+                'SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1',
+                (STATUS_QUEUED,)
+            ).fetchone()
+            if not row:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker_id = ?, attempts = attempts + 1, '
+                'updated_at = ?, heartbeat_at = ? WHERE id = ?',
+                (STATUS_RUNNING, worker_id, now, now, row['id'])
+            )
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+            return self._row_to_job(job)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Récupère l'état d'une tâche (sans les données binaires)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def get_data(self, job_id: str) -> Optional[bytes]:
+        """Récupère les données binaires d'une tâche (ex: fichier Excel)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT data FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['data'] if row else None
+
+    def update_progress(self, job_id: str, progress: int, message: str = '',
+                        checkpoint: Optional[Dict] = None) -> None:
+        """Persiste la progression (et le point de reprise) + battement de cœur"""
+        now = time.time()
+        with self._connect() as conn:
+            if checkpoint is not None:
+                conn.execute(
+                    'UPDATE jobs SET progress = ?, message = ?, checkpoint = ?, '
+                    'updated_at = ?, heartbeat_at = ? WHERE id = ?',
+                    (progress, message, json.dumps(checkpoint), now, now, job_id)
+                )
+            else:
+                conn.execute(
+                    'UPDATE jobs SET progress = ?, message = ?, updated_at = ?, heartbeat_at = ? WHERE id = ?',
+                    (progress, message, now, now, job_id)
+                )
+
+    def complete(self, job_id: str, result: Dict) -> None:
+        """Marque la tâche terminée (les données binaires sont libérées)"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, progress = 100, message = ?, result = ?, '
+                'data = NULL, checkpoint = NULL, updated_at = ? WHERE id = ?',
+                (STATUS_DONE, 'Terminé !', json.dumps(result), now, job_id)
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        """Marque la tâche en échec"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, data = NULL, updated_at = ? WHERE id = ?',
+                (STATUS_FAILED, error, now, job_id)
+            )
+
+    def requeue_stale(self, stale_after: int = JOB_STALE_SECONDS) -> int:
+        """
+        Remet en file les tâches dont le worker a disparu (crash, redéploiement).
+        Elles reprendront depuis leur dernier checkpoint.
+
+        Returns:
+            int: Nombre de tâches remises en file
+        """
+        limit = time.time() - stale_after
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, error = ? WHERE status = ? AND heartbeat_at < ? AND attempts >= ?',
+                (STATUS_FAILED, 'Trop de tentatives', STATUS_RUNNING, limit, JOB_MAX_ATTEMPTS)
+            )
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, message = ? WHERE status = ? AND heartbeat_at < ?',
+                (STATUS_QUEUED, 'Reprise après interruption...', STATUS_RUNNING, limit)
+            )
+            return cursor.rowcount
+
+
+    def has_pending(self, job_type: str) -> bool:
+        """Une tâche de ce type est-elle en attente ou en cours ?"""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT 1 FROM jobs WHERE type = ? AND status IN (?, ?) LIMIT 1',
+                (job_type, STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchone()
+        return row is not None
+
+
+class JobContext:
+    """Contexte passé aux handlers pour publier la progression et le point de reprise"""
+
+    def __init__(self, store: JobStore, job: Dict):
+        self.store = store
+        self.job = job
+        self.checkpoint = dict(job.get('checkpoint') or {})
+
+    @property
+    def data(self) -> Optional[bytes]:
+        return self.store.get_data(self.job['id'])
+
+    def report(self, progress: int, message: str = '', checkpoint: Optional[Dict] = None):
+        """
+        Persiste la progression ; `checkpoint` (fusionné avec l'existant) permet
+        de reprendre la tâche après un crash sans refaire les étapes terminées
+        """
+        if checkpoint:
+            self.checkpoint.update(checkpoint)
+            self.store.update_progress(self.job['id'], progress, message, self.checkpoint)
+        else:
+            self.store.update_progress(self.job['id'], progress, message)
+
+
+class JobWorker:
+    """Boucle de traitement des tâches (process dédié ou thread embarqué)"""
+
+    def __init__(self, store: JobStore, app=None):
+        self.store = store
+        self.app = app
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+
+        for module in JOB_HANDLER_MODULES:
+            importlib.import_module(module)
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self) -> bool:
+        """
+        Traite une tâche si disponible
+
+        Returns:
+            bool: True si une tâche a été traitée
+        """
+        job = self.store.claim_next(self.worker_id)
+        if not job:
+            return False
+
+        handler = JOB_HANDLERS.get(job['type'])
+        if not handler:
+            self.store.fail(job['id'], f"Type de tâche inconnu: {job['type']}")
+            return True
+
+        logger.info(f"🔧 Job {job['id']} ({job['type']}) démarré par {self.worker_id} (tentative {job['attempts']})")
+        ctx = JobContext(self.store, job)
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = handler(job, ctx)
+            else:
+                result = handler(job, ctx)
+            self.store.complete(job['id'], result or {})
+            logger.info(f"✅ Job {job['id']} terminé")
+        except Exception as e:
+            logger.error(f"❌ Job {job['id']} en échec: {e}")
+            self.store.fail(job['id'], str(e))
+        return True
+
+    def run_forever(self):
+        """Traite les tâches jusqu'à l'arrêt (reprend d'abord les tâches interrompues)"""
+        requeued = self.store.requeue_stale()
+        if requeued:
+            logger.info(f"🔁 {requeued} tâche(s) interrompue(s) remise(s) en file")
+
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(WORKER_POLL_INTERVAL)
+            except Exception as e:
+                logger.error(f"❌ Erreur worker {self.worker_id}: {e}")
+                self._stop.wait(WORKER_POLL_INTERVAL)
+
+
+# Instance globale du stockage (singleton pattern)
+_job_store = None
+_embedded_worker = None
+
+
+def get_job_store() -> JobStore:
+    """
+    Retourne le stockage de tâches configuré (JOB_QUEUE_BACKEND, défaut: sqlite)
+
+    Returns:
+        JobStore: Instance du stockage
+    """
+    global _job_store
+    if _job_store is None:
+        backend = os.getenv('JOB_QUEUE_BACKEND', 'sqlite')
+        if backend != 'sqlite':
+            raise ValueError(f"Backend de file de tâches non supporté: {backend}")
+        _job_store = SQLiteJobStore()
+    return _job_store
+
+
+def require_shared_queue_path():
+    """
+    Vérifie qu'un process `worker` dédié lit la même file que le web : sans
+    JOB_QUEUE_PATH explicite, chaque conteneur aurait son propre fichier dans
+    son répertoire temporaire et les tâches du web ne seraient jamais traitées
+
+    Raises:
+        RuntimeError: JOB_QUEUE_PATH absent avec le backend sqlite
+    """
+    if os.getenv('JOB_QUEUE_BACKEND', 'sqlite') == 'sqlite' and not os.getenv('JOB_QUEUE_PATH'):
+        raise RuntimeError(
+            "JOB_QUEUE_PATH doit pointer vers un volume partagé avec le process web "
+            "(ex: /data/mototrip_jobs.sqlite3) pour un worker dédié"
+        )
+
+
+def start_embedded_worker(app) -> Optional[JobWorker]:
+    """
+    Démarre un worker en thread daemon dans le process web
+    (utile quand aucun process `worker` séparé n'est déployé)
+    """
+    global _embedded_worker
+    if _embedded_worker is not None:
+        return _embedded_worker
+
+    _embedded_worker = JobWorker(get_job_store(), app)
+    thread = threading.Thread(target=_embedded_worker.run_forever, name='job-worker', daemon=True)
+    thread.start()
+    return _embedded_worker
@@ -0,0 +1,208 @@
+"""
+Cache persistant des réponses Gemini (SQLite)
+Clé = (modèle, hash du prompt normalisé), avec TTL et statistiques de hit-rate
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """Cache clé/valeur des réponses LLM stocké dans un fichier SQLite"""
+
+    # Durées de vie par défaut (secondes)
+    TTL_DEFAULT = 30 * 24 * 3600
+
+    # Nettoyage des entrées expirées toutes les N écritures
+    PURGE_EVERY = 100
+
+    def __init__(self, db_path=None):
+        """
+        Initialise le cache (le fichier est partagé entre les workers gunicorn)
+
+        Args:
+            db_path (str): Chemin du fichier SQLite (défaut: LLM_CACHE_PATH ou dossier temporaire)
+        """
+        self.db_path = db_path or os.getenv(
+            'LLM_CACHE_PATH',
+            os.path.join(tempfile.gettempdir(), 'mototrip_llm_cache.sqlite3')
+        )
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {}
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    namespace TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+
+        logger.info(f"✅ LLM cache initialized ({self.db_path})")
+
+    def _connect(self):
+        """Ouvre une connexion SQLite (une par opération, sûre entre threads)"""
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    @staticmethod
+    def normalize_prompt(prompt):
+        """Normalise le prompt (espaces) pour que des prompts équivalents partagent la même clé"""
+        return re.sub(r'\s+', ' ', prompt or '').strip()
+
+    @classmethod
+    def make_key(cls, model, prompt):
+        """
+        Calcule la clé de cache
+
+        Args:
+            model (str): Nom du modèle Gemini
+            prompt (str): Prompt envoyé
+
+        Returns:
+            str: Hash SHA-256 de (modèle, prompt normalisé)
+        """
+        payload = f"{model}\n{cls.normalize_prompt(prompt)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _count(self, namespace, field):
+        with self._lock:
+            stats = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            stats[field] += 1
+
+    def get(self, model, prompt, namespace='default'):
+        """
+        Récupère une réponse en cache si elle n'a pas expiré
+
+        Returns:
+            str: Réponse brute du modèle, ou None
+        """
+        key = self.make_key(model, prompt)
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    'SELECT response FROM llm_cache WHERE cache_key = ? AND expires_at > ?',
+                    (key, time.time())
+                ).fetchone()
+                if row:
+                    conn.execute('UPDATE llm_cache SET hits = hits + 1 WHERE cache_key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  LLM cache read error: {e}")
+            row = None
+
+        self._count(namespace, 'hits' if row else 'misses')
+        return row[0] if row else None
+
+    def set(self, model, prompt, response, ttl=None, namespace='default'):
+        """
+        Enregistre une réponse du modèle
+
+        Args:
+            model (str): Nom du modèle
+            prompt (str): Prompt envoyé
+            response (str): Réponse brute
+            ttl (int): Durée de vie en secondes (défaut: TTL_DEFAULT)
+            namespace (str): Catégorie pour les statistiques (teaser, gps_guide...)
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO llm_cache '
+                    '(cache_key, model, namespace, response, created_at, expires_at, hits) '
+                    'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                    (self.make_key(model, prompt), model, namespace, response,
+                     now, now + (ttl or self.TTL_DEFAULT))
+                )
+
+                with self._lock:
+                    self._writes += 1
+                    purge = self._writes % self.PURGE_EVERY == 0
+                if purge:
+                    conn.execute('DELETE FROM llm_cache WHERE expires_at <= ?', (now,))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  LLM cache write error: {e}")
+
+    def invalidate(self, model, prompt):
+        """Supprime une entrée du cache"""
+        try:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM llm_cache WHERE cache_key = ?', (self.make_key(model, prompt),))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  LLM cache delete error: {e}")
+
+    def clear(self, namespace=None):
+        """Vide le cache (entièrement ou pour une catégorie)"""
+        with self._connect() as conn:
+            if namespace:
+                conn.execute('DELETE FROM llm_cache WHERE namespace = ?', (namespace,))
+            else:
+                conn.execute('DELETE FROM llm_cache')
+
+    def get_stats(self):
+        """
+        Statistiques du cache
+
+        Returns:
+            dict: hits/misses/hit_rate du process par catégorie, et contenu du fichier SQLite
+        """
+        with self._lock:
+            process_stats = {ns: dict(values) for ns, values in self._stats.items()}
+
+        total_hits = sum(s['hits'] for s in process_stats.values())
+        total_misses = sum(s['misses'] for s in process_stats.values())
+        for values in process_stats.values():
+            lookups = values['hits'] + values['misses']
+            values['hit_rate'] = round(values['hits'] / lookups, 3) if lookups else 0.0
+
+        stored = {}
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    'SELECT namespace, COUNT(*), SUM(hits) FROM llm_cache '
+                    'WHERE expires_at > ? GROUP BY namespace',
+                    (time.time(),)
+                ).fetchall()
+                stored = {ns: {'entries': count, 'hits': hits or 0} for ns, count, hits in rows}
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️  LLM cache stats error: {e}")
+
+        lookups = total_hits + total_misses
+        return {
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_rate': round(total_hits / lookups, 3) if lookups else 0.0,
+            'namespaces': process_stats,
+            'stored': stored
+        }
+
+
+# Instance globale du cache (singleton pattern)
+_llm_cache = None
+
+
+def get_llm_cache():
+    """
+    Retourne l'instance singleton du LLMCache
+
+    Returns:
+        LLMCache: Instance du cache
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache()
+    return _llm_cache
@@ -0,0 +1,250 @@
+"""
+Rendu serveur des cartes de voyage (trace GPX simplifiée sur fond de tuiles)
+L'image est produite une fois à la publication / à l'assignation puis stockée
+dans Firebase Storage : le roadbook et la page publique n'appellent plus Google
+"""
+import hashlib
+import io
+import math
+import os
+import re
+import tempfile
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+from app.services.asset_proxy import ProxyDiskCache
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Taille de l'image (équivalent 600x400 en haute densité)
+MAP_WIDTH = 1200
+MAP_HEIGHT = 800
+MAP_PADDING = 80
+MAP_MAX_ZOOM = 14
+TILE_SIZE = 256
+
+# Fond de carte : tuiles raster (OpenStreetMap par défaut), mises en cache disque
+MAP_TILE_URL = os.getenv('MAP_TILE_URL', 'https://tile.openstreetmap.org/{z}/{x}/{y}.png')
+MAP_TILE_ATTRIBUTION = os.getenv('MAP_TILE_ATTRIBUTION', '© OpenStreetMap contributors')
+MAP_TILE_CACHE_DIR = os.getenv('MAP_TILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'mototrip_map_tiles'))
+MAP_TILE_CACHE_MAX_BYTES = int(os.getenv('MAP_TILE_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+MAP_TILE_TIMEOUT = (3.05, 10)
+MAX_PARALLEL_TILE_FETCHES = 4
+
+# Style de la trace (rouge OldiBike sur liseré blanc)
+ROUTE_COLOR = (255, 0, 0)
+ROUTE_CASING_COLOR = (255, 255, 255)
+ROUTE_WIDTH = 6
+BACKGROUND_COLOR = (229, 227, 223)
+START_COLOR = (22, 163, 74)
+END_COLOR = (17, 24, 39)
+
+# À incrémenter quand le style change (nouvelle clé d'image)
+MAP_STYLE_VERSION = 1
+
+_POINT_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+
+_tile_cache = None
+_tile_session = None
+
+
+def parse_points(points: List[str]) -> List[Tuple[float, float]]:
+    """Convertit des points "lat,lon" en tuples (les entrées invalides sont ignorées)"""
+    coords = []
+    for point in points or []:
+        match = _POINT_PATTERN.match(str(point))
+        if match:
+            coords.append((float(match.group(1)), float(match.group(2))))
+    return coords
+
+
+def route_points_of_days(days: List[dict]) -> List[str]:
+    """Points simplifiés de toutes les étapes d'un snapshot (day.gpx.path)"""
+    return [point for day in days or [] for point in ((day.get('gpx') or {}).get('path') or [])]
+
+
+def points_from_static_map_url(url: str) -> List[str]:
+    """Points "lat,lon" du paramètre path d'une ancienne URL Google Static Maps"""
+    if not url or 'maps.googleapis.com' not in url:
+        return []
+    points = []
+    for path in parse_qs(urlparse(url).query).get('path', []):
+        points.extend(part for part in path.split('|') if _POINT_PATTERN.match(part))
+    return points
+
+
+def _project(lat: float, lon: float, zoom: int) -> Tuple[float, float]:
+    """Projection Web Mercator -> pixels monde au niveau de zoom donné"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    world = TILE_SIZE * (2 ** zoom)
+    x = (lon + 180.0) / 360.0 * world
+    sin_lat = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * world
+    return x, y
+
+
+def _choose_zoom(coords: List[Tuple[float, float]], width: int, height: int) -> int:
+    """Plus grand zoom où la trace tient dans l'image (marges comprises)"""
+    for zoom in range(MAP_MAX_ZOOM, 1, -1):
+        xs, ys = zip(*(_project(lat, lon, zoom) for lat, lon in coords))
+        if max(xs) - min(xs) <= width - 2 * MAP_PADDING and max(ys) - min(ys) <= height - 2 * MAP_PADDING:
+            return zoom
+    return 2
+
+
+def _get_tile_cache() -> ProxyDiskCache:
+    global _tile_cache, _tile_session
+    if _tile_cache is None:
+        _tile_cache = ProxyDiskCache(cache_dir=MAP_TILE_CACHE_DIR, max_bytes=MAP_TILE_CACHE_MAX_BYTES)
+        _tile_session = requests.Session()
+        # Politique d'usage OSM : User-Agent identifiable obligatoire
+        _tile_session.headers.update({'User-Agent': 'MotoTrip-MapRenderer/1.0 (+https://oldibike.be)'})
+    return _tile_cache
+
+
+def _fetch_tile(zoom: int, x: int, y: int) -> Optional[bytes]:
+    """Tuile raster depuis le cache disque, sinon téléchargée puis mise en cache"""
+    cache = _get_tile_cache()
+    url = MAP_TILE_URL.format(z=zoom, x=x, y=y)
+    meta = cache.get(url)
+    if meta:
+        cache.touch(url)
+        with open(meta['path'], 'rb') as f:
+            return f.read()
+
+    try:
+        response = _tile_session.get(url, timeout=MAP_TILE_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        temp = cache.new_temp_file()
+        with temp:
+            temp.write(response.content)
+        cache.commit(url, temp.name, {'url': url, 'contentType': response.headers.get('Content-Type', 'image/png'),
+                                      'size': len(response.content)})
+        return response.content
+    except Exception as e:
+        logger.warning(f"⚠️  Tile fetch error {zoom}/{x}/{y}: {e}")
+        return None
+
+
+def render_route_map(points: List[str], width: int = MAP_WIDTH, height: int = MAP_HEIGHT) -> Optional[Tuple[bytes, str]]:
+    """
+    Dessine la trace sur un fond de tuiles
+
+    Args:
+        points: Points "lat,lon" (traces simplifiées des étapes, dans l'ordre)
+        width, height: Taille de l'image en pixels
+
+    Returns:
+        Tuple: (octets de l'image, type MIME) ou None (pas de points / Pillow absent /
+               aucune tuile chargée : l'image ne doit pas être stockée)
+    """
+    coords = parse_points(points)
+    if not coords:
+        return None
+
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        print("⚠️  Pillow non installé. Installez-le avec: pip install Pillow")
+        return None
+
+    zoom = _choose_zoom(coords, width, height)
+    projected = [_project(lat, lon, zoom) for lat, lon in coords]
+    xs, ys = zip(*projected)
+    left = (min(xs) + max(xs)) / 2 - width / 2
+    top = (min(ys) + max(ys)) / 2 - height / 2
+
+    image = Image.new('RGB', (width, height), BACKGROUND_COLOR)
+
+    # Fond : tuiles couvrant l'image (x bouclé autour du globe, y borné)
+    tiles_per_axis = 2 ** zoom
+    tile_range = [
+        (tx, ty)
+        for tx in range(int(left // TILE_SIZE), int((left + width) // TILE_SIZE) + 1)
+        for ty in range(int(top // TILE_SIZE), int((top + height) // TILE_SIZE) + 1)
+        if 0 <= ty < tiles_per_axis
+    ]
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TILE_FETCHES) as executor:
+        tiles = list(executor.map(lambda t: _fetch_tile(zoom, t[0] % tiles_per_axis, t[1]), tile_range))
+
+    pasted = 0
+    for (tx, ty), tile_bytes in zip(tile_range, tiles):
+        if not tile_bytes:
+            continue
+        try:
+            tile = Image.open(io.BytesIO(tile_bytes)).convert('RGB')
+            image.paste(tile, (int(tx * TILE_SIZE - left), int(ty * TILE_SIZE - top)))
+            pasted += 1
+        except Exception as e:
+            logger.warning(f"⚠️  Invalid tile {zoom}/{tx}/{ty}: {e}")
+
+    # Serveur de tuiles injoignable (réseau, limite OSM) : pas de carte grise stockée
+    # sous la clé des points, le fallback Google est utilisé et un prochain affichage réessaie
+    if not pasted:
+        logger.warning(f"⚠️  No map tile loaded (zoom {zoom}), map not rendered")
+        return None
+
+    # Trace
+    draw = ImageDraw.Draw(image)
+    line = [(x - left, y - top) for x, y in projected]
+    if len(line) > 1:
+        draw.line(line, fill=ROUTE_CASING_COLOR, width=ROUTE_WIDTH + 4, joint='curve')
+        draw.line(line, fill=ROUTE_COLOR, width=ROUTE_WIDTH, joint='curve')
+
+    for (x, y), color in ((line[0], START_COLOR), (line[-1], END_COLOR)):
+        draw.ellipse((x - 10, y - 10, x + 10, y + 10), fill=color, outline=ROUTE_CASING_COLOR, width=3)
+
+    # Attribution du fond de carte
+    text_width = draw.textlength(MAP_TILE_ATTRIBUTION)
+    draw.rectangle((width - text_width - 12, height - 20, width, height), fill=(255, 255, 255))
+    draw.text((width - text_width - 6, height - 17), MAP_TILE_ATTRIBUTION, fill=(60, 60, 60))
+
+    output = io.BytesIO()
+    try:
+        image.save(output, format='WEBP', quality=85, method=4)
+        return output.getvalue(), 'image/webp'
+    except (KeyError, OSError):
+        # Pillow compilé sans WebP
+        output = io.BytesIO()
+        image.save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'image/png'
+
+
+def map_image_key(points: List[str]) -> str:
+    """Clé de contenu de l'image (mêmes points + même style = même fichier)"""
+    payload = f"{MAP_STYLE_VERSION}:{MAP_WIDTH}x{MAP_HEIGHT}:{'|'.join(points)}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def store_route_map(firebase, points: List[str], storage_prefix: str) -> Optional[str]:
+    """
+    Rend la carte et la stocke dans Firebase Storage
+
+    Args:
+        firebase: Instance FirebaseService
+        points: Points "lat,lon" de la trace
+        storage_prefix: Dossier de destination (ex: maps/published/<slug>)
+
+    Returns:
+        str: URL publique de l'image, ou None si le rendu est impossible
+    """
+    rendered = render_route_map(points)
+    if not rendered:
+        return None
+
+    image_bytes, content_type = rendered
+    extension = 'webp' if content_type == 'image/webp' else 'png'
+    url = firebase.upload_file_from_bytes(
+        image_bytes,
+        f"{storage_prefix}/{map_image_key(points)}.{extension}",
+        content_type=content_type
+    )
+    if url:
+        logger.info(f"🗺️  Map rendered ({len(parse_points(points))} points, {len(image_bytes) // 1024} KB) -> {storage_prefix}")
+    return url
@@ -0,0 +1,734 @@
+"""
+Backend de stockage en mémoire pour FirebaseService (FIRESTORE_BACKEND=memory)
+Reproduit le sous-ensemble du client google-cloud-firestore utilisé par
+l'application (collections, documents, requêtes where / order_by / limit,
+batchs, transactions, sentinelles SERVER_TIMESTAMP / Increment / ArrayUnion,
+écoute on_snapshot des collections)
+ainsi qu'un bucket Storage minimal : exécution locale, benchmarks et tests de
+charge sans identifiants Firebase, à la vitesse de la mémoire.
+Les données vivent dans le process (perdues au redémarrage).
+"""
+import copy
+import os
+import random
+import string
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+from google.cloud.firestore_v1.watch import ChangeType, DocumentChange
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Limite Firestore du nombre d'opérations par batch / transaction
+MAX_WRITES_PER_COMMIT = 500
+
+# URL publique des fichiers du bucket en mémoire (servis par /_memory_storage/<chemin>)
+MEMORY_STORAGE_BASE_URL = os.getenv(
+    'MEMORY_STORAGE_BASE_URL',
+    f"http://localhost:{os.getenv('PORT', '5000')}/_memory_storage"
+)
+
+# Latence simulée de chaque aller-retour (lecture, requête, commit) pour les tests de charge
+MEMORY_BACKEND_LATENCY_MS = float(os.getenv('MEMORY_BACKEND_LATENCY_MS', '0'))
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+# Ordre des types dans les tris Firestore (null < bool < nombre < date < texte < octets < liste < map)
+_TYPE_ORDER = ((type(None), 0), (bool, 1), (int, 2), (float, 2), (datetime, 3), (str, 4),
+               (bytes, 5), (list, 8), (dict, 9))
+
+
+def _auto_id() -> str:
+    return ''.join(random.choices(_AUTO_ID_CHARS, k=20))
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _sort_key(value) -> Tuple:
+    for kind, rank in _TYPE_ORDER:
+        if isinstance(value, kind):
+            if rank == 3 and value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            if rank in (8, 9):
+                return rank, repr(value)
+            return rank, value
+    return 10, repr(value)
+
+
+_MISSING = object()
+
+
+def _get_field(data: Dict, field_path: str):
+    """Valeur d'un champ (chemin pointé "a.b.c"), _MISSING si absent"""
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _apply_transform(current, value):
+    """Valeur finale d'un champ après sentinelle (SERVER_TIMESTAMP, Increment, ArrayUnion...)"""
+    if value is transforms.SERVER_TIMESTAMP:
+        return _now()
+    if isinstance(value, transforms.Increment):
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + value.value
+    if isinstance(value, transforms.ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result.extend(item for item in value.values if item not in result)
+        return result
+    if isinstance(value, transforms.ArrayRemove):
+        return [item for item in (current if isinstance(current, list) else []) if item not in value.values]
+    if isinstance(value, dict):
+        return {k: _apply_transform(_MISSING, v) for k, v in value.items() if v is not transforms.DELETE_FIELD}
+    return copy.deepcopy(value)
+
+
+def _set_field(data: Dict, field_path: str, value):
+    """Écrit un champ (chemin pointé), sentinelles appliquées sur la valeur existante"""
+    parts = field_path.split('.')
+    target = data
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if value is transforms.DELETE_FIELD:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _apply_transform(target.get(parts[-1], _MISSING), value)
+
+
+def _merge(target: Dict, data: Dict):
+    """set(..., merge=True) : fusion récursive des maps"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        else:
+            target[key] = _apply_transform(target.get(key, _MISSING), value)
+
+
+def _matches(data: Dict, field_path: str, op: str, expected) -> bool:
+    value = _get_field(data, field_path)
+    if op == '!=' or op == 'not-in':
+        if value is _MISSING:
+            return False
+        return value != expected if op == '!=' else value not in expected
+    if value is _MISSING:
+        return False
+    if op == '==':
+        return value == expected
+    if op == 'in':
+        return value in expected
+    if op == 'array_contains':
+        return isinstance(value, list) and expected in value
+    if op == 'array_contains_any':
+        return isinstance(value, list) and any(item in value for item in expected)
+    if _sort_key(value)[0] != _sort_key(expected)[0]:
+        # Les comparaisons Firestore ne portent que sur des valeurs du même type
+        return False
+    left, right = _sort_key(value), _sort_key(expected)
+    return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[op]
+
+
+class MemoryStore:
+    """Documents indexés par chemin complet, protégés par un verrou réentrant unique"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.documents: Dict[str, Dict] = {}
+        self.collections: Dict[str, Dict[str, None]] = {}
+        self.stats = {'reads': 0, 'queries': 0, 'writes': 0}
+        self.latency = MEMORY_BACKEND_LATENCY_MS / 1000
+        self.watches: Dict[str, List['MemoryWatch']] = {}
+
+    def round_trip(self):
+        """Simule la latence réseau d'un appel Firestore (MEMORY_BACKEND_LATENCY_MS)"""
+        if self.latency:
+            time.sleep(self.latency)
+
+    def read(self, path: str) -> Optional[Dict]:
+        with self.lock:
+            self.stats['reads'] += 1
+            entry = self.documents.get(path)
+            return copy.deepcopy(entry) if entry else None
+
+    def list_collection(self, collection_path: str) -> List[Tuple[str, Dict]]:
+        with self.lock:
+            return [(doc_id, self.documents[f"{collection_path}/{doc_id}"])
+                    for doc_id in self.collections.get(collection_path, {})]
+
+    def apply(self, writes: List[Tuple]):
+        """Applique des écritures de façon atomique (toutes validées avant la première)"""
+        if len(writes) > MAX_WRITES_PER_COMMIT:
+            raise ValueError(f"Trop d'écritures dans un commit ({len(writes)} > {MAX_WRITES_PER_COMMIT})")
+        with self.lock:
+            existing = {path: path in self.documents for _, path, _, _ in writes}
+            for kind, path, _, _ in writes:
+                if kind == 'create' and existing[path]:
+                    raise AlreadyExists(f"Document already exists: {path}")
+                if kind == 'update' and not existing[path]:
+                    raise NotFound(f"No document to update: {path}")
+                existing[path] = kind != 'delete'
+
+            now = _now()
+            changed: Dict[str, Dict[str, ChangeType]] = {}
+            for kind, path, data, merge in writes:
+                self.stats['writes'] += 1
+                collection_path, doc_id = path.rsplit('/', 1)
+                if kind == 'delete':
+                    if self.documents.pop(path, None) is not None:
+                        self.collections.get(collection_path, {}).pop(doc_id, None)
+                        changed.setdefault(collection_path, {})[doc_id] = ChangeType.REMOVED
+                    continue
+
+                if collection_path in self.watches:
+                    previous = changed.get(collection_path, {}).get(doc_id)
+                    added = path not in self.documents or previous is ChangeType.ADDED
+                    changed.setdefault(collection_path, {})[doc_id] = ChangeType.ADDED if added else ChangeType.MODIFIED
+
+                entry = self.documents.get(path)
+                if kind in ('set', 'create') and not merge or entry is None:
+                    fields = {}
+                    entry = {'fields': fields, 'create_time': entry['create_time'] if entry else now}
+                else:
+                    fields = entry['fields']
+
+                if kind == 'update':
+                    for field_path, value in data.items():
+                        _set_field(fields, field_path, value)
+                elif isinstance(merge, (list, tuple)):
+                    # merge=[champs] : chaque champ listé est remplacé entièrement (maps comprises)
+                    for field_path in merge:
+                        value = _get_field(data, field_path)
+                        if value is not _MISSING:
+                            _set_field(fields, field_path, value)
+                elif merge:
+                    _merge(fields, data)
+                else:
+                    for key, value in data.items():
+                        if value is not transforms.DELETE_FIELD:
+                            fields[key] = _apply_transform(_MISSING, value)
+
+                entry['update_time'] = now
+                self.documents[path] = entry
+                self.collections.setdefault(collection_path, {})[doc_id] = None
+
+            for collection_path, doc_changes in changed.items():
+                for watch in list(self.watches.get(collection_path, ())):
+                    watch.notify(doc_changes)
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+            self.collections.clear()
+            self.stats = {'reads': 0, 'queries': 0, 'writes': 0}
+
+
+# ============================================
+# SNAPSHOTS ET RÉFÉRENCES
+# ============================================
+
+class MemoryDocumentSnapshot:
+    """Équivalent de DocumentSnapshot"""
+
+    def __init__(self, reference: 'MemoryDocumentReference', entry: Optional[Dict]):
+        self.reference = reference
+        self._entry = entry
+        self.read_time = _now()
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._entry is not None
+
+    @property
+    def create_time(self):
+        return self._entry['create_time'] if self._entry else None
+
+    @property
+    def update_time(self):
+        return self._entry['update_time'] if self._entry else None
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._entry['fields']) if self._entry else None
+
+    def get(self, field_path: str):
+        if not self._entry:
+            return None
+        value = _get_field(self._entry['fields'], field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+
+class MemoryDocumentReference:
+    """Équivalent de DocumentReference"""
+
+    def __init__(self, client: 'MemoryClient', path: str):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit('/', 1)[1]
+
+    @property
+    def parent(self) -> 'MemoryCollectionReference':
+        return MemoryCollectionReference(self._client, self.path.rsplit('/', 1)[0])
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def collection(self, collection_id: str) -> 'MemoryCollectionReference':
+        return MemoryCollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def collections(self) -> Iterator['MemoryCollectionReference']:
+        prefix = f"{self.path}/"
+        with self._client.store.lock:
+            paths = [p for p in self._client.store.collections if p.startswith(prefix) and '/' not in p[len(prefix):]]
+        return iter(MemoryCollectionReference(self._client, p) for p in paths)
+
+    def get(self, field_paths=None, transaction=None, **kwargs) -> MemoryDocumentSnapshot:
+        if transaction is not None:
+            transaction._check_read()
+        self._client.store.round_trip()
+        return MemoryDocumentSnapshot(self, self._client.store.read(self.path))
+
+    def _write(self, kind: str, data: Optional[Dict], merge=False):
+        self._client.store.round_trip()
+        self._client.store.apply([(kind, self.path, data, merge)])
+
+    def set(self, document_data: Dict, merge=False):
+        self._write('set', document_data, merge)
+
+    def create(self, document_data: Dict):
+        self._write('create', document_data)
+
+    def update(self, field_updates: Dict, option=None):
+        self._write('update', field_updates)
+
+    def delete(self, option=None):
+        self._write('delete', None)
+
+
+class MemoryQuery:
+    """Équivalent de Query (immuable : chaque méthode retourne une nouvelle requête)"""
+
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, client: 'MemoryClient', collection_path: str, filters=(), orders=(),
+                 limit: Optional[int] = None, offset: int = 0):
+        self._client = client
+        self._path = collection_path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+
+    def _copy(self, **changes) -> 'MemoryQuery':
+        params = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'offset': self._offset}
+        params.update(changes)
+        return MemoryQuery(self._client, self._path, **params)
+
+    def where(self, field_path: str = None, op_string: str = None, value=None, filter=None) -> 'MemoryQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> 'MemoryQuery':
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'MemoryQuery':
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> 'MemoryQuery':
+        return self._copy(offset=num_to_skip)
+
+    def _execute(self) -> List[MemoryDocumentSnapshot]:
+        store = self._client.store
+        with store.lock:
+            store.stats['queries'] += 1
+            rows = [
+                (doc_id, entry) for doc_id, entry in store.list_collection(self._path)
+                if all(_matches(entry['fields'], f, op, v) for f, op, v in self._filters)
+                # Comme Firestore : un document sans le champ de tri est exclu
+                and all(_get_field(entry['fields'], f) is not _MISSING for f, _ in self._orders)
+            ]
+            for field_path, direction in reversed(self._orders):
+                rows.sort(key=lambda row: _sort_key(_get_field(row[1]['fields'], field_path)),
+                          reverse=direction == self.DESCENDING)
+            rows = rows[self._offset:]
+            if self._limit is not None:
+                rows = rows[:self._limit]
+            store.stats['reads'] += max(1, len(rows))
+            return [
+                MemoryDocumentSnapshot(MemoryDocumentReference(self._client, f"{self._path}/{doc_id}"),
+                                       copy.deepcopy(entry))
+                for doc_id, entry in rows
+            ]
+
+    def stream(self, transaction=None, **kwargs) -> Iterator[MemoryDocumentSnapshot]:
+        if transaction is not None:
+            transaction._check_read()
+        self._client.store.round_trip()
+        return iter(self._execute())
+
+    def get(self, transaction=None, **kwargs) -> List[MemoryDocumentSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+
+class MemoryCollectionReference(MemoryQuery):
+    """Équivalent de CollectionReference"""
+
+    def __init__(self, client: 'MemoryClient', path: str):
+        super().__init__(client, path)
+
+    @property
+    def id(self) -> str:
+        return self._path.rsplit('/', 1)[-1]
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def parent(self) -> Optional[MemoryDocumentReference]:
+        if '/' not in self._path:
+            return None
+        return MemoryDocumentReference(self._client, self._path.rsplit('/', 1)[0])
+
+    def document(self, document_id: Optional[str] = None) -> MemoryDocumentReference:
+        return MemoryDocumentReference(self._client, f"{self._path}/{document_id or _auto_id()}")
+
+    def add(self, document_data: Dict, document_id: Optional[str] = None) -> Tuple[datetime, MemoryDocumentReference]:
+        reference = self.document(document_id)
+        reference.create(document_data)
+        return _now(), reference
+
+    def list_documents(self, page_size=None) -> Iterator[MemoryDocumentReference]:
+        return iter(self.document(doc_id) for doc_id, _ in self._client.store.list_collection(self._path))
+
+    def on_snapshot(self, callback) -> 'MemoryWatch':
+        return MemoryWatch(self, callback)
+
+
+class MemoryWatch:
+    """
+    Équivalent de Watch (on_snapshot sur une collection) : callback(docs, changes, read_time)
+    appelé avec l'état initial, puis de façon synchrone après chaque commit modifiant la collection
+    """
+
+    def __init__(self, collection: MemoryCollectionReference, callback):
+        self._collection = collection
+        self._callback = callback
+        store = collection._client.store
+        with store.lock:
+            store.watches.setdefault(collection.path, []).append(self)
+            self.notify({doc_id: ChangeType.ADDED for doc_id, _ in store.list_collection(collection.path)})
+
+    @property
+    def is_active(self) -> bool:
+        return self._callback is not None
+
+    def unsubscribe(self):
+        store = self._collection._client.store
+        with store.lock:
+            watches = store.watches.get(self._collection.path, [])
+            if self in watches:
+                watches.remove(self)
+        self._callback = None
+
+    def notify(self, doc_changes: Dict[str, ChangeType]):
+        """Appelé par le store (verrou tenu) avec {id du document: type de changement}"""
+        callback = self._callback
+        if callback is None:
+            return
+        client, path = self._collection._client, self._collection.path
+        snapshots = {
+            doc_id: MemoryDocumentSnapshot(MemoryDocumentReference(client, f"{path}/{doc_id}"), copy.deepcopy(entry))
+            for doc_id, entry in client.store.list_collection(path)
+        }
+        changes = [
+            DocumentChange(change_type,
+                           snapshots.get(doc_id) or MemoryDocumentSnapshot(
+                               MemoryDocumentReference(client, f"{path}/{doc_id}"), None),
+                           -1, -1)
+            for doc_id, change_type in doc_changes.items()
+        ]
+        try:
+            callback(list(snapshots.values()), changes, _now())
+        except Exception as e:
+            logger.error(f"❌ Erreur du callback on_snapshot ({path}): {e}")
+
+
+# ============================================
+# BATCHS ET TRANSACTIONS
+# ============================================
+
+class MemoryWriteBatch:
+    """Équivalent de WriteBatch : écritures appliquées atomiquement au commit"""
+
+    def __init__(self, client: 'MemoryClient'):
+        self._client = client
+        self._writes: List[Tuple] = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference: MemoryDocumentReference, document_data: Dict, merge=False):
+        self._writes.append(('set', reference.path, document_data, merge))
+
+    def create(self, reference: MemoryDocumentReference, document_data: Dict):
+        self._writes.append(('create', reference.path, document_data, False))
+
+    def update(self, reference: MemoryDocumentReference, field_updates: Dict, option=None):
+        self._writes.append(('update', reference.path, field_updates, False))
+
+    def delete(self, reference: MemoryDocumentReference, option=None):
+        self._writes.append(('delete', reference.path, None, False))
+
+    def commit(self) -> List:
+        writes, self._writes = self._writes, []
+        self._client.store.round_trip()
+        self._client.store.apply(writes)
+        return [None] * len(writes)
+
+
+class MemoryTransaction(MemoryWriteBatch):
+    """
+    Équivalent de Transaction, compatible avec @firestore.transactional.
+    Pessimiste : le verrou du store est tenu de _begin à _commit / _rollback,
+    les transactions sont donc sérialisées et ne sont jamais rejouées.
+    """
+
+    def __init__(self, client: 'MemoryClient', max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _check_read(self):
+        if self._writes:
+            raise ValueError("Firestore transactions require all reads to be executed before all writes.")
+
+    def _clean_up(self):
+        self._writes = []
+
+    def _begin(self, retry_id=None):
+        self._client.store.lock.acquire()
+        self._id = _auto_id().encode('utf-8')
+
+    def _release(self):
+        if self._id is not None:
+            self._id = None
+            self._client.store.lock.release()
+
+    def _commit(self) -> List:
+        try:
+            return self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self):
+        self._writes = []
+        self._release()
+
+    def get(self, ref_or_query, **kwargs) -> Iterator[MemoryDocumentSnapshot]:
+        if isinstance(ref_or_query, MemoryDocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+    def get_all(self, references: Iterable[MemoryDocumentReference], **kwargs) -> Iterator[MemoryDocumentSnapshot]:
+        self._check_read()
+        return self._client.get_all(references)
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class MemoryClient:
+    """Équivalent de firestore.Client sur un MemoryStore"""
+
+    def __init__(self, store: Optional[MemoryStore] = None):
+        self.store = store or MemoryStore()
+
+    def collection(self, *path: str) -> MemoryCollectionReference:
+        full_path = '/'.join(path).strip('/')
+        if full_path.count('/') % 2:
+            raise ValueError(f"Chemin de collection invalide: {full_path}")
+        return MemoryCollectionReference(self, full_path)
+
+    def document(self, *path: str) -> MemoryDocumentReference:
+        full_path = '/'.join(path).strip('/')
+        if not full_path.count('/') % 2:
+            raise ValueError(f"Chemin de document invalide: {full_path}")
+        return MemoryDocumentReference(self, full_path)
+
+    def collections(self) -> Iterator[MemoryCollectionReference]:
+        with self.store.lock:
+            paths = [p for p in self.store.collections if '/' not in p]
+        return iter(MemoryCollectionReference(self, p) for p in paths)
+
+    def get_all(self, references: Iterable[MemoryDocumentReference], field_paths=None,
+                transaction=None, **kwargs) -> Iterator[MemoryDocumentSnapshot]:
+        if transaction is not None:
+            transaction._check_read()
+        # Un seul aller-retour pour tous les documents demandés
+        self.store.round_trip()
+        return iter([MemoryDocumentSnapshot(reference, self.store.read(reference.path))
+                     for reference in dict.fromkeys(references)])
+
+    def batch(self) -> MemoryWriteBatch:
+        return MemoryWriteBatch(self)
+
+    def transaction(self, max_attempts: int = 5, read_only: bool = False) -> MemoryTransaction:
+        return MemoryTransaction(self, max_attempts=max_attempts, read_only=read_only)
+
+
+# ============================================
+# STORAGE
+# ============================================
+
+class MemoryBlob:
+    """Équivalent minimal de storage.Blob"""
+
+    def __init__(self, bucket: 'MemoryBucket', name: str):
+        self.bucket = bucket
+        self.name = name
+
+    @property
+    def public_url(self) -> str:
+        return f"{MEMORY_STORAGE_BASE_URL}/{self.name}"
+
+    @property
+    def content_type(self) -> Optional[str]:
+        entry = self.bucket.files.get(self.name)
+        return entry[1] if entry else None
+
+    @property
+    def size(self) -> Optional[int]:
+        entry = self.bucket.files.get(self.name)
+        return len(entry[0]) if entry else None
+
+    def upload_from_string(self, data, content_type: str = 'application/octet-stream', **kwargs):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self.bucket.lock:
+            self.bucket.files[self.name] = (bytes(data), content_type)
+
+    def upload_from_file(self, file_obj, content_type: str = 'application/octet-stream', **kwargs):
+        self.upload_from_string(file_obj.read(), content_type=content_type)
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None, **kwargs):
+        import mimetypes
+        with open(filename, 'rb') as f:
+            self.upload_from_string(f.read(), content_type=content_type or mimetypes.guess_type(filename)[0]
+                                    or 'application/octet-stream')
+
+    def download_as_bytes(self, **kwargs) -> bytes:
+        entry = self.bucket.files.get(self.name)
+        if entry is None:
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        return entry[0]
+
+    def download_as_text(self, encoding: str = 'utf-8', **kwargs) -> str:
+        return self.download_as_bytes().decode(encoding)
+
+    def exists(self, **kwargs) -> bool:
+        return self.name in self.bucket.files
+
+    def make_public(self, **kwargs):
+        pass
+
+    def generate_signed_url(self, *args, **kwargs) -> str:
+        return self.public_url
+
+    def delete(self, **kwargs):
+        with self.bucket.lock:
+            if self.bucket.files.pop(self.name, None) is None:
+                raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+
+
+class MemoryBucket:
+    """Équivalent minimal de storage.Bucket (fichiers gardés en mémoire)"""
+
+    def __init__(self, name: str = 'memory-bucket'):
+        self.name = name
+        self.files: Dict[str, Tuple[bytes, str]] = {}
+        self.lock = threading.Lock()
+
+    def blob(self, blob_name: str) -> MemoryBlob:
+        return MemoryBlob(self, blob_name)
+
+    def get_blob(self, blob_name: str) -> Optional[MemoryBlob]:
+        return MemoryBlob(self, blob_name) if blob_name in self.files else None
+
+    def list_blobs(self, prefix: str = '', **kwargs) -> Iterator[MemoryBlob]:
+        return iter(MemoryBlob(self, name) for name in list(self.files) if name.startswith(prefix))
+
+
+# Instances globales (une base par process, partagée par tous les FirebaseService)
+_memory_client = None
+_memory_bucket = None
+
+
+def get_memory_client() -> MemoryClient:
+    """
+    Retourne le client Firestore en mémoire du process (singleton)
+
+    Returns:
+        MemoryClient: Client en mémoire
+    """
+    global _memory_client
+    if _memory_client is None:
+        _memory_client = MemoryClient()
+    return _memory_client
+
+
+def get_memory_bucket() -> MemoryBucket:
+    """
+    Retourne le bucket Storage en mémoire du process (singleton)
+
+    Returns:
+        MemoryBucket: Bucket en mémoire
+    """
+    global _memory_bucket
+    if _memory_bucket is None:
+        _memory_bucket = MemoryBucket()
+    return _memory_bucket
+
+
+def register_memory_storage_route(app):
+    """Sert les fichiers du bucket en mémoire (URLs publiques des uploads en local)"""
+    from flask import Response, abort
+
+    @app.route('/_memory_storage/<path:blob_name>')
+    def memory_storage_file(blob_name):
+        entry = get_memory_bucket().files.get(blob_name)
+        if entry is None:
+            abort(404)
+        return Response(entry[0], mimetype=entry[1])
@@ -0,0 +1,190 @@
+"""
+Cache des pages publiques de voyages publiés (stale-while-revalidate)
+Une entrée par (vue, slug), versionnée par le `publishedAt` du document publié
+"""
+import hashlib
+import os
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from flask import current_app, request
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Page servie telle quelle pendant N secondes, puis servie "périmée" pendant
+# qu'un thread la régénère, jusqu'à PAGE_CACHE_STALE_TTL (au-delà : rendu synchrone)
+PAGE_CACHE_FRESH_TTL = int(os.getenv('PAGE_CACHE_FRESH_TTL', '60'))
+PAGE_CACHE_STALE_TTL = int(os.getenv('PAGE_CACHE_STALE_TTL', '3600'))
+PAGE_CACHE_MAX_ENTRIES = 500
+
+
+def to_datetime(value) -> Optional[datetime]:
+    """Convertit un publishedAt (timestamp float ou Timestamp Firestore) en datetime UTC"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+class PageCache:
+    """
+    Cache en mémoire (par process) des pages rendues.
+
+    Le rendu est fourni par l'appelant : render() -> {'body', 'version'} ou None
+    si la page n'existe pas (jamais mis en cache). L'appelant passe le
+    `publishedAt` courant (lecture légère) : une entrée d'une autre version est
+    régénérée. La purge explicite est faite par les routes de publication ; les
+    autres workers purgent la page dès que le document publié change (change_feed).
+    """
+
+    def __init__(self, fresh_ttl: int = PAGE_CACHE_FRESH_TTL, stale_ttl: int = PAGE_CACHE_STALE_TTL):
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self._entries: Dict[tuple, Dict] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_entry(rendered: Dict) -> Dict:
+        body = rendered['body']
+        version = rendered.get('version')
+        return {
+            'body': body,
+            'version': version,
+            'etag': hashlib.sha1(f"{version}:{body}".encode('utf-8')).hexdigest(),
+            'lastModified': to_datetime(version),
+            'renderedAt': time.time()
+        }
+
+    def _store(self, key: tuple, rendered: Optional[Dict]) -> Optional[Dict]:
+        with self._lock:
+            if rendered is None:
+                self._entries.pop(key, None)
+                return None
+            entry = self._make_entry(rendered)
+            if len(self._entries) >= PAGE_CACHE_MAX_ENTRIES and key not in self._entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]['renderedAt'])
+                del self._entries[oldest]
+            self._entries[key] = entry
+            return entry
+
+    def _refresh_in_background(self, key: tuple, render: Callable):
+        """Régénère l'entrée dans un thread (un seul rafraîchissement par clé)"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        app = current_app._get_current_object()
+        path = request.path
+        base_url = request.host_url
+
+        def refresh():
+            try:
+                # Contexte de requête factice : les templates utilisent url_for()
+                with app.test_request_context(path, base_url=base_url):
+                    self._store(key, render())
+            except Exception as e:
+                logger.error(f"❌ Page cache refresh error {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='page-cache-refresh', daemon=True).start()
+
+    def get_or_render(self, view: str, slug: str, render: Callable, version=None) -> Optional[Dict]:
+        """
+        Retourne l'entrée en cache pour (view, slug, version), en la (re)générant si besoin
+
+        Args:
+            view (str): Nom de la vue (public.view_published_trip, trips.trip_detail...)
+            slug (str): Slug du voyage publié
+            render (Callable): Rendu complet de la page
+            version: `publishedAt` courant du voyage (None : pas de vérification)
+
+        Returns:
+            Dict: {'body', 'version', 'etag', 'lastModified', 'renderedAt'} ou None (404)
+        """
+        key = (view, slug)
+        with self._lock:
+            entry = self._entries.get(key)
+
+        # Voyage republié depuis le rendu : l'entrée n'est plus servie, même périmée
+        if entry and version is not None and entry['version'] != version:
+            entry = None
+
+        if entry:
+            age = time.time() - entry['renderedAt']
+            if age < self.fresh_ttl:
+                return entry
+            if age < self.stale_ttl:
+                self._refresh_in_background(key, render)
+                return entry
+
+        return self._store(key, render())
+
+    def purge(self, slug: str):
+        """Supprime toutes les vues en cache d'un voyage (publication / dépublication)"""
+        if not slug:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == slug]:
+                del self._entries[key]
+        logger.info(f"🧹 Page cache purged for {slug}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def has_pending_flashes() -> bool:
+    """
+    Messages flash en attente pour ce visiteur (ex: erreur du formulaire de
+    réservation) : la page doit être rendue pour lui seul, hors cache
+    """
+    from flask import session
+    return bool(session.get('_flashes'))
+
+
+def make_private_response(body: str):
+    """Réponse HTML propre au visiteur (jamais stockée par un cache partagé)"""
+    response = current_app.response_class(body, mimetype='text/html')
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+
+def make_cached_response(entry: Dict, max_age: int = PAGE_CACHE_FRESH_TTL):
+    """
+    Construit la réponse HTML avec ETag / Last-Modified (304 si le client est à jour)
+    """
+    response = current_app.response_class(entry['body'], mimetype='text/html')
+    response.set_etag(entry['etag'])
+    if entry['lastModified']:
+        response.last_modified = entry['lastModified']
+    response.headers['Cache-Control'] = f"public, max-age={max_age}, stale-while-revalidate={PAGE_CACHE_STALE_TTL}"
+    return response.make_conditional(request)
+
+
+# Instance globale du cache (singleton pattern)
+_page_cache = None
+
+
+def get_page_cache() -> PageCache:
+    """
+    Retourne l'instance singleton du PageCache
+
+    Returns:
+        PageCache: Instance du cache
+    """
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache()
+    return _page_cache
@@ -0,0 +1,163 @@
+"""
+Vue publique dénormalisée des voyages publiés
+Les POIs et partenaires sont figés dans publishedTrips/{slug} à la publication,
+puis re-matérialisés en tâche de fond quand un POI ou un partenaire change
+"""
+import time
+import logging
+from typing import Dict, List, Optional
+
+from flask import current_app
+
+from app.services.job_queue import register_job_handler, get_job_store
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+POI_CATEGORY_ICONS = {
+    'monument': '🏰',
+    'nature': '🌲',
+    'museum': '🎨',
+    'activity': '⚡',
+    'viewpoint': '🔭',
+    'other': '📍'
+}
+
+# Champs partenaire nécessaires au rendu public (badges + thème)
+PARTNER_PUBLIC_FIELDS = ('name', 'color', 'badgeIcon', 'logo', 'website', 'displayConfig')
+
+
+def poi_ids_of_day(day: Dict) -> List[str]:
+    """IDs des POIs d'une étape (stockés en IDs ou en objets selon l'ancienneté)"""
+    ids = []
+    for item in day.get('pois') or []:
+        if isinstance(item, str):
+            ids.append(item)
+        elif isinstance(item, dict) and item.get('id'):
+            ids.append(item['id'])
+    return ids
+
+
+def public_poi(poi: Dict) -> Dict:
+    """Version publique (prête au rendu) d'un POI"""
+    return {
+        'id': poi.get('id'),
+        'name': poi.get('name'),
+        'category': poi.get('category'),
+        'icon': POI_CATEGORY_ICONS.get(poi.get('category', 'other'), '📍'),
+        'description': poi.get('description', ''),
+        'website': poi.get('website', ''),
+        'photos': poi.get('photos', [])
+    }
+
+
+def partner_theme(partners: List[Dict]) -> Dict:
+    """Thème de la page (couleurs du premier partenaire)"""
+    if not partners:
+        return {'primary_color': None, 'secondary_color': None}
+    first_partner = partners[0]
+    return {
+        'primary_color': first_partner.get('color', '#667eea'),
+        'secondary_color': (first_partner.get('displayConfig') or {}).get('secondaryColor', '#764ba2')
+    }
+
+
+def materialize_public_view(firebase, days: List[Dict], partner_ids: List[str]) -> Dict:
+    """
+    Construit la vue publique figée d'un voyage (une lecture groupée pour les POIs)
+
+    Args:
+        firebase: Instance FirebaseService
+        days: Étapes du voyage (champ `pois` = IDs)
+        partner_ids: Partenaires associés au voyage
+
+    Returns:
+        Dict: Champs à fusionner dans publishedTrips/{slug} :
+              {'publicView': {...}, 'poiRefs': [...]}
+    """
+    poi_refs = list(dict.fromkeys(poi_id for day in days for poi_id in poi_ids_of_day(day)))
+    pois = firebase.get_pois_by_ids(poi_refs)
+
+    partners = []
+    for partner_id in partner_ids or []:
+        partner = firebase.get_partner(partner_id)
+        if partner and partner.get('isActive', True):
+            partners.append({'id': partner_id, **{k: partner.get(k) for k in PARTNER_PUBLIC_FIELDS}})
+
+    total_distance = 0
+    for day in days:
+        try:
+            total_distance += float(day.get('distance') or 0)
+        except (TypeError, ValueError):
+            pass
+
+    return {
+        'publicView': {
+            'pois': {poi_id: public_poi(poi) for poi_id, poi in pois.items()},
+            'partners': partners,
+            'partnerTheme': partner_theme(partners),
+            'totalDistance': total_distance,
+            'materializedAt': time.time()
+        },
+        'poiRefs': poi_refs
+    }
+
+
+def rematerialize_published_trips(firebase, poi_id: Optional[str] = None,
+                                  partner_id: Optional[str] = None) -> Dict:
+    """
+    Recalcule la vue publique des voyages publiés qui référencent un POI ou un partenaire
+
+    Returns:
+        Dict: {'updated': nombre de voyages re-matérialisés}
+    """
+    from app.services.page_cache import get_page_cache
+
+    trips = []
+    if poi_id:
+        trips.extend(firebase.get_published_trips_referencing('poiRefs', poi_id))
+    if partner_id:
+        trips.extend(firebase.get_published_trips_referencing('partnerIds', partner_id))
+
+    updated = 0
+    for slug in dict.fromkeys(t['slug'] for t in trips):
+        trip = next(t for t in trips if t['slug'] == slug)
+        days = trip.get('days', [])
+        view = materialize_public_view(firebase, days, trip.get('partnerIds', []))
+
+        # Les étapes de la page détail embarquent aussi les objets POI (diaporama)
+        if any('poi_objects' in day for day in days):
+            pois = view['publicView']['pois']
+            view['days'] = [
+                {**day, 'poi_objects': [pois[poi_id] for poi_id in poi_ids_of_day(day) if poi_id in pois]}
+                for day in days
+            ]
+
+        if firebase.update_published_trip(slug, view):
+            get_page_cache().purge(slug)
+            updated += 1
+
+    logger.info(f"🔁 {updated} voyage(s) publié(s) re-matérialisé(s) (poi={poi_id}, partner={partner_id})")
+    return {'updated': updated}
+
+
+@register_job_handler('rematerialize_published_trips')
+def rematerialize_job(job: Dict, ctx) -> Dict:
+    """Handler de la file de tâches pour la re-matérialisation"""
+    from app.services import FirebaseService
+
+    payload = job['payload']
+    firebase = FirebaseService(current_app.config.get('APP_ID', 'default-app-id'))
+    return rematerialize_published_trips(firebase, payload.get('poiId'), payload.get('partnerId'))
+
+
+def enqueue_rematerialization(poi_id: Optional[str] = None, partner_id: Optional[str] = None) -> Optional[str]:
+    """Planifie la re-matérialisation après modification d'un POI ou d'un partenaire"""
+    try:
+        return get_job_store().enqueue('rematerialize_published_trips', {
+            'poiId': poi_id,
+            'partnerId': partner_id
+        })
+    except Exception as e:
+        logger.error(f"❌ Impossible de planifier la re-matérialisation: {e}")
+        return None
@@ -4,6 +4,7 @@ Gestion de la recherche d'hôtels et réservations
 """
 import requests
 from requests.auth import HTTPBasicAuth
+from concurrent.futures import ThreadPoolExecutor, wait
 from flask import current_app
 import logging
 
@@ -21,6 +22,10 @@ class RateHawkService:
     TIMEOUT_BOOKING = 120
     TIMEOUT_DEFAULT = 30
     
+    # Vérification groupée des tarifs (prebook de toutes les étapes)
+    TIMEOUT_PREBOOK_BATCH = 90
+    MAX_PARALLEL_PREBOOKS = 6
+    
     def __init__(self):
         """Initialise le service avec les credentials depuis la config"""
         self.api_key_id = current_app.config.get('RATEHAWK_API_KEY_ID')
@@ -299,7 +304,7 @@ class RateHawkService:
                 'message': str(e)
             }
     
-    def prebook_rate(self, rate_hash, rate_key, price_increase_percent=0):
+    def prebook_rate(self, rate_hash, rate_key, price_increase_percent=0, timeout=None):
         """
         Pré-réservation d'un tarif (vérification de disponibilité)
         ENDPOINT REQUIS pour la certification
@@ -308,6 +313,7 @@ class RateHawkService:
             rate_hash (str): Hash du tarif depuis hotelpage
             rate_key (str): Clé du tarif depuis hotelpage
             price_increase_percent (int): Pourcentage d'augmentation accepté (0-100)
+            timeout (int): Timeout en secondes (défaut: TIMEOUT_PREBOOK)
         
         Returns:
             dict: Résultat de la pré-réservation
@@ -327,7 +333,7 @@ class RateHawkService:
                 'POST',
                 endpoint,
                 json=payload,
-                timeout=self.TIMEOUT_PREBOOK
+                timeout=timeout or self.TIMEOUT_PREBOOK
             )
             
             return {
@@ -341,6 +347,170 @@ class RateHawkService:
                 'status': 'error',
                 'message': str(e)
             }
+    
+    def prebook_rates_batch(self, stages, price_increase_percent=0, max_workers=None, timeout=None):
+        """
+        Pré-réservation en parallèle de tous les tarifs d'une réservation
+        (une entrée par étape), avec rapport consolidé des écarts de prix
+        
+        Args:
+            stages (list): Étapes à vérifier, ex:
+                [{'stage_id': 'day1', 'rate_hash': '...', 'rate_key': '...',
+                  'expected_price': 180.0, 'label': 'Jour 1 - Gap'}]
+            price_increase_percent (int): Pourcentage d'augmentation accepté (0-100)
+            max_workers (int): Nombre max de prebooks simultanés
+            timeout (int): Temps max global en secondes (défaut: TIMEOUT_PREBOOK_BATCH)
+        
+        Returns:
+            dict: Rapport avec le résultat de chaque étape et les totaux
+                  (status = success | partial | error)
+        """
+        timeout = timeout or self.TIMEOUT_PREBOOK_BATCH
+        max_workers = max(1, min(max_workers or self.MAX_PARALLEL_PREBOOKS, len(stages) or 1))
+        
+        results = [None] * len(stages)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {}
+        
+        try:
+            for index, stage in enumerate(stages):
+                if not stage.get('rate_hash') or not stage.get('rate_key'):
+                    results[index] = self._build_stage_report(stage, {
+                        'status': 'error',
+                        'message': 'Missing rate_hash or rate_key'
+                    })
+                    continue
+                
+                future = executor.submit(
+                    self.prebook_rate,
+                    stage['rate_hash'],
+                    stage['rate_key'],
+                    price_increase_percent,
+                    # Chaque appel ne doit pas dépasser le budget global
+                    min(self.TIMEOUT_PREBOOK, timeout)
+                )
+                futures[future] = index
+            
+            done, not_done = wait(futures, timeout=timeout)
+            
+            for future in done:
+                index = futures[future]
+                results[index] = self._build_stage_report(stages[index], future.result())
+            
+            for future in not_done:
+                index = futures[future]
+                future.cancel()
+                logger.error(f"⏱️  Prebook timeout pour l'étape {stages[index].get('stage_id')}")
+                results[index] = self._build_stage_report(stages[index], {
+                    'status': 'timeout',
+                    'message': f'No answer after {timeout}s'
+                })
+        finally:
+            # Ne bloque pas la réponse sur les requêtes encore en vol
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return self._build_batch_report(results)
+    
+    @staticmethod
+    def _extract_prebook_price(prebook_data):
+        """
+        Extrait le prix confirmé depuis la réponse de prebook
+        
+        Args:
+            prebook_data (dict): Champ 'data' de la réponse /hotel/prebook/
+        
+        Returns:
+            tuple: (montant en float ou None, code devise ou None)
+        """
+        try:
+            rate = prebook_data['hotels'][0]['rates'][0]
+            payment_type = rate['payment_options']['payment_types'][0]
+            amount = payment_type.get('show_amount') or payment_type.get('amount')
+            currency = payment_type.get('show_currency_code') or payment_type.get('currency_code')
+            return float(amount), currency
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None, None
+    
+    def _build_stage_report(self, stage, result):
+        """
+        Construit la ligne de rapport d'une étape à partir du résultat de prebook
+        
+        Args:
+            stage (dict): Étape demandée
+            result (dict): Résultat de prebook_rate (ou erreur/timeout)
+        
+        Returns:
+            dict: Ligne de rapport avec l'écart de prix
+        """
+        expected = stage.get('expected_price')
+        expected = float(expected) if expected not in (None, '') else None
+        
+        report = {
+            'stage_id': stage.get('stage_id'),
+            'label': stage.get('label', ''),
+            'status': result.get('status', 'error'),
+            'expected_price': expected,
+            'actual_price': None,
+            'currency': None,
+            'delta': None,
+            'delta_percent': None
+        }
+        
+        if report['status'] != 'success':
+            report['message'] = result.get('message', '')
+            return report
+        
+        prebook_data = result.get('prebook_data', {})
+        actual, currency = self._extract_prebook_price(prebook_data)
+        report['actual_price'] = actual
+        report['currency'] = currency
+        report['price_changed'] = bool(prebook_data.get('changes', {}).get('price_changed'))
+        
+        if actual is not None and expected is not None:
+            report['delta'] = round(actual - expected, 2)
+            if expected:
+                report['delta_percent'] = round((actual - expected) / expected * 100, 2)
+        
+        return report
+    
+    @staticmethod
+    def _build_batch_report(stage_reports):
+        """
+        Consolide les lignes de rapport de toutes les étapes
+        
+        Args:
+            stage_reports (list): Lignes produites par _build_stage_report
+        
+        Returns:
+            dict: Rapport global avec totaux et statut
+        """
+        succeeded = [r for r in stage_reports if r['status'] == 'success']
+        failed = [r for r in stage_reports if r['status'] != 'success']
+        compared = [r for r in succeeded if r['delta'] is not None]
+        
+        expected_total = round(sum(r['expected_price'] for r in compared), 2)
+        actual_total = round(sum(r['actual_price'] for r in compared), 2)
+        
+        if not failed:
+            status = 'success'
+        elif succeeded:
+            status = 'partial'
+        else:
+            status = 'error'
+        
+        return {
+            'status': status,
+            'stages': stage_reports,
+            'summary': {
+                'total_stages': len(stage_reports),
+                'succeeded': len(succeeded),
+                'failed': len(failed),
+                'price_changed': sum(1 for r in compared if r['delta']),
+                'expected_total': expected_total,
+                'actual_total': actual_total,
+                'delta_total': round(actual_total - expected_total, 2)
+            }
+        }
 
 
     def suggest_location(self, query, language='fr'):
@@ -0,0 +1,226 @@
+"""
+Traitement idempotent et asynchrone des webhooks Stripe
+Le webhook enregistre l'événement (clé = ID d'événement Stripe) et répond tout de
+suite ; un worker applique ensuite l'événement dans une transaction Firestore.
+Les rejeux de Stripe sont détectés à l'enregistrement puis dans la transaction.
+"""
+import os
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from flask import current_app
+
+from app.services.job_queue import register_job_handler, get_job_store
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Événements traités par le worker (les autres sont acquittés sans stockage)
+HANDLED_EVENT_TYPES = (
+    'checkout.session.completed',
+    'checkout.session.async_payment_failed',
+    'payment_intent.succeeded',
+    'payment_intent.payment_failed'
+)
+
+# Rejeu d'un événement jamais traité : replanifié s'il a été reçu il y a plus de
+# N secondes (sa tâche a pu être perdue : file en /tmp, worker arrêté)
+STRIPE_EVENT_REQUEUE_GRACE = int(os.getenv('STRIPE_EVENT_REQUEUE_GRACE', '60'))
+
+# Champs conservés de l'objet Stripe (suffisants pour le traitement)
+EVENT_OBJECT_FIELDS = ('id', 'object', 'metadata', 'payment_intent', 'amount_total', 'payment_status')
+
+
+def _event_record(event: Dict) -> Dict:
+    """Document stocké pour un événement (sous-ensemble de l'objet Stripe)"""
+    obj = (event.get('data') or {}).get('object') or {}
+    return {
+        'type': event.get('type'),
+        'livemode': event.get('livemode', False),
+        'stripeCreated': event.get('created'),
+        'object': {field: obj.get(field) for field in EVENT_OBJECT_FIELDS if obj.get(field) is not None}
+    }
+
+
+def _enqueue(event_id: str) -> Optional[str]:
+    try:
+        return get_job_store().enqueue('stripe_event', {'eventId': event_id})
+    except Exception as e:
+        logger.error(f"❌ Impossible de planifier l'événement Stripe {event_id}: {e}")
+        return None
+
+
+def _should_requeue(recorded: Dict) -> bool:
+    """Rejeu Stripe d'un événement non traité : échec, ou tâche probablement perdue"""
+    status = recorded.get('status')
+    if status == 'processed':
+        return False
+    if status == 'failed':
+        return True
+    received_at = recorded.get('receivedAt')
+    if not isinstance(received_at, datetime):
+        return True
+    if received_at.tzinfo is None:
+        received_at = received_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - received_at).total_seconds() > STRIPE_EVENT_REQUEUE_GRACE
+
+
+def receive_stripe_event(firebase, event: Dict) -> str:
+    """
+    Enregistre un événement Stripe vérifié et planifie son traitement
+
+    Args:
+        firebase: Instance FirebaseService
+        event: Événement Stripe (payload JSON décodé)
+
+    Returns:
+        str: 'queued', 'processed', 'duplicate', 'ignored' ou 'error'
+    """
+    event_id = event.get('id')
+    if not event_id or event.get('type') not in HANDLED_EVENT_TYPES:
+        return 'ignored'
+
+    recorded = firebase.record_stripe_event(event_id, _event_record(event))
+    if recorded is None:
+        # Stripe réessaiera : rien n'a été enregistré
+        return 'error'
+
+    if not recorded['created']:
+        # Rejeu : un événement non traité (échec ou tâche perdue) est replanifié,
+        # un doublon en file est sans effet (traitement idempotent)
+        if _should_requeue(recorded):
+            _enqueue(event_id)
+            return 'queued'
+        return 'duplicate'
+
+    if not _enqueue(event_id):
+        # File indisponible : traitement immédiat (toujours idempotent)
+        try:
+            process_stripe_event(firebase, event_id)
+        except Exception as e:
+            logger.error(f"❌ Traitement immédiat de l'événement Stripe {event_id} en échec: {e}")
+            return 'error'
+        return 'processed'
+    return 'queued'
+
+
+# ============================================
+# TRAITEMENT (WORKER)
+# ============================================
+
+def _handle_checkout_completed(firebase, event_id: str, session: Dict) -> Dict:
+    """Acompte ou solde payé : réservation + organisateur en une transaction, puis email"""
+    metadata = session.get('metadata') or {}
+    booking_id = metadata.get('booking_id')
+    booking_type = metadata.get('booking_type', 'deposit')
+
+    if not booking_id:
+        print("⚠️  Aucun booking_id dans les métadonnées")
+        return {'outcome': 'no_booking'}
+
+    if booking_type == 'deposit':
+        booking_data = {
+            'paymentStatus': 'deposit_paid',
+            'status': 'confirmed',
+            'stripePaymentIntentId': session.get('payment_intent')
+        }
+        organizer_data = {'isActive': True}
+    elif booking_type == 'remaining':
+        booking_data = {
+            'paymentStatus': 'fully_paid',
+            'remainingAmount': 0,
+            'status': 'confirmed'
+        }
+        organizer_data = None
+    else:
+        return {'outcome': f'unknown_type:{booking_type}'}
+
+    outcome = firebase.commit_booking_event(event_id, booking_id, booking_data, organizer_data)
+    if outcome == 'missing':
+        print(f"⚠️  Booking {booking_id} introuvable")
+    elif outcome == 'applied':
+        print(f"✅ Paiement {booking_type} appliqué pour booking {booking_id}")
+
+        # Email envoyé uniquement à la première application de l'événement
+        if booking_type == 'deposit':
+            _send_booking_confirmation(firebase, booking_id)
+        # TODO: Envoyer un email de confirmation de paiement complet
+
+    return {'outcome': outcome, 'bookingId': booking_id}
+
+
+def _send_booking_confirmation(firebase, booking_id: str):
+    """Email de confirmation à l'organisateur (mis en file, hors transaction)"""
+    from app.services.email_service import get_email_service
+
+    try:
+        booking = firebase.get_booking(booking_id)
+        user = firebase.get_user(booking.organizer_user_id) if booking else None
+        if not user:
+            return
+        get_email_service().send_booking_confirmation(
+            email=user.email,
+            booking=booking,
+            access_token=booking.access_token,
+            base_url=os.getenv('BASE_URL', 'http://localhost:5000')
+        )
+        print(f"📧 Email de confirmation mis en file pour {user.email}")
+    except Exception as e:
+        print(f"⚠️  Erreur envoi email: {e}")
+
+
+def _handle_checkout_failed(firebase, event_id: str, session: Dict) -> Dict:
+    """Paiement échoué : statut de la réservation"""
+    booking_id = (session.get('metadata') or {}).get('booking_id')
+    if not booking_id:
+        return {'outcome': 'no_booking'}
+
+    outcome = firebase.commit_booking_event(event_id, booking_id, {'status': 'payment_failed'})
+    # TODO: Envoyer un email pour informer de l'échec
+    return {'outcome': outcome, 'bookingId': booking_id}
+
+
+def process_stripe_event(firebase, event_id: str) -> Dict:
+    """
+    Applique un événement enregistré (idempotent : un événement 'processed' est ignoré)
+
+    Returns:
+        Dict: Résultat du traitement
+    """
+    event = firebase.get_stripe_event(event_id)
+    if not event:
+        raise ValueError(f"Événement Stripe {event_id} introuvable")
+    if event.get('status') == 'processed':
+        return {'outcome': 'duplicate'}
+
+    event_type = event.get('type')
+    obj = event.get('object') or {}
+    print(f"📩 Traitement événement Stripe {event_id}: {event_type}")
+
+    try:
+        if event_type == 'checkout.session.completed':
+            result = _handle_checkout_completed(firebase, event_id, obj)
+        elif event_type == 'checkout.session.async_payment_failed':
+            print(f"❌ Paiement échoué - Session: {obj.get('id')}")
+            result = _handle_checkout_failed(firebase, event_id, obj)
+        else:
+            # payment_intent.* : les données utiles arrivent par checkout.session.completed
+            print(f"ℹ️  PaymentIntent {obj.get('id')}: {event_type}")
+            result = {'outcome': 'logged'}
+
+        if result.get('outcome') not in ('applied', 'duplicate'):
+            firebase.update_stripe_event(event_id, {'status': 'processed', 'outcome': result.get('outcome')})
+        return result
+    except Exception as e:
+        firebase.update_stripe_event(event_id, {'status': 'failed', 'error': str(e)})
+        raise
+
+
+@register_job_handler('stripe_event')
+def stripe_event_job(job: Dict, ctx) -> Dict:
+    """Handler de la file de tâches pour les événements Stripe"""
+    from app.services import FirebaseService
+
+    firebase = FirebaseService(current_app.config.get('APP_ID', 'default-app-id'))
+    return process_stripe_event(firebase, job['payload']['eventId'])
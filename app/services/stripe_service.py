@@ -1,7 +1,7 @@
 """
 Service Stripe pour gérer les paiements
+(le SDK stripe, long à importer, n'est chargé qu'à l'utilisation)
 """
-import stripe
 import os
 from flask import current_app, url_for
 from typing import Optional, Dict
@@ -12,6 +12,7 @@ class StripeService:
     
     def __init__(self):
         """Initialise le service Stripe avec la clé secrète"""
+        import stripe
         stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
         self.public_key = os.getenv('STRIPE_PUBLIC_KEY')
     
@@ -36,6 +37,7 @@ class StripeService:
         Returns:
             Dict contenant session_id et checkout_url
         """
+        import stripe
         try:
             # Convertit le prix en centimes (Stripe utilise les plus petites unités)
             unit_amount = int(price_per_person * 100)
@@ -84,6 +86,7 @@ class StripeService:
         Returns:
             Dict contenant les détails de la session
         """
+        import stripe
         try:
             session = stripe.checkout.Session.retrieve(session_id)
             return {
@@ -109,6 +112,7 @@ class StripeService:
         Returns:
             L'événement Stripe vérifié
         """
+        import stripe
         webhook_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
         
         if not webhook_secret:
@@ -138,6 +142,7 @@ class StripeService:
         Returns:
             True si réussi
         """
+        import stripe
         try:
             trip_slug = session.get('metadata', {}).get('trip_slug')
             
@@ -161,7 +166,8 @@ class StripeService:
             firebase_service.create_transaction(trip_slug, transaction_data)
             
             # Incrémente le compteur de checkouts pour les stats
-            firebase_service.increment_trip_checkouts(trip_slug)
+            from app.services.trip_counters import get_trip_counter_buffer
+            get_trip_counter_buffer().record_checkout(trip_slug)
             
             return True
             
@@ -0,0 +1,117 @@
+"""
+Tampon en mémoire des compteurs de voyages publiés (vues, checkouts)
+Les incréments sont cumulés par process puis écrits périodiquement sur les shards
+Firestore : aucune écriture dans le chemin critique de la page
+"""
+import atexit
+import os
+import threading
+import logging
+from collections import defaultdict
+from typing import Dict, Optional
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Intervalle de vidage du tampon (secondes) ; 0 = écriture immédiate (sans tampon)
+TRIP_COUNTER_FLUSH_INTERVAL = float(os.getenv('TRIP_COUNTER_FLUSH_INTERVAL', '10'))
+
+
+class TripCounterBuffer:
+    """Cumule les deltas (slug, champ) et les écrit via FirebaseService.increment_trip_counter"""
+
+    def __init__(self, app_id: str, flush_interval: float = TRIP_COUNTER_FLUSH_INTERVAL):
+        self.app_id = app_id
+        self.flush_interval = flush_interval
+        self._deltas: Dict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _firebase(self):
+        from app.services.firebase_service import FirebaseService
+        return FirebaseService(self.app_id)
+
+    def _ensure_thread(self):
+        """Démarre le thread de vidage au premier incrément (après un éventuel fork gunicorn)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='trip-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def increment(self, slug: str, field: str, amount: int = 1):
+        """Enregistre un incrément (écrit immédiatement si le tampon est désactivé)"""
+        if not slug:
+            return
+        if self.flush_interval <= 0:
+            self._firebase().increment_trip_counter(slug, field, amount)
+            return
+
+        with self._lock:
+            self._deltas[(slug, field)] += amount
+            self._ensure_thread()
+
+    def record_view(self, slug: str):
+        self.increment(slug, 'views')
+
+    def record_checkout(self, slug: str):
+        self.increment(slug, 'checkouts')
+
+    def pending(self, slug: str) -> Dict[str, int]:
+        """Deltas non encore écrits pour un voyage (pour une lecture à jour)"""
+        with self._lock:
+            return {field: delta for (s, field), delta in self._deltas.items() if s == slug}
+
+    def flush(self) -> int:
+        """
+        Écrit les deltas cumulés (une écriture par (slug, champ))
+
+        Returns:
+            int: Nombre d'écritures effectuées
+        """
+        with self._lock:
+            deltas, self._deltas = self._deltas, defaultdict(int)
+
+        if not deltas:
+            return 0
+
+        firebase = self._firebase()
+        written = 0
+        for (slug, field), amount in deltas.items():
+            if firebase.increment_trip_counter(slug, field, amount):
+                written += 1
+            else:
+                # Échec : on remet le delta en attente pour le prochain vidage
+                with self._lock:
+                    self._deltas[(slug, field)] += amount
+        return written
+
+
+# Instance globale du tampon (singleton pattern)
+_trip_counter_buffer = None
+
+
+def get_trip_counter_buffer() -> TripCounterBuffer:
+    """
+    Retourne l'instance singleton du TripCounterBuffer
+
+    Returns:
+        TripCounterBuffer: Instance du tampon
+    """
+    global _trip_counter_buffer
+    if _trip_counter_buffer is None:
+        from app.config import Config
+        _trip_counter_buffer = TripCounterBuffer(Config.APP_ID)
+        atexit.register(_trip_counter_buffer.flush)
+    return _trip_counter_buffer
+
+
+def get_trip_stats(firebase, slug: str) -> Dict[str, int]:
+    """Compteurs agrégés d'un voyage : shards Firestore + deltas encore en mémoire"""
+    stats = firebase.get_published_trip_counters(slug)
+    for field, delta in get_trip_counter_buffer().pending(slug).items():
+        stats[field] = stats.get(field, 0) + delta
+    return stats
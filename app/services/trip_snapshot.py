@@ -0,0 +1,240 @@
+"""
+Construction du snapshot de voyage stocké dans une réservation (tripSnapshot)
+Jours, hôtels, suggestions de restaurants, POIs et dérivés GPX sont rassemblés
+en lectures groupées dans un document autonome : le roadbook n'a plus rien à relire
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+from flask import current_app
+
+from app.services.gpx_service import extract_simplified_path, parse_gpx_stats
+from app.services.job_queue import register_job_handler, get_job_store
+from app.services.map_renderer import points_from_static_map_url, route_points_of_days, store_route_map
+from app.services.published_trip_service import poi_ids_of_day, public_poi
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Version du format : à incrémenter quand la structure du snapshot change
+SNAPSHOT_VERSION = 1
+
+# Points conservés par jour pour la trace simplifiée (et la carte statique)
+SNAPSHOT_GPX_MAX_POINTS = 60
+GPX_FETCH_TIMEOUT = 10
+MAX_PARALLEL_GPX_FETCHES = 4
+
+# Champs conservés (le snapshot reste compact : pas de stats d'usage ni de prix)
+HOTEL_SNAPSHOT_FIELDS = ('name', 'city', 'address', 'description', 'type', 'contact', 'photos', 'googlePlaceId')
+RESTAURANT_SNAPSHOT_FIELDS = ('name', 'city', 'address', 'cuisineType', 'contact', 'photos')
+DAY_SNAPSHOT_FIELDS = ('dayName', 'city', 'description', 'distance', 'elevation',
+                       'startPoint', 'endPoint', 'gpxUrl', 'hotelId', 'nights')
+
+# Rendu différé des cartes des anciens snapshots : pas de nouvel essai avant N secondes
+MAP_RENDER_RETRY_SECONDS = int(os.getenv('MAP_RENDER_RETRY_SECONDS', '3600'))
+
+# Champs exclus du hash de contenu (varient sans que le contenu change)
+HASH_EXCLUDED_FIELDS = ('snapshottedAt', 'contentHash')
+
+
+def _pick(data: Optional[Dict], fields) -> Optional[Dict]:
+    if not data:
+        return None
+    return {field: data.get(field) for field in fields if data.get(field) is not None}
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _fetch_gpx_derivatives(session: requests.Session, gpx_url: str) -> Optional[Dict]:
+    """Télécharge un GPX et en extrait la trace simplifiée + distance / dénivelé"""
+    try:
+        response = session.get(gpx_url, timeout=GPX_FETCH_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        stats = parse_gpx_stats(response.content)
+        return {
+            'path': extract_simplified_path(response.content, max_points=SNAPSHOT_GPX_MAX_POINTS),
+            'distance': stats['distance'],
+            'elevation': stats['elevation']
+        }
+    except Exception as e:
+        logger.warning(f"⚠️  GPX snapshot error ({gpx_url}): {e}")
+        return None
+
+
+def build_static_map_url(days: List[Dict], api_key: str) -> str:
+    """URL Google Static Maps de la trace complète (repli si le rendu local est indisponible)"""
+    points = route_points_of_days(days)
+    if not points:
+        return ''
+    return ("https://maps.googleapis.com/maps/api/staticmap?size=600x400&maptype=terrain"
+            f"&path=color:0xd946efff|weight:4|{'|'.join(points)}&key={api_key}")
+
+
+def compute_content_hash(snapshot: Dict) -> str:
+    """Hash SHA-256 stable du contenu du snapshot (hors horodatage)"""
+    content = {k: v for k, v in snapshot.items() if k not in HASH_EXCLUDED_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def is_complete_snapshot(snapshot: Optional[Dict]) -> bool:
+    """True si le snapshot a été produit par ce builder (aucune relecture nécessaire)"""
+    return bool(snapshot) and snapshot.get('version', 0) >= 1 and bool(snapshot.get('contentHash'))
+
+
+def build_trip_snapshot(firebase, owner_user_id: str, trip_id: str, api_key: str = '',
+                        trip: Optional[Dict] = None) -> Optional[Dict]:
+    """
+    Construit le snapshot autonome d'un voyage
+
+    Lectures : voyage + jours, puis hôtels, restaurants et POIs en get_all
+    groupés ; suggestions de restaurants et GPX récupérés en parallèle.
+
+    Args:
+        firebase: Instance FirebaseService
+        owner_user_id: Propriétaire du voyage (banque d'hôtels / restaurants)
+        trip_id: ID du voyage
+        api_key: Clé Google Maps (URL de carte de repli si le rendu local échoue)
+        trip: Document du voyage s'il a déjà été lu par l'appelant
+
+    Returns:
+        Dict: Snapshot versionné avec contentHash, ou None si le voyage n'existe pas
+    """
+    trip = trip or firebase.get_trip(owner_user_id, trip_id)
+    if not trip:
+        return None
+
+    raw_days = firebase.get_trip_days(owner_user_id, trip_id)
+    day_ids = [day['id'] for day in raw_days]
+
+    # Lectures groupées
+    hotels = firebase.get_hotels_by_ids(owner_user_id, [day.get('hotelId') for day in raw_days])
+    suggestions = firebase.get_days_restaurant_suggestions(owner_user_id, trip_id, day_ids)
+    restaurants = firebase.get_restaurants_by_ids(
+        owner_user_id,
+        [s.get('restaurantId') for day_suggestions in suggestions.values() for s in day_suggestions]
+    )
+    pois = firebase.get_pois_by_ids([poi_id for day in raw_days for poi_id in poi_ids_of_day(day)])
+
+    # Dérivés GPX (réseau, en parallèle sur une session poolée)
+    gpx_urls = list(dict.fromkeys(day['gpxUrl'] for day in raw_days if day.get('gpxUrl')))
+    gpx_derivatives = {}
+    if gpx_urls:
+        with requests.Session() as session, \
+                ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_GPX_FETCHES, len(gpx_urls))) as executor:
+            results = executor.map(lambda url: _fetch_gpx_derivatives(session, url), gpx_urls)
+            gpx_derivatives = dict(zip(gpx_urls, results))
+
+    days = []
+    for raw_day in raw_days:
+        day = _pick(raw_day, DAY_SNAPSHOT_FIELDS)
+        day['id'] = raw_day['id']
+
+        hotel = hotels.get(raw_day.get('hotelId'))
+        day['hotel'] = _pick(hotel, HOTEL_SNAPSHOT_FIELDS)
+        if hotel and not day.get('city'):
+            day['city'] = hotel.get('city', '')
+
+        day['restaurants'] = [
+            {'id': s['restaurantId'], **_pick(restaurants[s['restaurantId']], RESTAURANT_SNAPSHOT_FIELDS)}
+            for s in suggestions.get(raw_day['id'], [])
+            if s.get('restaurantId') in restaurants
+        ]
+        day['pois'] = [public_poi(pois[poi_id]) for poi_id in poi_ids_of_day(raw_day) if poi_id in pois]
+        day['gpx'] = gpx_derivatives.get(raw_day.get('gpxUrl'))
+        days.append(day)
+
+    snapshot = {
+        'version': SNAPSHOT_VERSION,
+        'name': trip.get('name', ''),
+        'title': trip.get('name', ''),
+        'description': trip.get('description', ''),
+        'difficulty': trip.get('difficulty', trip.get('difficultyLevel', '')),
+        'duration': trip.get('duration', ''),
+        'coverImage': trip.get('coverImage', ''),
+        'headerImage': trip.get('headerImage', ''),
+        # Carte rendue localement et stockée (repli : URL Google Static Maps)
+        'mapImage': (store_route_map(firebase, route_points_of_days(days), f"maps/trips/{trip_id}")
+                     or build_static_map_url(days, api_key)),
+        'days': days,
+        'dayCount': len(days),
+        'totalNights': sum(int(_as_float(day.get('nights')) or 1) for day in days),
+        'totalDistance': round(sum(_as_float(day.get('distance')) for day in days), 1),
+        'ownerUserId': owner_user_id,
+        'originalTemplateId': trip_id,
+        'publishedSlug': trip.get('publishedSlug')
+    }
+    snapshot['contentHash'] = compute_content_hash(snapshot)
+    snapshot['snapshottedAt'] = datetime.now().isoformat()
+
+    logger.info(f"📸 Snapshot v{SNAPSHOT_VERSION} built for trip {trip_id} ({len(days)} days, {snapshot['contentHash'][:10]})")
+    return snapshot
+
+
+def needs_map_render(snapshot: Optional[Dict]) -> bool:
+    """Le snapshot n'a qu'une ancienne URL Google Static Maps (ou aucune image) mais une trace"""
+    map_image = (snapshot or {}).get('mapImage') or ''
+    if map_image and 'maps.googleapis.com' not in map_image:
+        return False
+    return bool(route_points_of_days(snapshot.get('days', [])) or points_from_static_map_url(map_image))
+
+
+def render_booking_map(firebase, booking_id: str) -> Optional[str]:
+    """
+    Rend la carte d'un ancien snapshot de réservation (points des étapes, ou à défaut
+    ceux de l'URL Google) et l'enregistre dans tripSnapshot.mapImage
+
+    Returns:
+        str: URL de l'image rendue, ou None si rien à rendre / rendu impossible
+    """
+    booking = firebase.get_booking(booking_id)
+    snapshot = booking.trip_snapshot if booking else None
+    if not needs_map_render(snapshot):
+        return None
+
+    map_image = snapshot.get('mapImage') or ''
+    points = route_points_of_days(snapshot.get('days', [])) or points_from_static_map_url(map_image)
+    map_url = store_route_map(firebase, points, f"maps/bookings/{booking_id}")
+    if map_url:
+        firebase.update_booking(booking_id, {'tripSnapshot.mapImage': map_url})
+    return map_url
+
+
+@register_job_handler('booking_map_render')
+def booking_map_render_job(job: Dict, ctx) -> Dict:
+    """Handler de la file de tâches pour le rendu de carte d'une réservation"""
+    from app.services import FirebaseService
+
+    booking_id = job['payload']['bookingId']
+    firebase = FirebaseService(current_app.config.get('APP_ID', 'default-app-id'))
+    # Échec de rendu : pas de nouvel essai immédiat, le roadbook replanifie après MAP_RENDER_RETRY_SECONDS
+    return {'bookingId': booking_id, 'mapImage': render_booking_map(firebase, booking_id)}
+
+
+def enqueue_booking_map_render(firebase, booking) -> Optional[str]:
+    """
+    Planifie le rendu de carte d'une réservation, au plus une fois par
+    MAP_RENDER_RETRY_SECONDS (horodatage mapRenderAttemptAt sur le booking)
+    """
+    last_attempt = booking.map_render_attempt_at or 0
+    if time.time() - last_attempt < MAP_RENDER_RETRY_SECONDS:
+        return None
+
+    try:
+        firebase.update_booking(booking.booking_id, {'mapRenderAttemptAt': time.time()})
+        return get_job_store().enqueue('booking_map_render', {'bookingId': booking.booking_id})
+    except Exception as e:
+        logger.error(f"❌ Impossible de planifier le rendu de carte ({booking.booking_id}): {e}")
+        return None
@@ -1288,65 +1288,52 @@ async function startImport() {
     progressDetail.textContent = 'Envoi du fichier...';
 
     try {
-        // Appel API avec support du streaming
+        // Mise en file de l'import (traité en tâche de fond côté serveur)
         const response = await fetch('/admin/api/hotels/import-excel', {
             method: 'POST',
             body: formData
         });
 
-        if (!response.ok) {
-            throw new Error(`Erreur HTTP: ${response.status}`);
+        const enqueued = await response.json();
+        if (!response.ok || !enqueued.success) {
+            throw new Error(enqueued.error || `Erreur HTTP: ${response.status}`);
         }
 
-        // Lecture du stream
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
-        let buffer = '';
-
+        // Suivi de la progression (la tâche survit à un rechargement de page)
         while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            buffer += decoder.decode(value, { stream: true });
-            const lines = buffer.split('\n');
-            buffer = lines.pop(); // Garde le reste pour la prochaine itération
-
-            for (const line of lines) {
-                if (!line.trim()) continue;
-
-                try {
-                    const data = JSON.parse(line);
-
-                    if (data.error) {
-                        throw new Error(data.error);
-                    }
-
-                    if (data.progress) {
-                        progressBar.style.width = `${data.progress}%`;
-                        progressText.textContent = `${data.progress}%`;
-                        if (data.message) {
-                            progressDetail.textContent = data.message;
-                        }
-                    }
-
-                    if (data.result) {
-                        // Succès final
-                        progressBar.style.width = '100%';
-                        progressText.textContent = '100%';
-                        progressDetail.textContent = 'Import terminé !';
-
-                        showToast(`Import réussi: ${data.result.imported} hôtels importés`, 'success');
-
-                        // Ferme la modale et recharge
-                        setTimeout(() => {
-                            closeImportModal();
-                            loadHotels();
-                        }, 1000);
-                    }
-
-                } catch (e) {
-                    console.warn('Erreur parsing ligne stream:', line, e);
-                }
+            await new Promise(resolve => setTimeout(resolve, 1500));
+
+            const statusResponse = await fetch(enqueued.status_url);
+            const data = await statusResponse.json();
+            if (!data.success) {
+                throw new Error(data.error || 'Tâche introuvable');
+            }
+
+            const job = data.job;
+            progressBar.style.width = `${job.progress}%`;
+            progressText.textContent = `${job.progress}%`;
+            if (job.message) {
+                progressDetail.textContent = job.message;
+            }
+
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Erreur lors de l\'import');
+            }
+
+            if (job.status === 'done') {
+                // Succès final
+                progressBar.style.width = '100%';
+                progressText.textContent = '100%';
+                progressDetail.textContent = 'Import terminé !';
+
+                showToast(`Import réussi: ${job.result.imported} hôtels importés`, 'success');
+
+                // Ferme la modale et recharge
+                setTimeout(() => {
+                    closeImportModal();
+                    loadHotels();
+                }, 1000);
+                break;
             }
         }
 
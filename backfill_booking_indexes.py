@@ -0,0 +1,24 @@
+"""
+Rattrapage des index de réservations (joinCodes, accessTokens, stripeSessions)
+pour les réservations créées avant leur introduction. Une fois terminé, les
+recherches par code / token / session ne font plus de requête sur `bookings`.
+Usage: python backfill_booking_indexes.py
+"""
+from app import create_app
+from app.services import FirebaseService
+
+app = create_app(start_background=False)
+
+with app.app_context():
+    firebase = FirebaseService(app.config.get('APP_ID', 'default-app-id'))
+
+    print("🚀 Rattrapage des index de réservations...")
+    stats = firebase.backfill_booking_indexes()
+
+    print("\n📋 RÉSULTAT")
+    print("==================================================")
+    print(f"📦 Réservations  : {stats['bookings']}")
+    print(f"✅ Index créés   : {stats['created']}")
+    print(f"♻️  Déjà indexés  : {stats['existing']}")
+    print(f"⚠️  Conflits      : {stats['conflicts']}")
+    print("==================================================")
@@ -0,0 +1,7 @@
+"""
+Benchmarks des routes critiques (latence et lectures Firestore), du démarrage
+et de la charge (modes de service gunicorn)
+Usage: python -m benchmarks.run --help
+       python -m benchmarks.startup --help
+       python -m benchmarks.load --help
+"""
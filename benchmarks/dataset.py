@@ -0,0 +1,339 @@
+"""
+Jeu de données de benchmark : volumes réalistes écrits en batchs dans Firestore
+(émulateur) avec un générateur déterministe (même graine = mêmes documents)
+"""
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from app.services.firebase_service import BATCH_WRITE_LIMIT, BOOKING_LOOKUP_INDEXES
+
+# Volumes par défaut
+DEFAULT_VOLUMES = {
+    'trips': 500,
+    'hotels': 5000,
+    'pois': 10000,
+    'bookings': 2000
+}
+
+# Propriétaire des données (utilisateur fixe de l'admin)
+BENCHMARK_USER_ID = 'sam-user'
+PUBLISHED_TRIP_RATIO = 0.4
+CUSTOMER_COUNT = 600
+PARTNER_COUNT = 20
+TRIP_REQUEST_COUNT = 300
+# Réservations antérieures aux snapshots autonomes (enrichies à la lecture)
+LEGACY_SNAPSHOT_RATIO = 0.2
+
+CITIES = ('Annecy', 'Chamonix', 'Briançon', 'Digne-les-Bains', 'Millau', 'Rodez', 'Aurillac',
+          'Gérardmer', 'Colmar', 'Bouillon', 'Malmedy', 'Durbuy', 'Bastogne', 'Andermatt',
+          'Bormio', 'Cortina', 'Merano', 'Ronda', 'Potes', 'Jaca')
+HOTEL_TYPES = ('hotel', 'guesthouse', 'bnb', 'gite')
+POI_CATEGORIES = ('viewpoint', 'pass', 'restaurant', 'museum', 'fuel', 'photo', 'other')
+
+# Version du format des données : un changement ici impose un nouveau seed
+DATASET_VERSION = 1
+META_DOCUMENT = 'benchmarkMeta/dataset'
+
+
+class _BatchWriter:
+    """Écritures groupées par BATCH_WRITE_LIMIT opérations"""
+
+    def __init__(self, db):
+        self.db = db
+        self.batch = db.batch()
+        self.pending = 0
+        self.written = 0
+
+    def set(self, path: str, data: Dict):
+        self.batch.set(self.db.document(path), data)
+        self.pending += 1
+        if self.pending >= BATCH_WRITE_LIMIT:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.batch.commit()
+            self.written += self.pending
+            self.batch = self.db.batch()
+            self.pending = 0
+
+
+def _token(rng: random.Random, prefix: str) -> str:
+    return f"{prefix}{rng.getrandbits(64):016x}"
+
+
+def _route(rng: random.Random, points: int = 60) -> List[str]:
+    """Trace simplifiée "lat,lon" (marche aléatoire en Europe de l'Ouest)"""
+    lat, lon = rng.uniform(43.0, 50.0), rng.uniform(-1.0, 10.0)
+    path = []
+    for _ in range(points):
+        lat += rng.uniform(-0.02, 0.02)
+        lon += rng.uniform(-0.02, 0.03)
+        path.append(f"{lat:.5f},{lon:.5f}")
+    return path
+
+
+def build_dataset(volumes: Dict[str, int] = None, seed: int = 42) -> Dict:
+    """
+    Génère les documents (chemin -> données) et les échantillons utilisés par les scénarios
+
+    Returns:
+        Dict: {'documents': [(chemin, données)], 'samples': {...}, 'volumes': {...}}
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    rng = random.Random(seed)
+    base = datetime(2026, 1, 1)
+    root = 'artifacts/{app_id}'
+    user_root = f"{root}/users/{BENCHMARK_USER_ID}"
+    documents = []
+
+    partner_ids = [f"partner-{i:03d}" for i in range(PARTNER_COUNT)]
+    for i, partner_id in enumerate(partner_ids):
+        documents.append((f"{root}/partners/{partner_id}", {
+            'name': f"Partenaire {i}", 'isActive': True, 'logo': '', 'website': f"https://partner{i}.example"
+        }))
+
+    hotels = {}
+    for i in range(volumes['hotels']):
+        hotel_id = f"hotel-{i:05d}"
+        hotels[hotel_id] = {
+            'name': f"{rng.choice(('Hôtel', 'Auberge', 'Relais', 'Chalet'))} {rng.choice(CITIES)} {i}",
+            'city': rng.choice(CITIES),
+            'address': f"{rng.randint(1, 200)} rue de la Route",
+            'country': 'FR',
+            'type': rng.choice(HOTEL_TYPES),
+            'phone': f"+33 4 {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+            'partnerIds': rng.sample(partner_ids, k=rng.randint(0, 2)),
+            'photos': [f"https://storage.googleapis.com/bench/hotels/{hotel_id}/{n}.jpg" for n in range(3)],
+            'createdAt': base - timedelta(days=rng.randint(0, 900))
+        }
+        documents.append((f"{user_root}/hotels/{hotel_id}", hotels[hotel_id]))
+
+    pois = {}
+    for i in range(volumes['pois']):
+        poi_id = f"poi-{i:05d}"
+        pois[poi_id] = {
+            'name': f"Point d'intérêt {i}",
+            'category': rng.choice(POI_CATEGORIES),
+            'description': "Arrêt conseillé sur l'itinéraire.",
+            'city': rng.choice(CITIES),
+            'lat': rng.uniform(43.0, 50.0),
+            'lng': rng.uniform(-1.0, 10.0),
+            'partnerIds': rng.sample(partner_ids, k=rng.randint(0, 1)),
+            'photos': []
+        }
+        documents.append((f"{root}/pois/{poi_id}", pois[poi_id]))
+
+    hotel_ids = list(hotels)
+    poi_ids = list(pois)
+    trips = {}
+    published_slugs = []
+    for i in range(volumes['trips']):
+        trip_id = f"trip-{i:04d}"
+        name = f"Boucle {rng.choice(CITIES)} {i}"
+        day_count = 0 if rng.random() < 0.1 else rng.randint(3, 10)
+        days = []
+        for d in range(day_count):
+            days.append({
+                'id': f"day-{d:02d}",
+                'dayNumber': d + 1,
+                'city': rng.choice(CITIES),
+                'hotelId': rng.choice(hotel_ids),
+                'pois': rng.sample(poi_ids, k=rng.randint(0, 4)),
+                'distance': round(rng.uniform(120, 320), 1),
+                'nights': 1,
+                'gpxUrl': f"https://storage.googleapis.com/bench/gpx/{trip_id}/{d}.gpx",
+                'createdAt': base + timedelta(minutes=d)
+            })
+        published = bool(days) and rng.random() < PUBLISHED_TRIP_RATIO
+        slug = f"boucle-{i:04d}" if published else None
+        trips[trip_id] = {'name': name, 'days': days, 'slug': slug}
+
+        documents.append((f"{user_root}/trips/{trip_id}", {
+            'name': name,
+            'description': "Voyage moto de benchmark.",
+            'publishedSlug': slug,
+            'dayCount': len(days),
+            'totalNights': len(days),
+            'gpxIndex': [{'name': f"Jour {d['dayNumber']}", 'url': d['gpxUrl'], 'day': d['dayNumber']} for d in days],
+            'createdAt': base - timedelta(days=rng.randint(0, 700))
+        }))
+        for day in days:
+            documents.append((f"{user_root}/trips/{trip_id}/days/{day['id']}",
+                              {k: v for k, v in day.items() if k != 'id'}))
+
+        if published:
+            published_slugs.append(slug)
+            day_pois = {poi_id: {'id': poi_id, 'name': pois[poi_id]['name'], 'category': pois[poi_id]['category'],
+                                 'icon': '📍', 'description': pois[poi_id]['description'], 'website': '', 'photos': []}
+                        for day in days for poi_id in day['pois']}
+            documents.append((f"{root}/publishedTrips/{slug}", {
+                'title': name,
+                'description': "Voyage moto de benchmark.",
+                'isActive': True,
+                'pricePerPerson': rng.choice((990, 1290, 1590, 1890)),
+                'coverImage': f"https://storage.googleapis.com/bench/covers/{trip_id}.jpg",
+                'mapImage': f"https://storage.googleapis.com/bench/maps/{trip_id}.webp",
+                'days': [{**{k: v for k, v in day.items() if k not in ('createdAt',)},
+                          'gpx': {'path': _route(rng)}} for day in days],
+                'partnerIds': rng.sample(partner_ids, k=2),
+                'publicView': {'pois': day_pois, 'partners': [], 'totalDistance': sum(d['distance'] for d in days)},
+                'publishedAt': (base - timedelta(days=rng.randint(0, 300))).timestamp(),
+                'originalTripId': trip_id
+            }))
+
+    trip_ids = [trip_id for trip_id, trip in trips.items() if trip['days']]
+
+    customer_ids = [f"customer-{i:04d}" for i in range(CUSTOMER_COUNT)]
+    for i, customer_id in enumerate(customer_ids):
+        documents.append((f"{root}/customers/{customer_id}", {
+            'name': f"Client {i:04d}", 'email': f"client{i}@example.com", 'phone': '',
+            'createdAt': base - timedelta(days=rng.randint(0, 700))
+        }))
+        for v in range(rng.randint(0, 3)):
+            documents.append((f"{root}/customers/{customer_id}/vouchers/voucher-{v}", {
+                'name': f"Voucher {v}.pdf", 'url': f"https://storage.googleapis.com/bench/vouchers/{customer_id}/{v}.pdf",
+                'uploadedAt': base + timedelta(days=v)
+            }))
+        for f in range(rng.randint(0, 2)):
+            documents.append((f"{root}/customers/{customer_id}/gpxFiles/gpx-{f}", {
+                'name': f"Trace {f}.gpx", 'url': f"https://storage.googleapis.com/bench/custom/{customer_id}/{f}.gpx",
+                'uploadedAt': base + timedelta(days=f)
+            }))
+
+    booking_tokens = []
+    participant_tokens = []
+    for i in range(volumes['bookings']):
+        booking_id = f"booking-{i:05d}"
+        trip_id = rng.choice(trip_ids)
+        trip = trips[trip_id]
+        start = base + timedelta(days=rng.randint(-60, 240))
+        participants = rng.randint(1, 4)
+        pilots = max(1, participants - rng.randint(0, 1))
+        access_token = _token(rng, 'bk')
+        join_code = f"TRIP-{i:05d}"
+
+        days = trip['days']
+        if rng.random() < LEGACY_SNAPSHOT_RATIO:
+            # Ancien format : IDs d'hôtels / POIs relus à l'affichage du roadbook
+            snapshot = {'name': trip['name'], 'days': [
+                {'dayNumber': d['dayNumber'], 'city': d['city'], 'hotelId': d['hotelId'], 'pois': d['pois'],
+                 'distance': d['distance']} for d in days]}
+        else:
+            snapshot_days = [{
+                'dayNumber': d['dayNumber'], 'city': d['city'], 'distance': d['distance'], 'nights': 1,
+                'hotel': {k: hotels[d['hotelId']].get(k) for k in ('name', 'city', 'address', 'phone', 'photos')},
+                'restaurants': [],
+                'pois': [{'id': p, 'name': pois[p]['name'], 'category': pois[p]['category']} for p in d['pois']],
+                'gpx': {'path': _route(rng, 40), 'url': d['gpxUrl']}
+            } for d in days]
+            snapshot = {
+                'version': 1, 'name': trip['name'], 'title': trip['name'], 'days': snapshot_days,
+                'dayCount': len(days), 'totalNights': len(days),
+                'mapImage': f"https://storage.googleapis.com/bench/maps/{trip_id}.webp",
+                'originalTemplateId': trip_id, 'ownerUserId': BENCHMARK_USER_ID
+            }
+            snapshot['contentHash'] = hashlib.sha256(repr(snapshot_days).encode('utf-8')).hexdigest()
+
+        booking = {
+            'tripTemplateId': trip_id,
+            'organizerUserId': BENCHMARK_USER_ID,
+            'startDate': start.isoformat(),
+            'endDate': (start + timedelta(days=len(days))).isoformat(),
+            'totalParticipants': participants,
+            'currentParticipants': participants,
+            'pilotCount': pilots,
+            'passengerCount': participants - pilots,
+            'joinCode': join_code,
+            'accessToken': access_token,
+            'stripeSessionId': f"cs_bench_{i:05d}",
+            'totalAmount': 1290 * participants,
+            'depositAmount': 390 * participants,
+            'remainingAmount': 900 * participants,
+            'paymentStatus': rng.choice(('pending', 'deposit_paid', 'fully_paid')),
+            'status': 'confirmed',
+            'tripSnapshot': snapshot,
+            'createdAt': start - timedelta(days=90)
+        }
+        documents.append((f"{root}/bookings/{booking_id}", booking))
+        for field, collection in BOOKING_LOOKUP_INDEXES.items():
+            documents.append((f"{root}/{collection}/{booking[field]}", {'bookingId': booking_id}))
+        booking_tokens.append(access_token)
+
+        for p in range(participants):
+            invitation_token = _token(rng, 'pt')
+            documents.append((f"{root}/bookings/{booking_id}/participants/participant-{p}", {
+                'bookingId': booking_id, 'firstName': f"Pilote{p}", 'lastName': f"Résa{i}",
+                'email': f"p{p}.b{i}@example.com", 'role': 'organizer' if p == 0 else 'member',
+                'riderType': 'pilot' if p < pilots else 'passenger', 'invitationToken': invitation_token,
+                'createdAt': start - timedelta(days=80)
+            }))
+            participant_tokens.append(invitation_token)
+
+        customer_id = rng.choice(customer_ids)
+        documents.append((f"{root}/customers/{customer_id}/assignedTrips/{booking_id}", {
+            'tripId': trip_id, 'bookingId': booking_id, 'tripName': trip['name'], 'startDate': start.isoformat()
+        }))
+
+    for i in range(TRIP_REQUEST_COUNT):
+        documents.append((f"{user_root}/tripRequests/request-{i:04d}", {
+            'status': rng.choice(('new', 'new', 'read', 'archived')),
+            'name': f"Demande {i}", 'email': f"demande{i}@example.com",
+            'createdAt': base - timedelta(days=rng.randint(0, 200))
+        }))
+
+    return {
+        'documents': documents,
+        'volumes': volumes,
+        'samples': {
+            'customer_ids': customer_ids[:50],
+            'booking_tokens': rng.sample(booking_tokens, k=min(50, len(booking_tokens))),
+            'participant_tokens': rng.sample(participant_tokens, k=min(50, len(participant_tokens))),
+            'published_slugs': published_slugs[:50],
+            'hotel_queries': ['hôtel', 'relais', 'chalet annecy', 'auberge 12']
+        }
+    }
+
+
+def seed_dataset(db, app_id: str, volumes: Dict[str, int] = None, seed: int = 42, force: bool = False) -> Dict:
+    """
+    Écrit le jeu de données (sauf s'il est déjà présent avec la même version et les mêmes volumes)
+
+    Args:
+        db: Client Firestore (émulateur)
+        app_id: APP_ID de l'application
+        volumes: Volumes à générer (défaut: DEFAULT_VOLUMES)
+        seed: Graine du générateur
+        force: Réécrit même si le jeu est déjà présent
+
+    Returns:
+        Dict: Méta du jeu de données ({'volumes', 'samples', 'documents'})
+    """
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    meta_ref = db.document(f"artifacts/{app_id}/{META_DOCUMENT}")
+    existing = meta_ref.get()
+    if existing.exists and not force:
+        meta = existing.to_dict()
+        if meta.get('version') == DATASET_VERSION and meta.get('volumes') == volumes and meta.get('seed') == seed:
+            print(f"♻️  Jeu de données déjà présent ({meta.get('documents')} documents)")
+            return meta
+
+    dataset = build_dataset(volumes, seed)
+    writer = _BatchWriter(db)
+    for path, data in dataset['documents']:
+        writer.set(path.format(app_id=app_id), data)
+    writer.flush()
+
+    meta = {
+        'version': DATASET_VERSION,
+        'seed': seed,
+        'volumes': volumes,
+        'samples': dataset['samples'],
+        'documents': writer.written,
+        'seededAt': datetime.now().isoformat()
+    }
+    meta_ref.set(meta)
+    print(f"🌱 Jeu de données écrit ({writer.written} documents)")
+    return meta
@@ -0,0 +1,77 @@
+"""
+Compteur de lectures Firestore (documents facturés) au niveau du client google-cloud-firestore
+DocumentReference.get, Client.get_all (get_all / transactions) et Query._make_stream
+(stream / get / transactions) ; une requête sans résultat compte une lecture.
+Le backend en mémoire tient ses propres compteurs, ajoutés ici.
+"""
+import threading
+
+_lock = threading.Lock()
+_counts = {'reads': 0, 'queries': 0}
+_installed = False
+
+
+def _add(reads: int = 0, queries: int = 0):
+    with _lock:
+        _counts['reads'] += reads
+        _counts['queries'] += queries
+
+
+def read_counts() -> dict:
+    """Compteurs cumulés depuis le démarrage ({'reads', 'queries'})"""
+    from app.services import memory_backend
+
+    with _lock:
+        counts = dict(_counts)
+    if memory_backend._memory_client is not None:
+        stats = memory_backend._memory_client.store.stats
+        counts['reads'] += stats['reads']
+        counts['queries'] += stats['queries']
+    return counts
+
+
+def _counting(generator, is_query: bool):
+    """Relaie un générateur de snapshots en comptant les documents (valeur de retour conservée)"""
+    yielded = 0
+    try:
+        while True:
+            try:
+                item = next(generator)
+            except StopIteration as stop:
+                return stop.value
+            if hasattr(item, 'reference'):
+                yielded += 1
+                _add(reads=1)
+            yield item
+    finally:
+        if is_query:
+            _add(reads=0 if yielded else 1, queries=1)
+
+
+def install_read_counter():
+    """Installe les sondes sur le client Firestore (une fois par process)"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    from google.cloud.firestore_v1 import client, document, query
+
+    original_get = document.DocumentReference.get
+    original_get_all = client.Client.get_all
+    original_make_stream = query.Query._make_stream
+
+    def get(self, *args, **kwargs):
+        snapshot = original_get(self, *args, **kwargs)
+        _add(reads=1)
+        return snapshot
+
+    def get_all(self, *args, **kwargs):
+        return _counting(original_get_all(self, *args, **kwargs), is_query=False)
+
+    def _make_stream(self, *args, **kwargs):
+        return _counting(original_make_stream(self, *args, **kwargs), is_query=True)
+
+    document.DocumentReference.get = get
+    client.Client.get_all = get_all
+    query.Query._make_stream = _make_stream
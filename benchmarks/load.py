@@ -0,0 +1,189 @@
+"""
+Test de charge comparatif des modes de service gunicorn (sync / gevent)
+
+Démarre gunicorn (gunicorn.conf.py) sur le backend en mémoire avec une latence
+simulée par appel Firestore (MEMORY_BACKEND_LATENCY_MS), puis envoie pendant
+une durée fixe des requêtes concurrentes sur les pages publiques : roadbooks
+(token participant) et pages de voyage publiées. Résultats : débit, latences
+p50 / p95 / p99 et erreurs par mode, enregistrés dans
+benchmarks/results/load/<label>.json.
+
+Usage:
+    python -m benchmarks.load
+    python -m benchmarks.load --worker-class gevent --concurrency 200 --latency-ms 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results', 'load')
+
+# Jeu de données réduit : le roadbook par token participant parcourt toutes les réservations
+LOAD_TEST_VOLUMES = {'trips': 60, 'hotels': 300, 'pois': 600, 'bookings': 30}
+
+STARTUP_TIMEOUT = 60
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def start_server(worker_class: str, args, volumes: Dict[str, int]) -> subprocess.Popen:
+    """Démarre gunicorn et attend qu'il réponde sur /ping"""
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=worker_class,
+        GUNICORN_WORKER_CONNECTIONS=str(args.worker_connections),
+        WEB_CONCURRENCY=str(args.workers),
+        MEMORY_BACKEND_LATENCY_MS=str(args.latency_ms),
+        LOAD_TEST_VOLUMES=json.dumps(volumes),
+        METRICS_ENABLED='false',
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'benchmarks.load_app:app',
+         '--bind', f"127.0.0.1:{args.port}", '--log-level', 'warning'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn ({worker_class}) s'est arrêté au démarrage")
+        try:
+            if requests.get(f"http://127.0.0.1:{args.port}/ping", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({worker_class}) ne répond pas après {STARTUP_TIMEOUT}s")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_load(base_url: str, paths: List[str], concurrency: int, duration: float) -> Dict:
+    """Envoie des requêtes en boucle depuis `concurrency` clients pendant `duration` secondes"""
+    lock = threading.Lock()
+    durations, statuses = [], {}
+    deadline = time.monotonic() + duration
+
+    def client(index: int):
+        session = requests.Session()
+        i = index
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += concurrency
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + path, timeout=60).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                durations.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+    return {
+        'requests': len(durations),
+        'throughput_rps': round(len(durations) / wall, 1),
+        'p50_ms': round(statistics.median(durations), 1) if durations else None,
+        'p95_ms': round(_percentile(durations, 95), 1) if durations else None,
+        'p99_ms': round(_percentile(durations, 99), 1) if durations else None,
+        'errors': errors,
+        'statuses': {str(status): count for status, count in statuses.items()}
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, cwd=ROOT_DIR).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge comparatif sync / gevent")
+    parser.add_argument('--worker-class', action='append', choices=('sync', 'gevent'),
+                        help="Mode(s) à mesurer (défaut: sync puis gevent)")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-connections', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50, help="Clients simultanés")
+    parser.add_argument('--duration', type=float, default=20, help="Durée de chaque mesure (secondes)")
+    parser.add_argument('--latency-ms', type=float, default=20, help="Latence simulée par appel Firestore")
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--label', default=None, help="Nom du résultat (défaut: révision git)")
+    args = parser.parse_args()
+
+    from benchmarks.dataset import build_dataset
+
+    # Même graine que benchmarks/load_app.py : mêmes tokens et slugs que le serveur
+    samples = build_dataset(LOAD_TEST_VOLUMES, seed=42)['samples']
+    paths = [f"/{token}" for token in samples['participant_tokens']]
+    paths += [f"/voyage/{slug}" for slug in samples['published_slugs']]
+
+    results = {}
+    for worker_class in args.worker_class or ['sync', 'gevent']:
+        print(f"🚀 {worker_class}: {args.workers} worker(s), {args.concurrency} clients, {args.duration:.0f}s, "
+              f"latence Firestore {args.latency_ms:.0f} ms")
+        process = start_server(worker_class, args, LOAD_TEST_VOLUMES)
+        try:
+            result = run_load(f"http://127.0.0.1:{args.port}", paths, args.concurrency, args.duration)
+        finally:
+            stop_server(process)
+        results[worker_class] = result
+        print(f"  {result['requests']} requêtes, {result['throughput_rps']} req/s, p50 {result['p50_ms']} ms, "
+              f"p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, erreurs {result['errors']}")
+
+    if 'sync' in results and 'gevent' in results and results['sync']['throughput_rps']:
+        ratio = results['gevent']['throughput_rps'] / results['sync']['throughput_rps']
+        print(f"\n📊 gevent / sync : débit x{ratio:.1f}")
+
+    revision = _git_revision()
+    label = args.label or revision
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'label': label,
+            'revision': revision,
+            'createdAt': datetime.now().isoformat(),
+            'workers': args.workers,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'latency_ms': args.latency_ms,
+            'volumes': LOAD_TEST_VOLUMES,
+            'results': results
+        }, f, indent=2, ensure_ascii=False)
+    print(f"💾 Résultats enregistrés: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""
+Application servie pendant les tests de charge (python -m benchmarks.load) :
+backend en mémoire rempli avec le jeu de données des benchmarks, une fois
+dans le master gunicorn (preload) puis partagé par les workers forkés
+"""
+import json
+import os
+
+os.environ['FIRESTORE_BACKEND'] = 'memory'
+os.environ['JOBS_EMBEDDED_WORKER'] = 'false'
+
+from app import create_app
+from app.services.memory_backend import get_memory_client
+from benchmarks.dataset import seed_dataset
+
+app = create_app(start_background=False)
+
+# Remplissage sans latence simulée (MEMORY_BACKEND_LATENCY_MS ne vise que les requêtes)
+_db = get_memory_client()
+_latency, _db.store.latency = _db.store.latency, 0
+seed_dataset(_db, app.config.get('APP_ID', 'default-app-id'),
+             volumes=json.loads(os.getenv('LOAD_TEST_VOLUMES', '{}')),
+             seed=int(os.getenv('LOAD_TEST_SEED', '42')))
+_db.store.latency = _latency
@@ -0,0 +1,298 @@
+"""
+Benchmark des routes critiques sur l'émulateur Firestore ou le backend en mémoire
+
+Mesure, par scénario : latence (p50 / p95 / moyenne), lectures Firestore et
+appels de service (en-tête Server-Timing) par requête. Les résultats sont
+enregistrés dans benchmarks/results/<label>.json et comparés au précédent.
+
+Usage:
+    firebase emulators:start --only firestore --project demo-mototrip
+    python -m benchmarks.run --emulator localhost:8080 --label v1.4
+    python -m benchmarks.run --emulator localhost:8080 --scenario view_roadbook --iterations 50
+    python -m benchmarks.run --backend memory --label v1.4-memory
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+EMULATOR_PROJECT_ID = 'demo-mototrip'
+
+# Seuils de régression par rapport au résultat précédent
+REGRESSION_LATENCY_RATIO = 1.2
+REGRESSION_READS_RATIO = 1.0
+
+GPX_BENCH_POINTS = 5000
+
+_SERVER_TIMING_PATTERN = re.compile(r'(\w+);dur=([\d.]+);desc="(\d+) calls"')
+
+
+def init_emulator(host: str):
+    """Initialise firebase_admin sur l'émulateur Firestore (identifiants anonymes)"""
+    os.environ['FIRESTORE_EMULATOR_HOST'] = host
+    os.environ.setdefault('GOOGLE_CLOUD_PROJECT', EMULATOR_PROJECT_ID)
+
+    import firebase_admin
+    from firebase_admin import credentials
+    from google.auth.credentials import AnonymousCredentials
+
+    class EmulatorCredential(credentials.Base):
+        def get_credential(self):
+            return AnonymousCredentials()
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(EmulatorCredential(), {
+            'projectId': EMULATOR_PROJECT_ID,
+            'storageBucket': f"{EMULATOR_PROJECT_ID}.appspot.com"
+        })
+
+
+def reset_emulator(host: str):
+    """Vide la base de l'émulateur"""
+    import requests
+    requests.delete(
+        f"http://{host}/emulator/v1/projects/{EMULATOR_PROJECT_ID}/databases/(default)/documents",
+        timeout=30
+    ).raise_for_status()
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _server_timing_calls(header: str) -> Dict[str, int]:
+    return {category: int(count) for category, _, count in _SERVER_TIMING_PATTERN.findall(header or '')}
+
+
+def measure(name: str, call: Callable[[int], Optional[object]], iterations: int, warmup: int = 1) -> Dict:
+    """
+    Exécute un scénario et agrège latence, lectures Firestore et appels de service
+
+    Args:
+        call: Fonction (index d'itération) -> réponse Flask (ou None hors HTTP)
+    """
+    from benchmarks.firestore_reads import read_counts
+
+    for i in range(warmup):
+        call(i)
+
+    durations, reads, queries, calls, statuses = [], [], [], {}, {}
+    for i in range(iterations):
+        before = read_counts()
+        start = time.perf_counter()
+        response = call(i)
+        durations.append((time.perf_counter() - start) * 1000)
+        after = read_counts()
+        reads.append(after['reads'] - before['reads'])
+        queries.append(after['queries'] - before['queries'])
+        if response is not None:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            for category, count in _server_timing_calls(response.headers.get('Server-Timing')).items():
+                calls[category] = calls.get(category, 0) + count
+
+    result = {
+        'iterations': iterations,
+        'p50_ms': round(statistics.median(durations), 2),
+        'p95_ms': round(_percentile(durations, 95), 2),
+        'mean_ms': round(statistics.mean(durations), 2),
+        'reads_per_call': round(statistics.mean(reads), 1),
+        'queries_per_call': round(statistics.mean(queries), 1),
+        'calls_per_call': {category: round(count / iterations, 1) for category, count in sorted(calls.items())},
+        'statuses': {str(status): count for status, count in statuses.items()}
+    }
+    print(f"  {name:<32} p50 {result['p50_ms']:>9.1f} ms  p95 {result['p95_ms']:>9.1f} ms  "
+          f"reads {result['reads_per_call']:>8.1f}  calls {result['calls_per_call']}")
+    return result
+
+
+def _synthetic_gpx(points: int = GPX_BENCH_POINTS) -> str:
+    import random
+    rng = random.Random(7)
+    lat, lon, ele = 45.9, 6.1, 450.0
+    rows = []
+    for _ in range(points):
+        lat += rng.uniform(-0.0005, 0.0005)
+        lon += rng.uniform(-0.0003, 0.0007)
+        ele = max(0.0, ele + rng.uniform(-4, 5))
+        rows.append(f'<trkpt lat="{lat:.6f}" lon="{lon:.6f}"><ele>{ele:.1f}</ele></trkpt>')
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<gpx version="1.1" creator="bench" xmlns="http://www.topografix.com/GPX/1/1">'
+            f'<trk><name>Bench</name><trkseg>{"".join(rows)}</trkseg></trk></gpx>')
+
+
+def build_scenarios(app, samples: Dict) -> Dict[str, Callable[[int], Optional[object]]]:
+    """Scénarios mesurés (un client de test Flask, session admin ouverte)"""
+    from app.services.gpx_service import parse_gpx_stats, extract_simplified_path
+    from app.services.page_cache import get_page_cache
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    def pick(key: str, i: int):
+        values = samples[key]
+        return values[i % len(values)]
+
+    def published_trip_cold(i):
+        # Rendu complet : la page n'est pas encore en cache
+        get_page_cache().clear()
+        return client.get(f"/voyage/{pick('published_slugs', i)}")
+
+    gpx = _synthetic_gpx()
+
+    def gpx_stats(i):
+        parse_gpx_stats(gpx)
+
+    def gpx_path(i):
+        extract_simplified_path(gpx)
+
+    return {
+        'view_roadbook (booking token)': lambda i: client.get(f"/{pick('booking_tokens', i)}"),
+        'view_roadbook (participant)': lambda i: client.get(f"/{pick('participant_tokens', i)}"),
+        'view_published_trip (cold)': published_trip_cold,
+        'view_published_trip (cached)': lambda i: client.get(f"/voyage/{pick('published_slugs', 0)}"),
+        'customer_details': lambda i: client.get(f"/admin/customers/{pick('customer_ids', i)}"),
+        'api_get_dashboard_stats': lambda i: client.get('/admin/api/dashboard/stats'),
+        'search_hotels': lambda i: client.get('/admin/api/hotels/search', query_string={'q': pick('hotel_queries', i)}),
+        'parse_gpx_stats': gpx_stats,
+        'extract_simplified_path': gpx_path
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(__file__)).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def latest_result(backend: str, exclude: str = None) -> Optional[Dict]:
+    """Résultat enregistré le plus récent sur le même backend (référence de comparaison)"""
+    results = []
+    for path in glob.glob(os.path.join(RESULTS_DIR, '*.json')):
+        if path == exclude:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        if result.get('backend', 'emulator') == backend:
+            results.append((os.path.getmtime(path), result))
+    return max(results, key=lambda item: item[0])[1] if results else None
+
+
+def compare(current: Dict, previous: Dict) -> List[str]:
+    """Régressions (latence p50 ou lectures) par rapport à un résultat précédent"""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        if before['p50_ms'] and result['p50_ms'] > before['p50_ms'] * REGRESSION_LATENCY_RATIO:
+            regressions.append(f"{name}: p50 {before['p50_ms']} -> {result['p50_ms']} ms")
+        if result['reads_per_call'] > before['reads_per_call'] * REGRESSION_READS_RATIO:
+            regressions.append(f"{name}: lectures {before['reads_per_call']} -> {result['reads_per_call']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des routes critiques (émulateur Firestore ou mémoire)")
+    parser.add_argument('--backend', choices=('emulator', 'memory'), default='emulator',
+                        help="emulator : latences réalistes ; memory : coût CPU seul (sans réseau)")
+    parser.add_argument('--emulator', default=os.getenv('FIRESTORE_EMULATOR_HOST', 'localhost:8080'),
+                        help="Hôte de l'émulateur Firestore (host:port)")
+    parser.add_argument('--label', default=None, help="Nom du résultat (défaut: révision git)")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--scenario', action='append', help="Limite aux scénarios dont le nom contient ce texte")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="Vide l'émulateur et réécrit le jeu de données")
+    parser.add_argument('--trips', type=int)
+    parser.add_argument('--hotels', type=int)
+    parser.add_argument('--pois', type=int)
+    parser.add_argument('--bookings', type=int)
+    args = parser.parse_args()
+
+    # Pas de worker de tâches ni de logs de requêtes lentes pendant la mesure
+    os.environ['JOBS_EMBEDDED_WORKER'] = 'false'
+    os.environ.setdefault('SLOW_REQUEST_MS', '1000000')
+    # Appels par requête lus dans l'en-tête Server-Timing (réservé aux admins sinon)
+    os.environ['SERVER_TIMING_PUBLIC'] = 'true'
+
+    if args.backend == 'memory':
+        # Base vide à chaque lancement : le jeu de données est toujours réécrit
+        os.environ['FIRESTORE_BACKEND'] = 'memory'
+    else:
+        init_emulator(args.emulator)
+        if args.reset:
+            reset_emulator(args.emulator)
+
+    from app import create_app
+    from benchmarks.dataset import seed_dataset
+    from benchmarks.firestore_reads import install_read_counter
+
+    app = create_app()
+    app_id = app.config.get('APP_ID', 'default-app-id')
+    volumes = {k: v for k, v in vars(args).items() if k in ('trips', 'hotels', 'pois', 'bookings') and v}
+
+    if args.backend == 'memory':
+        from app.services.memory_backend import get_memory_client
+        db = get_memory_client()
+    else:
+        from firebase_admin import firestore
+        db = firestore.client()
+
+    print(f"🌱 Préparation du jeu de données ({args.backend})...")
+    meta = seed_dataset(db, app_id, volumes=volumes, seed=args.seed, force=args.reset)
+
+    install_read_counter()
+    scenarios = build_scenarios(app, meta['samples'])
+    if args.scenario:
+        scenarios = {name: call for name, call in scenarios.items() if any(s in name for s in args.scenario)}
+
+    print(f"🚀 {len(scenarios)} scénario(s), {args.iterations} itérations")
+    results = {}
+    with app.app_context():
+        for name, call in scenarios.items():
+            results[name] = measure(name, call, args.iterations)
+
+    revision = _git_revision()
+    label = args.label or revision
+    output = {
+        'label': label,
+        'revision': revision,
+        'createdAt': datetime.now().isoformat(),
+        'backend': args.backend,
+        'volumes': meta['volumes'],
+        'iterations': args.iterations,
+        'scenarios': results
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    previous = latest_result(args.backend, exclude=path)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Résultats enregistrés: {path}")
+
+    if previous:
+        regressions = compare(output, previous)
+        print(f"📊 Comparaison avec {previous['label']} ({previous['revision']})")
+        for line in regressions:
+            print(f"  ⚠️  {line}")
+        if not regressions:
+            print("  ✅ Aucune régression")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark du démarrage d'un worker : temps de création de l'application,
+mémoire (RSS max) et profil des imports (`python -X importtime`)
+
+Chaque mesure lance un process neuf (aucun module en cache) qui importe
+et crée l'application, comme un worker gunicorn sans --preload.
+Les résultats sont enregistrés dans benchmarks/results/startup/<label>.json.
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --top 25 --label v1.5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results', 'startup')
+
+# Dépendances lourdes qui ne doivent être chargées qu'à l'utilisation
+HEAVY_MODULES = ('pandas', 'google.generativeai', 'stripe', 'alembic', 'PIL', 'openpyxl')
+
+_CHILD_CODE = '''
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app(start_background=False)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'create_app_ms': round(elapsed * 1000, 1),
+    'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'heavy_modules': sorted(m for m in %r if m in sys.modules)
+}))
+''' % (HEAVY_MODULES,)
+
+_IMPORTTIME_PATTERN = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \| *(\S+)$')
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, float]]:
+    """
+    Coût de chaque paquet racine du profil -X importtime (durée cumulée de son
+    premier import, dépendances comprises), hors paquet de l'application
+
+    Returns:
+        [(paquet, durée cumulée en ms)], les plus coûteux d'abord
+    """
+    packages = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_PATTERN.match(line)
+        if match and '.' not in match.group(2) and match.group(2) != 'app':
+            packages.append((match.group(2), int(match.group(1)) / 1000))
+    return sorted(packages, key=lambda entry: entry[1], reverse=True)
+
+
+def run_once(env: Dict[str, str]) -> Tuple[Dict, List[Tuple[str, float]]]:
+    """Démarre un process neuf et retourne (mesures, profil des imports)"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _CHILD_CODE],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    last_line = completed.stdout.strip().splitlines()[-1]
+    return json.loads(last_line), parse_importtime(completed.stderr)
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, cwd=ROOT_DIR).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage de l'application")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="Nombre de paquets listés")
+    parser.add_argument('--label', default=None, help="Nom du résultat (défaut: révision git)")
+    args = parser.parse_args()
+
+    env = dict(os.environ, JOBS_EMBEDDED_WORKER='false', PYTHONDONTWRITEBYTECODE='1')
+
+    runs, profile = [], []
+    for i in range(args.runs):
+        measures, profile = run_once(env)
+        runs.append(measures)
+        print(f"  run {i + 1}: create_app {measures['create_app_ms']:>7.1f} ms  RSS {measures['max_rss_mb']:>6.1f} Mo")
+
+    create_app_ms = round(statistics.median(run['create_app_ms'] for run in runs), 1)
+    max_rss_mb = round(statistics.median(run['max_rss_mb'] for run in runs), 1)
+    heavy_modules = runs[-1]['heavy_modules']
+
+    print(f"\n🚀 Démarrage (médiane sur {args.runs}) : {create_app_ms} ms, RSS {max_rss_mb} Mo")
+    print("📦 Paquets les plus coûteux à importer (dernier run) :")
+    for module, cumulative_ms in profile[:args.top]:
+        print(f"  {cumulative_ms:>8.1f} ms  {module}")
+    if heavy_modules:
+        print(f"⚠️  Dépendances lourdes chargées au démarrage : {', '.join(heavy_modules)}")
+    else:
+        print("✅ Aucune dépendance lourde chargée au démarrage")
+
+    revision = _git_revision()
+    label = args.label or revision
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{label}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'label': label,
+            'revision': revision,
+            'createdAt': datetime.now().isoformat(),
+            'runs': runs,
+            'create_app_ms': create_app_ms,
+            'max_rss_mb': max_rss_mb,
+            'heavy_modules': heavy_modules,
+            'top_imports': [{'module': module, 'cumulative_ms': round(ms, 1)} for module, ms in profile[:args.top]]
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Résultats enregistrés: {path}")
+
+
+if __name__ == '__main__':
+    main()
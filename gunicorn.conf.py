@@ -0,0 +1,57 @@
+"""
+Configuration gunicorn (Procfile : gunicorn -c gunicorn.conf.py wsgi:app)
+
+Avec preload_app, l'application est importée une seule fois dans le master
+puis forkée : les workers démarrent sans réimporter Flask, Firebase, SQLAlchemy...
+et partagent ces pages mémoire (copy-on-write). Les threads de fond ne survivent
+pas au fork : ils sont démarrés dans chaque worker (post_worker_init).
+
+GUNICORN_WORKER_CLASS=gevent active le mode concurrent pour les routes
+limitées par les E/S. Les traitements longs et gourmands en CPU (imports
+Excel, pré-génération des guides) doivent alors tourner dans le process
+`worker` (JOBS_EMBEDDED_WORKER=false) : dans un greenlet, ils bloqueraient
+les autres requêtes du worker web. Le process `worker` tournant dans son
+propre conteneur, JOB_QUEUE_PATH doit alors pointer vers un volume partagé.
+"""
+import os
+
+# sync (défaut) : un worker = une requête à la fois ; gevent : chaque worker sert
+# jusqu'à worker_connections requêtes, les E/S (Firestore, Storage, Google,
+# RateHawk, Stripe, Gemini) cédant la main aux autres requêtes
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+
+if worker_class == 'gevent':
+    # Le patch doit précéder le chargement de l'app (preload) : sockets, ssl,
+    # time.sleep, queue et les verrous créés à l'import des services deviennent
+    # coopératifs, les threads (pools, tâches de fond) deviennent des greenlets
+    from gevent import monkey
+    monkey.patch_all()
+
+    # Le client Firestore (gRPC) ne passe pas par les sockets Python : sans
+    # cette boucle compatible gevent, chaque appel bloquerait tout le worker
+    import grpc.experimental.gevent as grpc_gevent
+    grpc_gevent.init_gevent()
+
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+
+# GUNICORN_PRELOAD=false : chaque worker importe et crée sa propre application
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+# Lu par wsgi.py : pas de threads de fond dans le master
+os.environ['GUNICORN_PRELOAD'] = 'true' if preload_app else 'false'
+
+# Le nombre de workers vient de WEB_CONCURRENCY (défaut gunicorn : 1)
+
+
+def post_worker_init(worker):
+    """Dans chaque worker, après le fork : connexions neuves et threads de fond"""
+    if not preload_app:
+        return
+
+    from app import db, start_background_services
+
+    app = worker.wsgi
+    with app.app_context():
+        # Pas de connexion SQL héritée du master (close=False : le master garde les siennes)
+        db.engine.dispose(close=False)
+    start_background_services(app)
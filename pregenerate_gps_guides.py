@@ -0,0 +1,38 @@
+"""
+Préchauffage des guides GPS : génère à l'avance les guides des appareils les plus demandés
+Usage: python pregenerate_gps_guides.py [--limit 100] [--force] [--concurrency 3] [appareil ...]
+"""
+import argparse
+
+from app import create_app
+from app.services import FirebaseService
+from app.services.gps_guide_service import build_device_catalogue, pregenerate_gps_guides
+
+parser = argparse.ArgumentParser(description="Pré-génère les guides GPS des appareils populaires")
+parser.add_argument('devices', nargs='*', help="Appareils à traiter (défaut: catalogue + requêtes fréquentes)")
+parser.add_argument('--limit', type=int, default=100, help="Nombre maximum d'appareils du catalogue")
+parser.add_argument('--force', action='store_true', help="Régénère aussi les guides à jour")
+parser.add_argument('--concurrency', type=int, default=3, help="Générations simultanées")
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    firebase = FirebaseService(app.config.get('APP_ID', 'default-app-id'))
+    queries = args.devices or build_device_catalogue(firebase, limit=args.limit)
+
+    print(f"🚀 Préchauffage de {len(queries)} guide(s) GPS...")
+
+    def progress(done, total, message):
+        print(f"  [{done}/{total}] {message}")
+
+    summary = pregenerate_gps_guides(firebase, queries=queries, force=args.force,
+                                     concurrency=args.concurrency, progress=progress)
+
+    print("\n📋 RÉSULTAT")
+    print("==================================================")
+    print(f"✅ Générés       : {summary['generated']}")
+    print(f"📚 Statiques     : {summary['static']}")
+    print(f"♻️  Déjà à jour   : {summary['fresh']}")
+    print(f"❌ Échecs        : {summary['failed']}")
+    print("==================================================")
@@ -14,7 +14,7 @@ new_guides = {}
 
 for q in queries:
     print(f"\n📡 Génération pour : {q}...")
-    result = generate_gps_guide(q)
+    result = generate_gps_guide(q, force_refresh=True)
     
     if result.get('found'):
         print(f"✅ Succès pour {q}")
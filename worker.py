@@ -0,0 +1,22 @@
+"""
+Process worker de la file de tâches (imports d'hôtels, préchauffage des guides GPS...)
+Usage: python worker.py
+"""
+import logging
+
+from app import create_app
+from app.services.job_queue import JobWorker, get_job_store, require_shared_queue_path
+from app.services.gps_guide_service import start_pregeneration_scheduler
+
+logging.basicConfig(level=logging.INFO)
+
+# Pas de threads de fond du process web (worker embarqué, écoutes des caches)
+app = create_app(start_background=False)
+
+if __name__ == '__main__':
+    # Conteneur séparé du web : la file doit être sur un volume partagé
+    require_shared_queue_path()
+    print("🔧 Worker de tâches démarré (Ctrl+C pour arrêter)")
+    # Préchauffage périodique des guides GPS (GPS_PREGEN_INTERVAL_HOURS, 0 = désactivé)
+    start_pregeneration_scheduler()
+    JobWorker(get_job_store(), app).run_forever()
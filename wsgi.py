@@ -1,11 +1,14 @@
 """
 Point d'entrée de l'application Flask
 """
+import os
+
 from app import create_app
 
-app = create_app()
+# Sous `gunicorn --preload` (gunicorn.conf.py), l'app est créée dans le master :
+# les threads de fond sont démarrés après le fork, dans chaque worker
+app = create_app(start_background=os.getenv('GUNICORN_PRELOAD', 'false') != 'true')
 
 if __name__ == '__main__':
-    import os
     port = int(os.getenv('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)